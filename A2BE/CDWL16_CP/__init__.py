@@ -25,6 +25,8 @@ class CDWL16_CP(ABEnc):
         self.name = "CDWL CP-A2BE"
         self.group = group_obj   
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=6, exponentiations=6, fixed_pairings=1)
+        self.util.setPolicyCost(exponentiations=8, hashes=1)
         global util
         util = SecretUtil(group_obj)
 
@@ -78,7 +80,7 @@ class CDWL16_CP(ABEnc):
             x = attr_list.index(attr)        
             r1, r2 = self.group.random(ZR), self.group.random(ZR)  
             sk_3[attr_list_name[x]] = msk['g_2'] ** (msk['d1'] * msk['d2'] * r1 + msk['d3'] * msk['d4'] * r2)               
-            attrHash = self.group.hash(attr, ZR)  
+            attrHash = self.util.hash(attr, ZR)  
             tem = msk['u_2'] ** attrHash * msk['h_2']
             tem_1 = tem ** r1 * msk['v_2'] ** (-r)
             tem_2 = tem ** r2 * msk['v_2'] ** (-r_prime)           
@@ -93,15 +95,13 @@ class CDWL16_CP(ABEnc):
    
     def encrypt(self, pk, msg, attr_policy):
         # Get attribute names
-        attr_policy = util.createPolicy(attr_policy)   # convert the policy from string to Bin.node format
-        policy_name = copy.deepcopy(attr_policy)
-    
-        parser = PolicyParser()
-        parser.policy_strip(policy_name) # remove keyword values in the policy 
+        compiled_policy = self.util.compilePolicy(attr_policy)   # convert the policy from string to Bin.node format
+        attr_policy = compiled_policy.tree
+        policy_name = compiled_policy.names # the policy without keyword values, built at compile time
 
         # Use MSP for access policy
         mono_span_prog = self.util.convert_policy_to_msp(attr_policy)
-        num_cols = self.util.len_longest_row    
+        num_cols = mono_span_prog.num_cols    
 
         # pick random shares
         mu = self.group.random() 
@@ -113,14 +113,14 @@ class CDWL16_CP(ABEnc):
         ct_1 = pk['g_1'] ** mu
         ct_2, ct_3, ct_4, ct_5, ct_6, ct_7 = {}, {}, {}, {}, {}, {}        
             
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        w_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['w_1'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
             attr_name = attr_stripped.split(':')[0]
-            attrHash = self.group.hash(attr_stripped, ZR)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))                    
+            attrHash = self.util.hash(attr_stripped, ZR)
             z, s1, s2 = self.group.random(ZR), self.group.random(ZR), self.group.random(ZR)     
-            ct_2[attr_name] = pk['w_1'] ** Mivtop * pk['v_1'] ** z	    
+            ct_2[attr_name] = w_1_shares[attr] * pk['v_1'] ** z	    
             ct_3[attr_name] = (pk['u_1'] ** attrHash * pk['h_1']) ** (-z)
             ct_4[attr_name] = pk['g1'] ** s1
             ct_5[attr_name] = pk['g2'] ** (z - s1)
@@ -133,25 +133,33 @@ class CDWL16_CP(ABEnc):
                              
         return ct
 
-    def decrypt(self, ct, sk, msg):
-        subsets = util.prune(ct['policy_name'], sk['attr_set_name'], 1)
+    def decrypt(self, ct, sk, msg, budget=None):
+        subsets = self.util.pruneSubsets(ct['policy_name'], sk['attr_set_name'], budget)
  
         if subsets == False:  
             print('Attribute names are not matching.')
             result = 0 
             return subsets, result
            
+        result = 0
+        tried = []
+        # the coefficients are all 1 without a threshold gate, no need to walk the policy per trial
+        threshold = self.util.hasThreshold(ct['policy_name'])
         for one_subset in subsets:
+            tried.append(one_subset)
+            coeffs = self.util.getReconstructionCoefficients(ct['policy_name'], one_subset) if threshold else {}
             T = (pair(ct['ct_1'], sk['sk_1'])) ** (-1)
             for one_name in one_subset:
                 k = one_name.getAttribute()                                       
                 B = pair(ct['ct_2'][k], sk['sk_2']) * pair(ct['ct_3'][k], sk['sk_3'][k]) * pair(ct['ct_4'][k], sk['sk_4'][k]) * pair(ct['ct_5'][k], sk['sk_5'][k]) * pair(ct['ct_6'][k], sk['sk_6'][k]) * pair(ct['ct_7'][k], sk['sk_7'][k])
-                T *= B
+                T *= self.util.exp(B, coeffs.get(one_name.getAttributeAndIndex()))
 
             if msg == ct['ct_8'] * T:     
                 result = 1             
+                self.util.recordTrial(one_subset, True)
                 break 
             else:
                 result = 0
+                self.util.recordTrial(one_subset, False)
                 continue        
-        return subsets, result
+        return tried, result
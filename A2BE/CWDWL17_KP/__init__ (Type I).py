@@ -23,6 +23,8 @@ class KPabe_search(ABEnc):
         self.name = "CuiHui PEKS"
         self.group = group_obj   
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=6, exponentiations=6)
+        self.util.setPolicyCost(exponentiations=11, hashes=1)
         global util
         util = SecretUtil(group_obj)
 
@@ -53,16 +55,15 @@ class KPabe_search(ABEnc):
     def trapdoor(self, mk, pk, pk_s, policy_str): 
         
         #print("Debug: policy--->")
-        policy = util.createPolicy(policy_str)
+        compiled_policy = self.util.compilePolicy(policy_str)
+        policy = compiled_policy.tree
 
-        # making a stripped policy tree, removing keyword values
-        policy_stripped = copy.deepcopy(policy) 
-        parser = PolicyParser()
-        parser.policy_strip(policy_stripped)
+        # the stripped policy tree without keyword values, built when the policy was compiled
+        policy_stripped = compiled_policy.names
         
         # Using MSP
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
         
         # pick random shares
         v = [mk['alpha']]
@@ -74,14 +75,14 @@ class KPabe_search(ABEnc):
         T = pk['g_hat'] ** r
         T1, T2, T3, T4, T5, T6 = {}, {}, {}, {}, {}, {}
         
-        for kw, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_shares = self.util.sharePowers(mono_span_prog, shares, pk['g'])
+        for kw, row in mono_span_prog.sparseItems():
             kw_stripped = self.util.strip_index(kw)
             k = kw_stripped.split(':')[0]
-            kwHash = self.group.hash(kw_stripped, ZR)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))          
+            kwHash = self.util.hash(kw_stripped, ZR)
             t1, t2 = self.group.random(ZR), self.group.random(ZR)
-            T1[k] = pk['g'] ** Mivtop * pk['w']**(mk['d1']*mk['d2']*t1+mk['d3']*mk['d4']*t2)
+            T1[k] = g_shares[kw] * pk['w']**(mk['d1']*mk['d2']*t1+mk['d3']*mk['d4']*t2)
             T2[k] = pk_s ** r * pk['g_hat']**(mk['d1']*mk['d2']*t1+mk['d3']*mk['d4']*t2) 
             T3[k] = ((pk['u'] ** kwHash * pk['h'])**t1)**(-mk['d2'])
             T4[k] = ((pk['u'] ** kwHash * pk['h'])**t1)**(-mk['d1'])
@@ -100,21 +101,21 @@ class KPabe_search(ABEnc):
             z = self.group.random()      # default: ZR
             s1, s2 = self.group.random(ZR), self.group.random(ZR)
             j = i.split(':')[0]     
-            D_i[j] = pk['w']**(-mu)*(pk['u']**self.group.hash(i,ZR)*pk['h'])**z
+            D_i[j] = pk['w']**(-mu)*(pk['u']**self.util.hash(i,ZR)*pk['h'])**z
             E1[j] = pk['g1']**(z-s1)
             E2[j] = pk['g2']**(s1)
             F1[j] = pk['g3']**(z-s2)
             F2[j] = pk['g4']**(s2)
 
         keywords_stripped = util.keywords_strip(W)
-        return { 'C':C, 'D':D, 'D_i':D_i, 'E1':E1, 'E2':E2, 'F1':F1, 'F2':F2, 'kws':str(keywords_stripped) }
+        return { 'C':C, 'D':D, 'D_i':D_i, 'E1':E1, 'E2':E2, 'F1':F1, 'F2':F2, 'kws':keywords_stripped }
 
-    def search(self, pk, trap, ct, sk_s):
+    def search(self, pk, trap, ct, sk_s, budget=None):
         #if debug: print("\nTrapdoor's policy: ", trap['policy'])
         start = time.time()
 
-        policy = util.createPolicy(trap['policy'])        
-        pruned_list = util.prune(policy, ct['kws'], 1)     
+        policy = self.util.createPolicy(trap['policy'])        
+        pruned_list = self.util.pruneSubsets(policy, ct['kws'], budget)     
         
         if not pruned_list:
             print ("Keyword names are not satisfied.")
@@ -124,7 +125,10 @@ class KPabe_search(ABEnc):
         rslt = 0
         num_keywords = 0
         num_tests = 0
+        result = 0
+        tried = []
         for attr_list in pruned_list:
+            tried.append(attr_list)
             #if debug: print("\nKeywords for testing:", attr_list)
             A = 1 
             for i in attr_list:
@@ -138,11 +142,13 @@ class KPabe_search(ABEnc):
             num_keywords += len(attr_list)
             if ( A == ct['C'] ):
                 result = 1
+                self.util.recordTrial(attr_list, True)
                 break
             else:
                 result = 0                                              
+                self.util.recordTrial(attr_list, False)
                 continue      
         end = time.time()
         times = format((end - start) * 1000, '7.2f')   
         print(times)               
-        return pruned_list, result
+        return tried, result
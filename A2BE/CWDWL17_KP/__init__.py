@@ -24,6 +24,8 @@ class CWDWL17_KP(ABEnc):
         self.name = "CWDWL KP-A2BE"
         self.group = group_obj   
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=6, exponentiations=6)
+        self.util.setPolicyCost(exponentiations=11, hashes=1)
         global util
         util = SecretUtil(group_obj)
 
@@ -56,16 +58,15 @@ class CWDWL17_KP(ABEnc):
 
     def keygen(self, pk, msk, policy_str):         
         #print("Debug: policy--->")
-        policy = util.createPolicy(policy_str)
+        compiled_policy = self.util.compilePolicy(policy_str)
+        policy = compiled_policy.tree
 
-        # making a stripped policy tree, removing keyword values
-        policy_stripped = copy.deepcopy(policy) 
-        parser = PolicyParser()
-        parser.policy_strip(policy_stripped)
+        # the stripped policy tree without keyword values, built when the policy was compiled
+        policy_stripped = compiled_policy.names
         
         # Using MSP
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
         
         # pick random shares
         v = [msk['alpha']]
@@ -75,15 +76,15 @@ class CWDWL17_KP(ABEnc):
             
         sk_1, sk_2, sk_3, sk_4, sk_5, sk_6 = {}, {}, {}, {}, {}, {}
         
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_2_shares = self.util.sharePowers(mono_span_prog, shares, msk['g_2'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
             i = attr_stripped.split(':')[0]
             #print(attr_stripped)
-            attrHash = self.group.hash(attr_stripped, ZR)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))          
+            attrHash = self.util.hash(attr_stripped, ZR)
             t1, t2 = self.group.random(ZR), self.group.random(ZR)
-            sk_1[i] = msk['g_2'] ** Mivtop * msk['w_2'] ** (msk['d1'] * msk['d2'] * t1 + msk['d3'] * msk['d4'] * t2)           
+            sk_1[i] = g_2_shares[attr] * msk['w_2'] ** (msk['d1'] * msk['d2'] * t1 + msk['d3'] * msk['d4'] * t2)           
             sk_2[i] = msk['g_2'] ** (msk['d1'] * msk['d2'] * t1 + msk['d3'] * msk['d4'] * t2)
             sk_3[i] = (msk['u_2'] ** attrHash * msk['h_2']) ** (-msk['d2'] * t1)
             sk_4[i] = (msk['u_2'] ** attrHash * msk['h_2']) ** (-msk['d1'] * t1)
@@ -104,7 +105,7 @@ class CWDWL17_KP(ABEnc):
         for attr in attr_list:
             z, s1, s2  = self.group.random(ZR), self.group.random(ZR), self.group.random(ZR)      
             i = attr.split(':')[0]     
-            attrHash = self.group.hash(attr, ZR)
+            attrHash = self.util.hash(attr, ZR)
             ct_2[i] = pk['w_1'] ** (-mu) * (pk['u_1'] ** attrHash * pk['h_1']) ** z
             ct_3[i] = pk['g1'] ** (z - s1)
             ct_4[i] = pk['g2'] ** s1
@@ -115,31 +116,39 @@ class CWDWL17_KP(ABEnc):
         
         attr_stripped = util.keywords_strip(attr_list)
         
-        ct = {'attr_name': str(attr_stripped), 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4, 'ct_5': ct_5, 'ct_6': ct_6, 'ct_7': ct_7}
+        ct = {'attr_name': attr_stripped, 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4, 'ct_5': ct_5, 'ct_6': ct_6, 'ct_7': ct_7}
         
         return ct
 
-    def decrypt(self, pk, ct, sk, msg):
-        policy = util.createPolicy(sk['policy_name'])        
-        pruned_list = util.prune(policy, ct['attr_name'], 1)    
+    def decrypt(self, pk, ct, sk, msg, budget=None):
+        policy = self.util.createPolicy(sk['policy_name'])        
+        pruned_list = self.util.pruneSubsets(policy, ct['attr_name'], budget)    
                 
         if not pruned_list:
             print ("Attribute names do not match.")
             result = 0 
             return pruned_list, result  
         
+        result = 0
+        tried = []
+        # the coefficients are all 1 without a threshold gate, no need to walk the policy per trial
+        threshold = self.util.hasThreshold(policy)
         for attr_list in pruned_list:
+            tried.append(attr_list)
+            coeffs = self.util.getReconstructionCoefficients(policy, attr_list) if threshold else {}
             T = 1 
             for attr in attr_list:
                 #j = i.getAttributeAndIndex(); 
                 i = attr.getAttribute() 
                 B = pair(ct['ct_1'], sk['sk_1'][i]) * pair(ct['ct_2'][i], sk['sk_2'][i]) * pair(ct['ct_3'][i], sk['sk_3'][i]) * pair(ct['ct_4'][i], sk['sk_4'][i]) * pair(ct['ct_5'][i], sk['sk_5'][i]) * pair(ct['ct_6'][i], sk['sk_6'][i]) 
-                T *= B
+                T *= self.util.exp(B, coeffs.get(attr.getAttributeAndIndex()))
                 
             if msg == ct['ct_7'] / T:
                 result = 1
+                self.util.recordTrial(attr_list, True)
                 break
             else:
                 result = 0                                              
+                self.util.recordTrial(attr_list, False)
                 continue      
-        return pruned_list, result
+        return tried, result
@@ -23,6 +23,8 @@ class FABESA_CP(ABEnc):
         self.name = "Our CP-A2BE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=3, exponentiations=3, fixed_pairings=4)
+        self.util.setPolicyCost(exponentiations=3, hashes=2)
         global util
         util = SecretUtil(self.group)          
 
@@ -60,24 +62,22 @@ class FABESA_CP(ABEnc):
             x = attr_list.index(attr)
             attr_0 = '0' + attr
             attr_1 = '1' + attr
-            attrHash_0 = self.group.hash(attr_0, G1)
-            attrHash_1 = self.group.hash(attr_1, G1)
+            attrHash_0 = self.util.hash(attr_0, G1)
+            attrHash_1 = self.util.hash(attr_1, G1)
             sk_3[attr_list_name[x]] = attrHash_0 ** mskt_1
             sk_4[attr_list_name[x]] = attrHash_1 ** mskt_2                                     
         return {'attr_set_name': attr_list_name, 'sk_1': sk_1, 'sk_2': sk_2, 'sk_3': sk_3, 'sk_4': sk_4}     
 
     def encrypt(self, pk, msg, attr_policy):   
         # Get attribute names
-        attr_policy = util.createPolicy(attr_policy)   # convert the policy from string to Bin.node format
+        compiled_policy = self.util.compilePolicy(attr_policy)   # convert the policy from string to Bin.node format
+        attr_policy = compiled_policy.tree
 
         # Use MSP for access policy        
         mono_span_prog = self.util.convert_policy_to_msp(attr_policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
         
-        attr_policy_name = attr_policy
-    
-        parser = PolicyParser()
-        parser.policy_strip(attr_policy_name) # remove attribute values in the policy 
+        attr_policy_name = compiled_policy.names # the policy without attribute values, built at compile time
 
         s_1, s_2 = self.group.random(ZR), self.group.random(ZR)
         s = s_1 + s_2
@@ -88,7 +88,9 @@ class FABESA_CP(ABEnc):
             v.append(rand)
         
         ct_1 = {}
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['g_1'])
+        for attr, row in mono_span_prog.sparseItems():
         
             attr_stripped = self.util.strip_index(attr)
             attr_name_label = attr_stripped.split(':')[0]
@@ -96,12 +98,10 @@ class FABESA_CP(ABEnc):
             attr_stripped_0 = '0' + attr_stripped
             attr_stripped_1 = '1' + attr_stripped
             
-            attrHash_0 = self.group.hash(attr_stripped_0, G1)
-            attrHash_1 = self.group.hash(attr_stripped_1, G1)
+            attrHash_0 = self.util.hash(attr_stripped_0, G1)
+            attrHash_1 = self.util.hash(attr_stripped_1, G1)
             
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            tep = pk['g_1'] ** Mivtop 
+            tep = g_1_shares[attr]
             ct_1[attr_name_label]  = tep * (attrHash_0 ** s_1) * (attrHash_1 * s_2)
         
         ct_2 = pk['g_2'] ** s 
@@ -111,34 +111,41 @@ class FABESA_CP(ABEnc):
         
         return {'attr_policy_name': attr_policy_name, 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4, 'ct_5': ct_5}
 
-    def decrypt(self, ct, sk, msg):
+    def decrypt(self, ct, sk, msg, budget=None):
         # Match the attribute names and policy names
-        subsets = util.prune(ct['attr_policy_name'], sk['attr_set_name'], 1)
+        subsets = self.util.pruneSubsets(ct['attr_policy_name'], sk['attr_set_name'], budget)
         
         if subsets == False:  
             print('Attribute names are not matching.')
             result = 0 
             return subsets, result
                            
+        result = 0
+        tried = []
+        # the coefficients are all 1 without a threshold gate, no need to walk the policy per trial
+        threshold = self.util.hasThreshold(ct['attr_policy_name'])
         for one_subset in subsets:
+            tried.append(one_subset)
+            coeffs = self.util.getReconstructionCoefficients(ct['attr_policy_name'], one_subset) if threshold else {}
             prod_ct_1 = 1
             prod_sk_3 = 1
             prod_sk_4 = 1
 
             for one_name in one_subset:
                 k = one_name.getAttribute()
+                coeff = coeffs.get(one_name.getAttributeAndIndex())
                 
                 for name in ct['ct_1'].keys():
                     if k == name: 
-                        prod_ct_1 *= ct['ct_1'][k]                       
+                        prod_ct_1 *= self.util.exp(ct['ct_1'][k], coeff)
                                                                                                                                                 
                 for name in sk['sk_3'].keys(): 
                     if k == name:
-                        prod_sk_3 *= sk['sk_3'][k]                                                 
+                        prod_sk_3 *= self.util.exp(sk['sk_3'][k], coeff)
                 
                 for name in sk['sk_4'].keys():
                     if k == name:
-                        prod_sk_4 *= sk['sk_4'][k]                                         
+                        prod_sk_4 *= self.util.exp(sk['sk_4'][k], coeff)
                                                   
             e1 = pair(prod_ct_1, sk['sk_1'])
             e2 = pair(sk['sk_2'], ct['ct_2'])
@@ -147,9 +154,11 @@ class FABESA_CP(ABEnc):
                            
             if msg == ct['ct_5'] * e3 * e4 / (e1 * e2):     
                 result = 1             
+                self.util.recordTrial(one_subset, True)
                 break 
             else:
                 result = 0
+                self.util.recordTrial(one_subset, False)
                 continue                                                
-        return subsets, result
+        return tried, result
               
@@ -23,6 +23,8 @@ class FABESA_KP(ABEnc):
         self.name = "Our KP-A2BE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=4, exponentiations=4, fixed_pairings=4)
+        self.util.setPolicyCost(exponentiations=3, hashes=2)
         global util
         util = SecretUtil(self.group)          
 
@@ -43,15 +45,13 @@ class FABESA_KP(ABEnc):
 
     def keygen(self, pk, msk, attr_policy):
         # convert the policy from string to Bin.node format
-        attr_policy = util.createPolicy(attr_policy)   
-        attr_policy_name = copy.deepcopy(attr_policy)
-        
-        # remove attribute values in the policy 
-        parser = PolicyParser()
-        parser.policy_strip(attr_policy_name) 
+        compiled_policy = self.util.compilePolicy(attr_policy)
+        attr_policy = compiled_policy.tree
+        # the policy without attribute values, built once when the policy was compiled
+        attr_policy_name = compiled_policy.names
 
         mono_span_prog = self.util.convert_policy_to_msp(attr_policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
         # pick randomness
         r = self.group.random(ZR)
         
@@ -70,7 +70,9 @@ class FABESA_KP(ABEnc):
         mskt_2 = r/msk['b_2']
         
         # Using MSP
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['g_1'], -r)
+        for attr, row in mono_span_prog.sparseItems():
             
             attr_stripped = self.util.strip_index(attr)
             attr_name_label = attr_stripped.split(':')[0]
@@ -78,12 +80,10 @@ class FABESA_KP(ABEnc):
             attr_stripped_0 = '0' + attr_stripped
             attr_stripped_1 = '1' + attr_stripped
             
-            attrHash_0 = self.group.hash(attr_stripped_0, G1)
-            attrHash_1 = self.group.hash(attr_stripped_1, G1)
+            attrHash_0 = self.util.hash(attr_stripped_0, G1)
+            attrHash_1 = self.util.hash(attr_stripped_1, G1)
             
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row])) 
-            sk_2[attr_name_label] = pk['g_1'] ** (Mivtop - r)        
+            sk_2[attr_name_label] = g_1_shares[attr]
             sk_3[attr_name_label] = attrHash_0 ** mskt_1
             sk_4[attr_name_label] = attrHash_1 ** mskt_2
                        
@@ -106,8 +106,8 @@ class FABESA_KP(ABEnc):
             x = attr_list.index(attr)
             attr_0 = '0' + attr
             attr_1 = '1' + attr
-            attrHash_0 = self.group.hash(attr_0, G1)
-            attrHash_1 = self.group.hash(attr_1, G1)
+            attrHash_0 = self.util.hash(attr_0, G1)
+            attrHash_1 = self.util.hash(attr_1, G1)
             ct_1[attr_list_name[x]] = tep * (attrHash_0 ** s_1) * (attrHash_1 ** s_2)
      
         ct_2 = pk['g_2'] ** s              
@@ -117,15 +117,21 @@ class FABESA_KP(ABEnc):
 
         return {'attr_set_name': attr_list_name, 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4, 'ct_5': ct_5}
 
-    def decrypt(self, pk, ct, key, msg):
+    def decrypt(self, pk, ct, key, msg, budget=None):
         # Match the attribute names and the policy names
-        subsets = util.prune(key['attr_policy_name'], ct['attr_set_name'], 1)
+        subsets = self.util.pruneSubsets(key['attr_policy_name'], ct['attr_set_name'], budget)
         if subsets == False:  
             print('Attribute names are not matching.')
             result = 0 
             return subsets, result
               
+        result = 0
+        tried = []
+        # the coefficients are all 1 without a threshold gate, no need to walk the policy per trial
+        threshold = self.util.hasThreshold(key['attr_policy_name'])
         for one_subset in subsets:
+            tried.append(one_subset)
+            coeffs = self.util.getReconstructionCoefficients(key['attr_policy_name'], one_subset) if threshold else {}
             prod_ct_1 = 1
             prod_key_2 = 1
             prod_key_3 = 1
@@ -133,22 +139,23 @@ class FABESA_KP(ABEnc):
             
             for one_name in one_subset:
                 k = one_name.getAttribute()
+                coeff = coeffs.get(one_name.getAttributeAndIndex())
                 
                 for name in ct['ct_1'].keys():
                     if k == name: 
-                        prod_ct_1 *= ct['ct_1'][k]     
+                        prod_ct_1 *= self.util.exp(ct['ct_1'][k], coeff)
                 
                 for name in key['sk_2'].keys():
                     if k == name:
-                        prod_key_2 *= key['sk_2'][k]                    
+                        prod_key_2 *= self.util.exp(key['sk_2'][k], coeff)
                                                                                                                                              
                 for name in key['sk_3'].keys(): 
                     if k == name:
-                        prod_key_3 *= key['sk_3'][k]  
+                        prod_key_3 *= self.util.exp(key['sk_3'][k], coeff)
  
                 for name in key['sk_4'].keys(): 
                     if k == name:
-                        prod_key_4 *= key['sk_4'][k]  
+                        prod_key_4 *= self.util.exp(key['sk_4'][k], coeff)
                     
             e1 = pair(prod_ct_1, key['sk_1'])
             e2 = pair(prod_key_2, ct['ct_2'])   
@@ -157,9 +164,11 @@ class FABESA_KP(ABEnc):
             kem = ct['ct_5'] * e3 * e4 / (e1 * e2)   
             if  kem == msg:
                 result = 1
+                self.util.recordTrial(one_subset, True)
                 break 
             else:
                 result = 0
+                self.util.recordTrial(one_subset, False)
                 continue                                                
-        return subsets, result
+        return tried, result
               
@@ -24,6 +24,8 @@ class FEASE_KP(ABEnc):
         self.name = "FEASE KP-A2BE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=3, exponentiations=3, fixed_pairings=3)
+        self.util.setPolicyCost(exponentiations=4, hashes=1)
         global util
         util = SecretUtil(self.group)          
 
@@ -45,15 +47,13 @@ class FEASE_KP(ABEnc):
 
     def keygen(self, pk, msk, attr_policy):
         # convert the policy from string to Bin.node format
-        attr_policy = util.createPolicy(attr_policy)   
+        compiled_policy = self.util.compilePolicy(attr_policy)
+        attr_policy = compiled_policy.tree
         mono_span_prog = self.util.convert_policy_to_msp(attr_policy)     
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
-        attr_policy_name = attr_policy
-        
-        # remove attribute values in the policy    
-        parser = PolicyParser()
-        parser.policy_strip(attr_policy_name) 
+        # the policy without attribute values, built once when the policy was compiled
+        attr_policy_name = compiled_policy.names
                 
         # pick randomness
         r = self.group.random(ZR)
@@ -72,13 +72,13 @@ class FEASE_KP(ABEnc):
         skt_2 = 1/msk['b_2']    
         
         #Using MSP
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['g_1'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
             attr_name_label = attr_stripped.split(':')[0]          
-            attrHash = self.group.hash(attr_stripped, G1)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            tep = pk['g_1'] ** Mivtop * attrHash ** r
+            attrHash = self.util.hash(attr_stripped, G1)
+            tep = g_1_shares[attr] * attrHash ** r
             sk_2[attr_name_label] = tep ** skt_1
             sk_3[attr_name_label] = tep ** skt_2
                         
@@ -98,7 +98,7 @@ class FEASE_KP(ABEnc):
         ct_1 = {}
         for attr in attr_list:
             x = attr_list.index(attr)
-            attrHash = self.group.hash(attr, G1)
+            attrHash = self.util.hash(attr, G1)
             ct_1[attr_list_name[x]] = attrHash ** s
                 
         ct_2 = pk['g_2^b_1'] ** s_1
@@ -107,34 +107,41 @@ class FEASE_KP(ABEnc):
         
         return {'attr_set_name': attr_list_name, 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4}
         
-    def decrypt(self, pk, ct, key, msg):
+    def decrypt(self, pk, ct, key, msg, budget=None):
         # Match the attribute names and policy names
-        subsets = util.prune(key['attr_policy_name'], ct['attr_set_name'], 1)
+        subsets = self.util.pruneSubsets(key['attr_policy_name'], ct['attr_set_name'], budget)
 
         if subsets == False:  
             print('Attribute names are not matching.')
             result = 0
             return subsets, result
               
+        result = 0
+        tried = []
+        # the coefficients are all 1 without a threshold gate, no need to walk the policy per trial
+        threshold = self.util.hasThreshold(key['attr_policy_name'])
         for one_subset in subsets:
+            tried.append(one_subset)
+            coeffs = self.util.getReconstructionCoefficients(key['attr_policy_name'], one_subset) if threshold else {}
             prod_ct_1 = 1
             prod_sk_2 = 1
             prod_sk_3 = 1
 
             for one_name in one_subset:
                 k = one_name.getAttribute()
+                coeff = coeffs.get(one_name.getAttributeAndIndex())
                 
                 for name in ct['ct_1'].keys():
                     if k == name: 
-                        prod_ct_1 *= ct['ct_1'][k] 
+                        prod_ct_1 *= self.util.exp(ct['ct_1'][k], coeff)
                                                                                                                                                                         
                 for name in key['sk_2'].keys(): 
                     if k == name:
-                        prod_sk_2 *= key['sk_2'][k]
+                        prod_sk_2 *= self.util.exp(key['sk_2'][k], coeff)
                                                 
                 for name in key['sk_3'].keys():
                     if k == name:
-                        prod_sk_3 *= key['sk_3'][k]
+                        prod_sk_3 *= self.util.exp(key['sk_3'][k], coeff)
                                                                
             e1 = pair(prod_ct_1, key['sk_1'])
             e2 = pair(prod_sk_2, ct['ct_2'])
@@ -142,9 +149,11 @@ class FEASE_KP(ABEnc):
             kem = (ct['ct_4'] * e1)/(e2 * e3)          
             if kem == msg: 
                 result = 1
+                self.util.recordTrial(one_subset, True)
                 break                    
             else:    
                 result = 0                
+                self.util.recordTrial(one_subset, False)
                 continue                                   
-        return subsets, result         
+        return tried, result         
               
@@ -24,6 +24,8 @@ class FABEO22CPABE(ABEnc):
         self.name = "FABEO CP-ABE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=2, exponentiations=2, fixed_pairings=3)
+        self.util.setPolicyCost(exponentiations=2, hashes=1)
 
     def setup(self):
         """
@@ -62,10 +64,10 @@ class FABEO22CPABE(ABEnc):
 
         sk1 = {}
         for attr in attr_list:
-            attrHash = self.group.hash(attr, G1)
+            attrHash = self.util.hash(attr, G1)
             sk1[attr] = attrHash ** r
         
-        bHash = self.group.hash(str(self.group.order()+1), G1) # ZR+1
+        bHash = self.util.hash(str(self.group.order()+1), G1) # ZR+1
         
         sk2 = pk['g'] ** msk['alpha'] * bHash ** r
 
@@ -81,7 +83,7 @@ class FABEO22CPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         s0 = self.group.random(ZR)
@@ -96,15 +98,15 @@ class FABEO22CPABE(ABEnc):
             rand = self.group.random(ZR)
             v.append(rand)
         
-        bHash = self.group.hash(str(self.group.order()+1), G1) # ZR+1
+        bHash = self.util.hash(str(self.group.order()+1), G1) # ZR+1
 
         ct = {}
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        bHash_shares = self.util.sharePowers(mono_span_prog, shares, bHash)
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
-            attrHash = self.group.hash(attr_stripped, G1)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            ct[attr] = bHash ** Mivtop * attrHash ** s1
+            attrHash = self.util.hash(attr_stripped, G1)
+            ct[attr] = bHash_shares[attr] * attrHash ** s1
             
         # compute the e(g, h)^(As) * m term
         Cp = pk['e_gh_alpha'] ** s0
@@ -127,14 +129,17 @@ class FABEO22CPABE(ABEnc):
             result = 0
             return result
 
+        coeffs = self.util.getReconstructionCoefficients(ctxt['policy'], nodes)
+
         prod_sk = 1
         prod_ct = 1
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
+            coeff = coeffs.get(attr)
 
-            prod_sk *= key['sk1'][attr_stripped]
-            prod_ct *= ctxt['ct'][attr]
+            prod_sk *= self.util.exp(key['sk1'][attr_stripped], coeff)
+            prod_ct *= self.util.exp(ctxt['ct'][attr], coeff)
         
         e0 = pair(key['sk2'], ctxt['g_s0'])
         e1 = pair(prod_sk, ctxt['h_s1'])
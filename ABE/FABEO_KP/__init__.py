@@ -25,6 +25,8 @@ class FABEO22KPABE(ABEnc):
         self.name = "FABEO KP-ABE"
         self.group = group_obj
         self.util = MSP(self.group, verbose) 
+        self.util.setRowCost(multiplications=2, exponentiations=2, fixed_pairings=2)
+        self.util.setPolicyCost(exponentiations=2, hashes=1)
 
     def setup(self):
         """
@@ -63,7 +65,7 @@ class FABEO22KPABE(ABEnc):
 
         ct = {}
         for attr in attr_list:
-            attrHash = self.group.hash(attr, G1)
+            attrHash = self.util.hash(attr, G1)
             ct[attr] = attrHash ** s
                     
         # compute the e(g, h)^(As) * m term
@@ -82,7 +84,7 @@ class FABEO22KPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         r = self.group.random(ZR)
@@ -96,12 +98,12 @@ class FABEO22KPABE(ABEnc):
             v.append(rand)
 
         sk = {}
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_shares = self.util.sharePowers(mono_span_prog, shares, pk['g'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
-            attrHash = self.group.hash(attr_stripped, G1)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            sk[attr] = pk['g'] ** Mivtop * attrHash ** r
+            attrHash = self.util.hash(attr_stripped, G1)
+            sk[attr] = g_shares[attr] * attrHash ** r
 
         return {'policy': policy, 'h_r': h_r, 'sk': sk}
 
@@ -120,14 +122,17 @@ class FABEO22KPABE(ABEnc):
             result = 0
             return result
 
+        coeffs = self.util.getReconstructionCoefficients(key['policy'], nodes)
+
         prod_sk = 1
         prod_ct = 1
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
+            coeff = coeffs.get(attr)
 
-            prod_sk *= key['sk'][attr]
-            prod_ct *= ctxt['ct'][attr_stripped]
+            prod_sk *= self.util.exp(key['sk'][attr], coeff)
+            prod_ct *= self.util.exp(ctxt['ct'][attr_stripped], coeff)
         
         e1 = pair(prod_sk, ctxt['h_s'])
         e2 = pair(prod_ct, key['h_r'])
@@ -14,6 +14,7 @@ from charm.toolbox.ABEnc import ABEnc
 from policytree import PolicyParser
 from secretutil import SecretUtil
 from msp import MSP
+from policytemplate import PolicyTemplate
 import re, numpy, copy
 
 debug = False
@@ -24,6 +25,8 @@ class FABESA_CP(ABEnc):
         self.name = "Our CP-ABE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=3, exponentiations=3, fixed_pairings=4)
+        self.util.setPolicyCost(exponentiations=3, hashes=2)
    
     def setup(self):
         # pick parameters
@@ -52,11 +55,10 @@ class FABESA_CP(ABEnc):
         mskt_2 = r/msk['b_2']        
         
         for attr in attr_list:
-            x = attr_list.index(attr)
             attr_0 = '0' + attr
             attr_1 = '1' + attr
-            attrHash_0 = self.group.hash(attr_0, G1)
-            attrHash_1 = self.group.hash(attr_1, G1)
+            attrHash_0 = self.util.hash(attr_0, G1)
+            attrHash_1 = self.util.hash(attr_1, G1)
             sk_3[attr] = attrHash_0 ** mskt_1
             sk_4[attr] = attrHash_1 ** mskt_2      
                                       
@@ -66,7 +68,7 @@ class FABESA_CP(ABEnc):
         # Use MSP for access policy        
         policy = self.util.createPolicy(attr_policy)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         s_1, s_2 = self.group.random(ZR), self.group.random(ZR)
         s = s_1 + s_2
@@ -80,19 +82,19 @@ class FABESA_CP(ABEnc):
         ct_1 = {}
         
         # Using MSP
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['g_1'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
             attr_name_label = attr_stripped.split(':')[0]
             
             attr_stripped_0 = '0' + attr_stripped
             attr_stripped_1 = '1' + attr_stripped
             
-            attrHash_0 = self.group.hash(attr_stripped_0, G1)
-            attrHash_1 = self.group.hash(attr_stripped_1, G1)
+            attrHash_0 = self.util.hash(attr_stripped_0, G1)
+            attrHash_1 = self.util.hash(attr_stripped_1, G1)
             
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            tep = pk['g_1'] ** Mivtop 
+            tep = g_1_shares[attr]
             ct_1[attr]  = tep * (attrHash_0 ** s_1) * (attrHash_1 * s_2)
         
         ct_2 = pk['g_2'] ** s 
@@ -102,6 +104,47 @@ class FABESA_CP(ABEnc):
         
         return {'policy': policy, 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4, 'ct_5': ct_5}
 
+    def compile_encrypt(self, template):
+        # encrypt specialized to a policy template (string or PolicyTemplate): the returned
+        # encrypt(pk, msg, values) only binds the slot values, hashes them and runs the group operations
+        if not isinstance(template, PolicyTemplate):
+            template = self.util.compileTemplate(template)
+        num_cols = template.num_cols
+
+        def encrypt(pk, msg, values):
+            bound = template.bind(values)
+            if bound is None:
+                # two slots bound to the same attribute, label the duplicates through the string path
+                return self.encrypt(pk, msg, template.format(values))
+            policy, rows = bound
+
+            s_1, s_2 = self.group.random(ZR), self.group.random(ZR)
+            s = s_1 + s_2
+
+            # Pick random shares
+            v = [s]
+            for i in range(num_cols-1):
+                rand = self.group.random(ZR)
+                v.append(rand)
+
+            # one share per distinct row vector
+            tep = [pk['g_1'] ** share for share in self.util.computeSparseShares(template.groups, v)]
+
+            ct_1 = {}
+            for attr, attr_stripped, group in rows:
+                attrHash_0 = self.util.hash('0' + attr_stripped, G1)
+                attrHash_1 = self.util.hash('1' + attr_stripped, G1)
+                ct_1[attr] = tep[group] * (attrHash_0 ** s_1) * (attrHash_1 ** s_2)
+
+            ct_2 = pk['g_2'] ** s
+            ct_3 = pk['g_2^b_1'] ** s_1
+            ct_4 = pk['g_2^b_2'] ** s_2
+            ct_5 = pk['e_g1g2_a'] ** s * msg
+
+            return {'policy': policy, 'ct_1': ct_1, 'ct_2': ct_2, 'ct_3': ct_3, 'ct_4': ct_4, 'ct_5': ct_5}
+
+        return encrypt
+
     def decrypt(self, pk, ct, sk):
         # Match the policy and the attribute set
         nodes = self.util.prune(ct['policy'], sk['attr_list'])
@@ -111,6 +154,8 @@ class FABESA_CP(ABEnc):
             result = 0
             return result
                        
+        coeffs = self.util.getReconstructionCoefficients(ct['policy'], nodes)
+
         prod_ct_1 = 1
         prod_sk_3 = 1
         prod_sk_4 = 1
@@ -118,10 +163,11 @@ class FABESA_CP(ABEnc):
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
+            coeff = coeffs.get(attr)
                 
-            prod_ct_1 *= ct['ct_1'][attr]                                                                               
-            prod_sk_3 *= sk['sk_3'][attr_stripped]       
-            prod_sk_4 *= sk['sk_4'][attr_stripped]                                         
+            prod_ct_1 *= self.util.exp(ct['ct_1'][attr], coeff)
+            prod_sk_3 *= self.util.exp(sk['sk_3'][attr_stripped], coeff)
+            prod_sk_4 *= self.util.exp(sk['sk_4'][attr_stripped], coeff)
                                                   
         e1 = pair(prod_ct_1, sk['sk_1'])
         e2 = pair(sk['sk_2'], ct['ct_2'])
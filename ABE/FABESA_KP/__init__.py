@@ -14,6 +14,7 @@ from charm.toolbox.ABEnc import ABEnc
 from policytree import PolicyParser
 from secretutil import SecretUtil
 from msp import MSP
+from policytemplate import PolicyTemplate
 import re, numpy, copy
 
 debug = False
@@ -24,6 +25,8 @@ class FABESA_KP(ABEnc):
         self.name = "Our KP-ABE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)        
+        self.util.setRowCost(multiplications=4, exponentiations=4, fixed_pairings=4)
+        self.util.setPolicyCost(exponentiations=3, hashes=2)
 
     def setup(self):
 
@@ -45,7 +48,7 @@ class FABESA_KP(ABEnc):
 
         policy = self.util.createPolicy(attr_policy)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
  
         # pick randomness
         r = self.group.random(ZR)
@@ -66,23 +69,69 @@ class FABESA_KP(ABEnc):
         mskt_2 = r/msk['b_2']
         
         # Using MSP
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['g_1'], -r)
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
             
             attr_stripped_0 = '0' + attr_stripped
             attr_stripped_1 = '1' + attr_stripped
             
-            attrHash_0 = self.group.hash(attr_stripped_0, G1)
-            attrHash_1 = self.group.hash(attr_stripped_1, G1)
+            attrHash_0 = self.util.hash(attr_stripped_0, G1)
+            attrHash_1 = self.util.hash(attr_stripped_1, G1)
             
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            sk_2[attr] = pk['g_1'] ** (Mivtop - r)        
+            sk_2[attr] = g_1_shares[attr]
             sk_3[attr] = attrHash_0 ** mskt_1
             sk_4[attr] = attrHash_1 ** mskt_2
                        
         return {'policy': policy, 'sk_1': sk_1, 'sk_2': sk_2, 'sk_3': sk_3, 'sk_4': sk_4} 
 
+    def compile_keygen(self, template):
+        # keygen specialized to a policy template (string or PolicyTemplate): the returned
+        # keygen(pk, msk, values) only binds the slot values, hashes them and runs the group operations
+        if not isinstance(template, PolicyTemplate):
+            template = self.util.compileTemplate(template)
+        num_cols = template.num_cols
+
+        def keygen(pk, msk, values):
+            bound = template.bind(values)
+            if bound is None:
+                # two slots bound to the same attribute, label the duplicates through the string path
+                return self.keygen(pk, msk, template.format(values))
+            policy, rows = bound
+
+            # pick randomness
+            r = self.group.random(ZR)
+
+            # pick random shares
+            v = [msk['a']]
+            for i in range(num_cols-1):
+                rand = self.group.random(ZR)
+                v.append(rand)
+
+            sk_1 = pk['g_2'] ** r
+
+            # one share per distinct row vector
+            sk_2_group = [pk['g_1'] ** (share - r) for share in self.util.computeSparseShares(template.groups, v)]
+
+            sk_2 = {}
+            sk_3 = {}
+            sk_4 = {}
+
+            mskt_1 = r/msk['b_1']
+            mskt_2 = r/msk['b_2']
+
+            for attr, attr_stripped, group in rows:
+                attrHash_0 = self.util.hash('0' + attr_stripped, G1)
+                attrHash_1 = self.util.hash('1' + attr_stripped, G1)
+                sk_2[attr] = sk_2_group[group]
+                sk_3[attr] = attrHash_0 ** mskt_1
+                sk_4[attr] = attrHash_1 ** mskt_2
+
+            return {'policy': policy, 'sk_1': sk_1, 'sk_2': sk_2, 'sk_3': sk_3, 'sk_4': sk_4}
+
+        return keygen
+
     def encrypt(self, pk, msg, attr_list):
         # Pick Randomness
         s_1 = self.group.random(ZR)
@@ -94,8 +143,8 @@ class FABESA_KP(ABEnc):
         for attr in attr_list:
             attr_0 = '0' + attr
             attr_1 = '1' + attr
-            attrHash_0 = self.group.hash(attr_0, G1)
-            attrHash_1 = self.group.hash(attr_1, G1)
+            attrHash_0 = self.util.hash(attr_0, G1)
+            attrHash_1 = self.util.hash(attr_1, G1)
             ct_1[attr] = tep * (attrHash_0 ** s_1) * (attrHash_1 ** s_2)
      
         ct_2 = pk['g_2'] ** s              
@@ -114,6 +163,8 @@ class FABESA_KP(ABEnc):
             result = 0
             return result
               
+        coeffs = self.util.getReconstructionCoefficients(sk['policy'], nodes)
+
         prod_ct_1 = 1
         prod_sk_2 = 1
         prod_sk_3 = 1
@@ -122,11 +173,12 @@ class FABESA_KP(ABEnc):
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
+            coeff = coeffs.get(attr)
 
-            prod_ct_1 *= ct['ct_1'][attr_stripped]                   
-            prod_sk_2 *= sk['sk_2'][attr]                    
-            prod_sk_3 *= sk['sk_3'][attr]
-            prod_sk_4 *= sk['sk_4'][attr]  
+            prod_ct_1 *= self.util.exp(ct['ct_1'][attr_stripped], coeff)
+            prod_sk_2 *= self.util.exp(sk['sk_2'][attr], coeff)
+            prod_sk_3 *= self.util.exp(sk['sk_3'][attr], coeff)
+            prod_sk_4 *= self.util.exp(sk['sk_4'][attr], coeff)
                     
         e1 = pair(prod_ct_1, sk['sk_1'])
         e2 = pair(prod_sk_2, ct['ct_2'])   
@@ -28,6 +28,12 @@ class AC17CPABE(ABEnc):
         self.group = group_obj
         self.assump_size = assump_size  # size of linear assumption, at least 2
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=2 * (assump_size + 1),
+                             exponentiations=2 * (assump_size + 1),
+                             fixed_pairings=2 * (assump_size + 1))
+        self.util.setPolicyCost(exponentiations=assump_size * (assump_size + 1),
+                                hashes=assump_size * (assump_size + 1),
+                                column_exponentiations=assump_size * (assump_size + 1))
 
     def setup(self):
         """
@@ -120,7 +126,7 @@ class AC17CPABE(ABEnc):
                 a_t = A[t]
                 for l in range(self.assump_size + 1):
                     input_for_hash = attr + str(l) + str(t)
-                    prod *= (self.group.hash(input_for_hash, G1) ** (Br[l]/a_t))
+                    prod *= (self.util.hash(input_for_hash, G1) ** (Br[l]/a_t))
                 prod *= (g ** (sigma_attr/a_t))
                 key.append(prod)
             key.append(g ** (-sigma_attr))
@@ -135,7 +141,7 @@ class AC17CPABE(ABEnc):
             a_t = A[t]
             for l in range(self.assump_size + 1):
                 input_for_hash = '01' + str(l) + str(t)
-                prod *= (self.group.hash(input_for_hash, G1) ** (Br[l] / a_t))
+                prod *= (self.util.hash(input_for_hash, G1) ** (Br[l] / a_t))
             prod *= (g ** (sigma / a_t))
             Kp.append(prod)
         Kp.append(g_k[self.assump_size] * (g ** (-sigma)))
@@ -152,7 +158,7 @@ class AC17CPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         s = []
@@ -181,25 +187,24 @@ class AC17CPABE(ABEnc):
                 input_for_hash2 = input_for_hash1 + str(l)
                 for t in range(self.assump_size):
                     input_for_hash3 = input_for_hash2 + str(t)
-                    hashed_value = self.group.hash(input_for_hash3, G1)
+                    hashed_value = self.util.hash(input_for_hash3, G1)
                     y.append(hashed_value)
                     # if debug: print ('Hash of', i+2, ',', j2, ',', j1, 'is', hashed_value)
                 x.append(y)
             hash_table.append(x)
 
         C = {}
-        for attr, row in mono_span_prog.items():
+        for attr, row in mono_span_prog.sparseItems():
             ct = []
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
             for l in range(self.assump_size + 1):
                 prod = 1
-                cols = len(row)
                 for t in range(self.assump_size):
                     input_for_hash = attr_stripped + str(l) + str(t)
-                    prod1 = self.group.hash(input_for_hash, G1)
-                    for j in range(cols):
+                    prod1 = self.util.hash(input_for_hash, G1)
+                    for j, x in row:
                         # input_for_hash = '0' + str(j+1) + str(l) + str(t)
-                        prod1 *= (hash_table[j][l][t] ** row[j])
+                        prod1 = self.util.mulExp(prod1, hash_table[j][l][t], x)
                     prod *= (prod1 ** s[t])
                 ct.append(prod)
             C[attr] = ct
@@ -226,6 +231,8 @@ class AC17CPABE(ABEnc):
             result = 0
             return result            
             
+        coeffs = self.util.getReconstructionCoefficients(ctxt['policy'], nodes)
+
         prod1_GT = 1
         prod2_GT = 1
         for i in range(self.assump_size + 1):
@@ -234,10 +241,9 @@ class AC17CPABE(ABEnc):
             for node in nodes:
                 attr = node.getAttributeAndIndex()
                 attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-                # prod_H *= key['K'][attr_stripped][i] ** coeff[attr]
-                # prod_G *= ctxt['C'][attr][i] ** coeff[attr]
-                prod_H *= key['K'][attr_stripped][i]
-                prod_G *= ctxt['C'][attr][i]
+                coeff = coeffs.get(attr)
+                prod_H *= self.util.exp(key['K'][attr_stripped][i], coeff)
+                prod_G *= self.util.exp(ctxt['C'][attr][i], coeff)
             prod1_GT *= pair(key['Kp'][i] * prod_H, ctxt['C_0'][i])
             prod2_GT *= pair(prod_G, key['K_0'][i])
 
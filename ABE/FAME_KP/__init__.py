@@ -28,6 +28,12 @@ class AC17KPABE(ABEnc):
         self.group = group_obj
         self.assump_size = assump_size  # size of linear assumption, at least 2
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=2 * (assump_size + 1),
+                             exponentiations=2 * (assump_size + 1),
+                             fixed_pairings=2 * (assump_size + 1))
+        self.util.setPolicyCost(exponentiations=assump_size + 1,
+                                hashes=assump_size * (assump_size + 1),
+                                column_exponentiations=assump_size + 1)
 
     def setup(self):
         """
@@ -109,7 +115,7 @@ class AC17KPABE(ABEnc):
                 prod = 1
                 for t in range(self.assump_size):
                     input_for_hash = attr + str(l) + str(t)
-                    prod *= (self.group.hash(input_for_hash, G1) ** (s[t]))
+                    prod *= (self.util.hash(input_for_hash, G1) ** (s[t]))
                 ct.append(prod)
             C[attr] = ct
 
@@ -132,7 +138,7 @@ class AC17KPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         r = []
@@ -164,7 +170,7 @@ class AC17KPABE(ABEnc):
                 input_for_hash2 = input_for_hash1 + str(l)
                 for t in range(self.assump_size):
                     input_for_hash3 = input_for_hash2 + str(t)
-                    hashed_value = self.group.hash(input_for_hash3, G1)
+                    hashed_value = self.util.hash(input_for_hash3, G1)
                     y.append(hashed_value)
                     # if debug: print ('Hash of', i+2, ',', j2, ',', j1, 'is', hashed_value)
                 x.append(y)
@@ -177,30 +183,31 @@ class AC17KPABE(ABEnc):
             sigmaCol.append(rand)
 
         K = {}
-        for attr, row in mono_span_prog.items():
+        for attr, row in mono_span_prog.sparseItems():
             sk = []
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-            cols = len(row)
+            row_0 = row[0][1] if row and row[0][0] == 0 else 0
+            row_2 = [(j, x) for j, x in row if j >= 2]     # the entries from column 2 on
             sigma_attr = self.group.random(ZR)
             for t in range(self.assump_size):
-                prod = msk['g'] ** (sigma_attr/msk['A'][t])
-                prod *= (msk['g_k'][t] ** row[0])
+                # the powers of g folded into one exponent, for sigma_attr and sigma'
+                exp = sigma_attr/msk['A'][t]
+                for j, x in row_2:
+                    # compute exponent for sigma'
+                    exp += (sigmaCol[j]/msk['A'][t]) * x
+                prod = self.util.mulExp(msk['g'] ** exp, msk['g_k'][t], row_0)
                 for l in range(self.assump_size+1):
                     input_for_hash = attr_stripped + str(l) + str(t)
-                    prod1 = self.group.hash(input_for_hash, G1)
-                    for j in range(2,cols):
+                    prod1 = self.util.hash(input_for_hash, G1)
+                    for j, x in row_2:
                         # input_for_hash = '0' + str(j+1) + str(l) + str(t)
-                        prod1 *= (hash_table[j][l][t] ** row[j])
+                        prod1 = self.util.mulExp(prod1, hash_table[j][l][t], x)
                     prod *= (prod1 ** (Br[l]/msk['A'][t]))
-                exp = 0
-                for j in range(2,cols):
-                    # compute exponent for sigma'
-                    exp += (sigmaCol[j]/msk['A'][t]) * row[j]
-                prod *= msk['g'] ** exp
                 sk.append(prod)
-            sk3 = msk['g'] ** (-sigma_attr) * msk['g_k'][self.assump_size] ** row[0]
-            for j in range(2,cols):
-                sk3 *= msk['g'] ** (sigmaCol[j]*row[j])
+            exp = -sigma_attr
+            for j, x in row_2:
+                exp += sigmaCol[j]*x
+            sk3 = self.util.mulExp(msk['g'] ** exp, msk['g_k'][self.assump_size], row_0)
             sk.append(sk3)
             K[attr] = sk
 
@@ -221,6 +228,8 @@ class AC17KPABE(ABEnc):
             result = 0
             return result
 
+        coeffs = self.util.getReconstructionCoefficients(key['policy'], nodes)
+
         prod1_GT = 1
         prod2_GT = 1
         for i in range(self.assump_size + 1):
@@ -229,8 +238,9 @@ class AC17KPABE(ABEnc):
             for node in nodes:
                 attr = node.getAttributeAndIndex()
                 attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-                prod_H *= key['K'][attr][i]
-                prod_G *= ctxt['C'][attr_stripped][i]
+                coeff = coeffs.get(attr)
+                prod_H *= self.util.exp(key['K'][attr][i], coeff)
+                prod_G *= self.util.exp(ctxt['C'][attr_stripped][i], coeff)
             prod1_GT *= pair(prod_H, ctxt['C_0'][i])
             prod2_GT *= pair(prod_G, key['K_0'][i])
             
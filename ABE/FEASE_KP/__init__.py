@@ -24,6 +24,8 @@ class FEASE23KPABE(ABEnc):
         self.name = "FEASE KP-ABE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)     
+        self.util.setRowCost(multiplications=3, exponentiations=3, fixed_pairings=3)
+        self.util.setPolicyCost(exponentiations=4, hashes=1)
 
     def setup(self):
         # pick parameters
@@ -45,7 +47,7 @@ class FEASE23KPABE(ABEnc):
         # convert the policy from string to Bin.node format
         policy = self.util.createPolicy(attr_policy)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
         
         # pick randomness
         r = self.group.random(ZR)
@@ -64,12 +66,12 @@ class FEASE23KPABE(ABEnc):
         skt_2 = 1/msk['b_2']    
         
         #Using MSP
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, v)
+        g_1_shares = self.util.sharePowers(mono_span_prog, shares, pk['g_1'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)         
-            attrHash = self.group.hash(attr_stripped, G1)
-            len_row = len(row)
-            Mivtop = sum(i[0] * i[1] for i in zip(row, v[:len_row]))
-            tep = pk['g_1'] ** Mivtop * attrHash ** r
+            attrHash = self.util.hash(attr_stripped, G1)
+            tep = g_1_shares[attr] * attrHash ** r
             sk_2[attr] = tep ** skt_1
             sk_3[attr] = tep ** skt_2
                         
@@ -84,7 +86,7 @@ class FEASE23KPABE(ABEnc):
         ct_1 = {}
         for attr in attr_list:
             x = attr_list.index(attr)
-            attrHash = self.group.hash(attr, G1)
+            attrHash = self.util.hash(attr, G1)
             ct_1[attr] = attrHash ** s
                 
         ct_2 = pk['g_2^b_1'] ** s_1
@@ -102,6 +104,8 @@ class FEASE23KPABE(ABEnc):
             result = 0
             return result
               
+        coeffs = self.util.getReconstructionCoefficients(sk['policy'], nodes)
+
         prod_ct_1 = 1
         prod_sk_2 = 1
         prod_sk_3 = 1
@@ -109,10 +113,11 @@ class FEASE23KPABE(ABEnc):
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
+            coeff = coeffs.get(attr)
                
-            prod_ct_1 *= ct['ct_1'][attr_stripped]  
-            prod_sk_2 *= sk['sk_2'][attr]
-            prod_sk_3 *= sk['sk_3'][attr]
+            prod_ct_1 *= self.util.exp(ct['ct_1'][attr_stripped], coeff)
+            prod_sk_2 *= self.util.exp(sk['sk_2'][attr], coeff)
+            prod_sk_3 *= self.util.exp(sk['sk_3'][attr], coeff)
                                                                
         e1 = pair(prod_ct_1, sk['sk_1'])
         e2 = pair(prod_sk_2, ct['ct_2'])
@@ -25,6 +25,8 @@ class ABGW17CPABE(ABEnc):
         self.name = "ABGW17 CP-ABE"
         self.group = groupObj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=1, multiplications=3, exponentiations=3, fixed_pairings=2)
+        self.util.setPolicyCost(exponentiations=5)
 
     def setup(self):
         """
@@ -93,7 +95,7 @@ class ABGW17CPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         s0 = self.group.random(ZR)
@@ -105,20 +107,21 @@ class ABGW17CPABE(ABEnc):
         C_0 = {}
         C_1 = {}
         C_2 = {}
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, U)
+        g_shares = self.util.sharePowers(mono_span_prog, shares, pk['g'])
+        W_shares = self.util.sharePowers(mono_span_prog, shares, pk['W'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-            cols = len(row)
 
             # compute the [si(b1+xb2)]_1 term
             si = self.group.random(ZR)
             C_0[attr] = (pk['B1'] * (pk['B2'] ** int(attr_stripped))) ** si
 
             # compute the [M^T_i (s,u)]_1 term
-            MuT = sum(i[0] * i[1] for i in zip(row, U[:cols]))
-            C_1[attr] = pk['g'] ** MuT
+            C_1[attr] = g_shares[attr]
 
             # compute the [-vsi + w M^T_i (s,u)]_1 term
-            C_2[attr] = pk['V']**(-si) * pk['W'] ** MuT
+            C_2[attr] = pk['V']**(-si) * W_shares[attr]
 
         # compute the e(g,h)^(as0) term
         Cx = pk['e_gh_A'] ** s0 * msg
@@ -138,6 +141,8 @@ class ABGW17CPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(ctxt['policy'], nodes)
+
         prod1 = 1
         prodC1 = 1
         prodC2 = 1
@@ -145,9 +150,10 @@ class ABGW17CPABE(ABEnc):
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-            prod1 *= pair(ctxt['C_0'][attr], key['K'][attr_stripped])
-            prodC1 *= ctxt['C_1'][attr]
-            prodC2 *= ctxt['C_2'][attr]
+            coeff = coeffs.get(attr)
+            prod1 *= pair(self.util.exp(ctxt['C_0'][attr], coeff), key['K'][attr_stripped])
+            prodC1 *= self.util.exp(ctxt['C_1'][attr], coeff)
+            prodC2 *= self.util.exp(ctxt['C_2'][attr], coeff)
 
         kem = prod1 * pair(prodC1, key['K_1']) * pair(prodC2, key['K_0'])
 
@@ -26,6 +26,8 @@ class ABGW17KPABE(ABEnc):
         self.name = "ABGW17 KP-ABE"
         self.group = groupObj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=2, multiplications=2, exponentiations=2, fixed_pairings=0)
+        self.util.setPolicyCost(exponentiations=2)
 
     def setup(self):
         """
@@ -68,7 +70,7 @@ class ABGW17KPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         R = [msk['alpha']]
@@ -78,13 +80,14 @@ class ABGW17KPABE(ABEnc):
         
         K_0 = {}
         K_1 = {}
-        for attr, row in mono_span_prog.items():
+        shares = self.util.computeShares(mono_span_prog, R)
+        h_shares = self.util.sharePowers(mono_span_prog, shares, msk['h'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-            cols = len(row)
 
             # compute the [M^T_j (a,r)]_2 term
-            exp = sum(i[0] * i[1] for i in zip(row, R[:cols]))
-            K_0[attr] = msk['h'] ** exp
+            exp = shares[attr]
+            K_0[attr] = h_shares[attr]
 
             # compute the [M^T_j (a,r) / (b1+rho(j)b2)]_2 term
             exp2 = msk['b1'] + int(attr_stripped)*msk['b2']
@@ -134,13 +137,16 @@ class ABGW17KPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(key['policy'], nodes)
+
         prod1 = 1
         prod2 = 1
 
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-            prod1 *= pair(ctxt['C_0'][attr_stripped], key['K_0'][attr])
-            prod2 *= pair(ctxt['C_1'][attr_stripped], key['K_1'][attr])
+            coeff = coeffs.get(attr)
+            prod1 *= pair(ctxt['C_0'][attr_stripped], self.util.exp(key['K_0'][attr], coeff))
+            prod2 *= pair(ctxt['C_1'][attr_stripped], self.util.exp(key['K_1'][attr], coeff))
 
         return ctxt['Cx'] / (prod1 * prod2)
@@ -28,6 +28,8 @@ class BSW07CPABE(ABEnc):
         self.name = "BSW07 CP-ABE"
         self.group = group_obj
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=2, multiplications=2, exponentiations=2, fixed_pairings=1)
+        self.util.setPolicyCost(exponentiations=2, hashes=1)
 
     def setup(self):
         """
@@ -69,7 +71,7 @@ class BSW07CPABE(ABEnc):
         K = {}
         for attr in attr_list:
             r_attr = self.group.random(ZR)
-            k_attr1 = g1_r * (self.group.hash(str(attr), G1) ** r_attr)
+            k_attr1 = g1_r * (self.util.hash(str(attr), G1) ** r_attr)
             k_attr2 = pk['g2'] ** r_attr
             K[attr] = (k_attr1, k_attr2)
 
@@ -85,7 +87,7 @@ class BSW07CPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         u = []
@@ -97,14 +99,13 @@ class BSW07CPABE(ABEnc):
         c0 = pk['h'] ** s
 
         C = {}
-        for attr, row in mono_span_prog.items():
-            cols = len(row)
-            sum = 0
-            for i in range(cols):
-                sum += row[i] * u[i]
+        shares = self.util.computeShares(mono_span_prog, u)
+        g2_shares = self.util.sharePowers(mono_span_prog, shares, pk['g2'])
+        for attr, row in mono_span_prog.sparseItems():
+            sum = shares[attr]
             attr_stripped = self.util.strip_index(attr)
-            c_i1 = pk['g2'] ** sum
-            c_i2 = self.group.hash(str(attr_stripped), G1) ** sum
+            c_i1 = g2_shares[attr]
+            c_i2 = self.util.hash(str(attr_stripped), G1) ** sum
             C[attr] = (c_i1, c_i2)
 
         c_m = (pk['e_gg_alpha'] ** s) * msg
@@ -124,13 +125,16 @@ class BSW07CPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(ctxt['policy'], nodes)
+
         prod = 1
 
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)
+            coeff = coeffs.get(attr)
             (c_attr1, c_attr2) = ctxt['C'][attr]
             (k_attr1, k_attr2) = key['K'][attr_stripped]
-            prod *= (pair(k_attr1, c_attr1) / pair(c_attr2, k_attr2))
+            prod *= (pair(self.util.exp(k_attr1, coeff), c_attr1) / pair(self.util.exp(c_attr2, coeff), k_attr2))
 
         return (ctxt['c_m'] * prod) / (pair(key['k0'], ctxt['c0']))
@@ -29,6 +29,11 @@ class CGW15CPABE(ABEnc):
         self.assump_size = assump_size  # size of the linear assumption
         self.uni_size = uni_size  # bound on the size of the universe of attributes
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=2 * (assump_size + 1),
+                             exponentiations=2 * (assump_size + 1),
+                             fixed_pairings=2 * (assump_size + 1))
+        self.util.setPolicyCost(exponentiations=assump_size * (assump_size + 1),
+                                column_exponentiations=assump_size + 1)
 
     def setup(self):
         """
@@ -179,7 +184,7 @@ class CGW15CPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         s = []
@@ -219,18 +224,18 @@ class CGW15CPABE(ABEnc):
         # compute the [(V^T As||U^T_2 As||...||U^T_cols As) M^T_i + W^T_i As]_1 terms
         C = {}
         g_WA = pk['g_WA']
-        for attr, row in mono_span_prog.items():
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
             ct = []
             for j1 in range(self.assump_size + 1):
-                cols = len(row)
-                prod1 = VAs[j1] ** row[0]
-                for j2 in range(1, cols):
-                    prod1 *= UAs[j2][j1] ** row[j2]
                 prod2 = 1
                 for j2 in range(self.assump_size):
                     prod2 *= g_WA[int(attr_stripped)][j1][j2] ** s[j2]
-                ct.append(prod1 * prod2)
+                # the row entries multiplied into prod2, so a -1 is a division rather than an inversion
+                prod1 = prod2
+                for j2, x in row:
+                    prod1 = self.util.mulExp(prod1, VAs[j1] if j2 == 0 else UAs[j2][j1], x)
+                ct.append(prod1)
             C[attr] = ct
 
         # compute the e(g, h)^(k^T As) . m term
@@ -254,6 +259,8 @@ class CGW15CPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(ctxt['policy'], nodes)
+
         prod1_GT = 1
         prod2_GT = 1
         for i in range(self.assump_size + 1):
@@ -262,10 +269,9 @@ class CGW15CPABE(ABEnc):
             for node in nodes:
                 attr = node.getAttributeAndIndex()
                 attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-                # prod_H *= D['K'][attr_stripped][i] ** coeff[attr]
-                # prod_G *= E['C'][attr][i] ** coeff[attr]
-                prod_H *= key['K'][attr_stripped][i]
-                prod_G *= ctxt['C'][attr][i]
+                coeff = coeffs.get(attr)
+                prod_H *= self.util.exp(key['K'][attr_stripped][i], coeff)
+                prod_G *= self.util.exp(ctxt['C'][attr][i], coeff)
             prod1_GT *= pair(ctxt['C_0'][i], key['Kp'][i] * prod_H)
             prod2_GT *= pair(prod_G, key['K_0'][i])
 
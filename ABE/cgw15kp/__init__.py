@@ -29,6 +29,11 @@ class CGW15KPABE(ABEnc):
         self.assump_size = assump_size  # size of the linear assumption
         self.uni_size = uni_size  # bound on the size of the universe of attributes
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(multiplications=2 * (assump_size + 1),
+                             exponentiations=2 * (assump_size + 1),
+                             fixed_pairings=2 * (assump_size + 1))
+        self.util.setPolicyCost(exponentiations=assump_size + 1,
+                                column_exponentiations=assump_size + 1)
 
     def setup(self):
         """
@@ -167,7 +172,7 @@ class CGW15KPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         r = []
@@ -201,14 +206,13 @@ class CGW15KPABE(ABEnc):
 
         # compute the [(k||U_2 Br||...||U_cols Br) M^T_i + W_i Br]_1 terms
         K = {}
-        for attr, row in mono_span_prog.items():
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-            num_cols = len(row)
             key = []
             for j1 in range(self.assump_size + 1):
-                sum1 = msk['k'][j1] * row[0]
-                for i in range(1,num_cols):
-                    sum1 += UBr[i][j1] * row[i]
+                sum1 = 0
+                for i, x in row:
+                    sum1 += (msk['k'][j1] if i == 0 else UBr[i][j1]) * x
                 for j2 in range(self.assump_size + 1):
                     sum1 += msk['W'][int(attr_stripped)][j1][j2] * Br[j2]
                 key.append(h ** sum1)
@@ -229,6 +233,8 @@ class CGW15KPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(key['policy'], nodes)
+
         prod1_GT = 1
         prod2_GT = 1
         for i in range(self.assump_size + 1):
@@ -237,8 +243,9 @@ class CGW15KPABE(ABEnc):
             for node in nodes:
                 attr = node.getAttributeAndIndex()
                 attr_stripped = self.util.strip_index(attr)  # no need, re-use not allowed
-                prod_H *= key['K'][attr][i]
-                prod_G *= ctxt['C'][attr_stripped][i]
+                coeff = coeffs.get(attr)
+                prod_H *= self.util.exp(key['K'][attr][i], coeff)
+                prod_G *= self.util.exp(ctxt['C'][attr_stripped][i], coeff)
             prod1_GT *= pair(ctxt['C_0'][i], prod_H)
             prod2_GT *= pair(prod_G, key['K_0'][i])
 
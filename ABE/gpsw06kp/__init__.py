@@ -28,6 +28,8 @@ class GPSW06KPABE(ABEnc):
         self.group = group_obj
         self.uni_size = uni_size  # bound on the size of the universe of attributes
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=1, multiplications=1, exponentiations=1, fixed_pairings=0)
+        self.util.setPolicyCost(exponentiations=1)
 
     def setup(self):
         """
@@ -83,7 +85,7 @@ class GPSW06KPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         u = [msk['alpha']]
@@ -92,11 +94,9 @@ class GPSW06KPABE(ABEnc):
             u.append(rand)
 
         k = {}
-        for attr, row in mono_span_prog.items():
-            cols = len(row)
-            sum = 0
-            for i in range(cols):
-                sum += row[i] * u[i]
+        shares = self.util.computeShares(mono_span_prog, u)
+        for attr, row in mono_span_prog.sparseItems():
+            sum = shares[attr]
             attr_stripped = self.util.strip_index(attr)
             di = msk['g2'] ** (sum/msk['t'][int(attr_stripped)])
             k[attr] = di
@@ -116,11 +116,13 @@ class GPSW06KPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(key['policy'], nodes)
+
         prodGT = 1
 
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)
-            prodGT *= pair(ctxt['cy'][attr_stripped],key['k'][attr])
+            prodGT *= pair(self.util.exp(ctxt['cy'][attr_stripped], coeffs.get(attr)),key['k'][attr])
 
         return (ctxt['c0'] / prodGT)
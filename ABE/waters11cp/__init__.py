@@ -29,6 +29,8 @@ class Waters11CPABE(ABEnc):
         self.group = group_obj
         self.uni_size = uni_size  # bound on the size of the universe of attributes
         self.util = MSP(self.group, verbose)
+        self.util.setRowCost(pairings=1, multiplications=2, exponentiations=2, fixed_pairings=2)
+        self.util.setPolicyCost(exponentiations=3, hashes=1)
 
     def setup(self):
         """
@@ -84,7 +86,7 @@ class Waters11CPABE(ABEnc):
 
         policy = self.util.createPolicy(policy_str)
         mono_span_prog = self.util.convert_policy_to_msp(policy)
-        num_cols = self.util.len_longest_row
+        num_cols = mono_span_prog.num_cols
 
         # pick randomness
         u = []
@@ -97,14 +99,12 @@ class Waters11CPABE(ABEnc):
 
         C = {}
         D = {}
-        for attr, row in mono_span_prog.items():
-            cols = len(row)
-            sum = 0
-            for i in range(cols):
-                sum += row[i] * u[i]
+        shares = self.util.computeShares(mono_span_prog, u)
+        g1_a_shares = self.util.sharePowers(mono_span_prog, shares, pk['g1_a'])
+        for attr, row in mono_span_prog.sparseItems():
             attr_stripped = self.util.strip_index(attr)
             r_attr = self.group.random(ZR)
-            c_attr = (pk['g1_a'] ** sum) / (pk['h'][int(attr_stripped)] ** r_attr)
+            c_attr = g1_a_shares[attr] / (pk['h'][int(attr_stripped)] ** r_attr)
             d_attr = pk['g2'] ** r_attr
             C[attr] = c_attr
             D[attr] = d_attr
@@ -126,13 +126,16 @@ class Waters11CPABE(ABEnc):
             print ("Policy not satisfied.")
             return None
 
+        coeffs = self.util.getReconstructionCoefficients(ctxt['policy'], nodes)
+
         prodG = 1
         prodGT = 1
 
         for node in nodes:
             attr = node.getAttributeAndIndex()
             attr_stripped = self.util.strip_index(attr)
-            prodG *= ctxt['C'][attr]
-            prodGT *= pair(key['K'][attr_stripped], ctxt['D'][attr])
+            coeff = coeffs.get(attr)
+            prodG *= self.util.exp(ctxt['C'][attr], coeff)
+            prodGT *= pair(self.util.exp(key['K'][attr_stripped], coeff), ctxt['D'][attr])
 
         return (ctxt['c_m'] * pair(prodG, key['L']) * prodGT) / (pair(key['k0'], ctxt['c0']))
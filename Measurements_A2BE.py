@@ -6,6 +6,7 @@ from charm.toolbox.pairinggroup import PairingGroup, GT
 from policytree import PolicyParser
 from secretutil import SecretUtil
 from msp import MSP
+from policyanalysis import countSubsets
 
 from A2BE.FABESA_KP import FABESA_KP
 from A2BE.FABESA_CP import FABESA_CP
@@ -125,7 +126,7 @@ def run_kpabe(pairing_group, attr_list, attr_policy, msg):
     kpabe_3 = FEASE_KP(pairing_group)
     kpabe_3_times, subsets_3 = measure_average_times_kpabe(kpabe_3, attr_list, attr_policy, msg)     
                     
-    n1, n2, m, i = get_par(pairing_group, attr_policy, attr_list, subsets_1)
+    n1, n2, m, i = get_par(pairing_group, attr_policy, attr_list)
     print('\n')
     print('*'*62)
     print('Running times (ms) curve BN254: n1={}  n2={}  m={}  i={}'.format(n1, n2, m, i))
@@ -159,7 +160,7 @@ def run_cpabe(pairing_group, attr_list, attr_policy, msg):
     cpabe_2 = CDWL16_CP(pairing_group)
     cpabe_2_times, subsets_2 = measure_average_times_cpabe(cpabe_2, attr_list, attr_policy, msg)   
                  
-    n1, n2, m, i = get_par(pairing_group, attr_policy, attr_list, subsets_1)
+    n1, n2, m, i = get_par(pairing_group, attr_policy, attr_list)
     print('\n')
     print('*'*62)
     print('Running times (ms) curve BN254: n1={}  n2={}  m={}  i={}'.format(n1, n2, m, i))
@@ -184,19 +185,67 @@ def run_cpabe(pairing_group, attr_list, attr_policy, msg):
         f.write('*' * 62 + '\n')            
     return          
 
+def run_policy_views(pairing_group, policy_sizes, msg, N=20):
+    # cost per keygen/encrypt of the stripped (names only) policy: deepcopy + policy_strip on every
+    # call as before (deepcopy recurses, so the policies stay below the recursion limit), against the
+    # names view stored with the compiled policy
+    util = SecretUtil(pairing_group)
+    parser = PolicyParser()
+    print('\n')
+    print('*'*62)
+    print('Stripped policy per call (ms) curve BN254')
+    print('*'*62)
+    header = '{:<10}'.format('Policy') + '{:>12}'.format('deepcopy') + '{:>10}'.format('view') \
+             + '{:>12}'.format('KP KeyGen') + '{:>10}'.format('CP Enc')
+    print('-'*62)
+    print(header)
+    print('-'*62)
+    records = []
+    for policy_size in policy_sizes:
+        attr_policy = ' or '.join('KEYWORD{}:{}'.format(i, random.choice(range(1, 1000))) for i in range(policy_size))
+        attr_list = [attr_policy.split(' or ')[0]]
+
+        start = time.time()
+        for i in range(N):
+            policy_name = copy.deepcopy(util.createPolicy(attr_policy))
+            parser.policy_strip(policy_name)
+        time_deepcopy = (time.time() - start)/N
+        start = time.time()
+        for i in range(N):
+            policy_name = util.compilePolicy(attr_policy).names
+        time_view = (time.time() - start)/N
+
+        kpabe_times, subsets = measure_average_times_kpabe(FABESA_KP(pairing_group), attr_list, attr_policy, msg)
+        cpabe_times, subsets = measure_average_times_cpabe(FABESA_CP(pairing_group), attr_list, attr_policy, msg)
+        record = '{:<10}'.format(policy_size) + '  ' + format(time_deepcopy*1000, '10.3f') + '  ' \
+                 + format(time_view*1000, '8.3f') + '  ' + format(kpabe_times[1]*1000, '10.2f') + '  ' \
+                 + format(cpabe_times[2]*1000, '8.2f')
+        print(record)
+        records.append(record)
+    print('-'*62)
+
+    with open('Results/A2BE policy views - BN254.txt', 'a') as f:
+        f.write('Stripped policy per call (ms) curve BN254' + '\n')
+        f.write(header + '\n')
+        for record in records:
+            f.write(record + '\n')
+        f.write('*' * 62 + '\n')
+    return
+
 # ------------------------------------------------------ get parameters module ------------------------------------------------
 # get parameters of the monotone span program
-def get_par(pairing_group, attr_policy, attr_list, subsets):      
+def get_par(pairing_group, attr_policy, attr_list):      
     util = SecretUtil(pairing_group) 
-    attr_policy = util.createPolicy(attr_policy)   # convert the policy from string to Bin.node format     
+    compiled_policy = util.compilePolicy(attr_policy)   # convert the policy from string to Bin.node format     
+    attr_policy = compiled_policy.tree
      
     msp_obj = MSP(pairing_group)
     mono_span_prog = msp_obj.convert_policy_to_msp(attr_policy)
     
     n1 = len(mono_span_prog) # number of rows
-    n2 = msp_obj.len_longest_row # number of columns
+    n2 = mono_span_prog.num_cols # number of columns
     m = len(attr_list) # number of keywords  
-    i = len(subsets)
+    i = countSubsets(compiled_policy.names, set(util.keywords_strip(attr_list))) # number of candidate subsets, decrypt enumerates them lazily
 
     return n1, n2, m, i
 
@@ -257,6 +306,8 @@ def main():
             attr_list, attr_policy = create_list_and_policy(size_k, size_p)
             run_kpabe(pairing_group, attr_list, attr_policy, msg)
             run_cpabe(pairing_group, attr_list, attr_policy, msg)
+
+    run_policy_views(pairing_group, [10, 50, 100], msg)
       
 if __name__ == "__main__":
     debug = True
@@ -249,7 +249,7 @@ def get_par(pairing_group, policy_str, attr_list):
     nodes = msp_obj.prune(policy, attr_list)
 
     n1 = len(mono_span_prog) # number of rows
-    n2 = msp_obj.len_longest_row # number of columns
+    n2 = mono_span_prog.num_cols # number of columns
     m = len(attr_list) # number of attributes
     i = len(nodes) # number of attributes in decryption
 
@@ -0,0 +1,734 @@
+'''
+:Date:            10/2026
+'''
+
+from charm.toolbox.pairinggroup import PairingGroup, GT, ZR, G1
+from charm.toolbox.policytree import PolicyParser as PyparsingPolicyParser
+from charm.toolbox.node import BinNode, OpType
+from policytree import PolicyParser, getChildren, postOrder, expandAttributes
+from msp import MSP
+from policycache import PolicyCache, policy_cache, setNumericBits
+from attributeregistry import attribute_registry
+from policymatch import MatchIndex
+from mspcache import MSPCache, compileMSP
+from policyanalysis import PolicyLimits, PolicyTooComplex
+from subsetorder import SmallestFirst, HitRateOrder, PriorOrder
+from trialbudget import TrialBudget
+from lsss import importLSSS, exportLSSS, reconstructionVector
+from hashcache import hash_cache
+from smallexp import ExpStats, SMALL_BITS, power, mulPower
+
+from ABE.FABESA_CP import FABESA_CP
+from ABE.FABESA_KP import FABESA_KP
+from ABE.FABEO_CP import FABEO22CPABE
+from ABE.bsw07cp import BSW07CPABE
+from ABE.gpsw06kp import GPSW06KPABE
+from ABE.FAME_CP import AC17CPABE
+from ABE.cgw15cp import CGW15CPABE
+from ABE.FAME_KP import AC17KPABE
+from ABE.cgw15kp import CGW15KPABE
+from A2BE.FABESA_CP import FABESA_CP as FABESA_CP_A2BE
+from Measurements_ABE import measure_average_times_kpabe, measure_average_times_cpabe, get_par
+
+import copy, itertools, random, tracemalloc
+import time
+
+# the columns of measure_average_times_kpabe / measure_average_times_cpabe, as formatted by format_times(times, 9)
+TIMES_HEADER = '    Setup    KeyGen     Enc      Dec'
+
+#--------------------------------------------------- Measure average time module ----------------------------------------------
+def measure_average_time(run, N=1):
+    # the average running time of run(i) for i in range(N), in seconds
+    start = time.time()
+    for i in range(N):
+        run(i)
+    return (time.time() - start)/N
+
+def measure_average_parse_time(parser, policy_str, N=5):
+    try:
+        return measure_average_time(lambda i: parser.parse(policy_str), N)
+    except RecursionError:
+        return None
+
+def measure_fabesa(pairing_group, form, attr_list, policy_str, msg):
+    # FABESA KP and CP running times of a policy, a record each with its MSP rows and columns
+    n1, n2, m, i = get_par(pairing_group, policy_str, attr_list)
+    records = []
+    for name, times in [('KP ' + form, measure_average_times_kpabe(FABESA_KP(pairing_group), attr_list, policy_str, msg)),
+                        ('CP ' + form, measure_average_times_cpabe(FABESA_CP(pairing_group), attr_list, policy_str, msg))]:
+        records.append('{:<22}'.format(name) + '{:>6}'.format(n1) + '{:>6}'.format(n2) + format_times(times, 9))
+    return records
+
+#-------------------------------------------------- print running time module -------------------------------------------------
+def format_times(times, width=10, precision=2):
+    # running times in seconds as right-aligned columns of milliseconds
+    return ''.join(format(t*1000, '{}.{}f'.format(width, precision)) for t in times)
+
+def print_table(title, header, records, file_name, width=72):
+    # print a table of records and append it to Results/<file_name>.txt
+    print('\n')
+    print('*'*width)
+    print(title)
+    print('*'*width)
+    print('-'*width)
+    print(header)
+    print('-'*width)
+    for record in records:
+        print(record)
+    print('-'*width)
+
+    with open('Results/' + file_name + '.txt', 'a') as f:
+        f.write(title + '\n')
+        f.write(header + '\n')
+        for record in records:
+            f.write(record + '\n')
+        f.write('*' * width + '\n')
+
+#-------------------------------------------------- run all module ------------------------------------------------------------
+def run_parser(policy_sizes):
+    # the pyparsing grammar ships with Charm and only knows plain attribute names, so both
+    # parsers are fed the same numeric attributes
+    header = '{:<10}'.format('Leaves') + '{:>12}'.format('pyparsing') + '{:>12}'.format('policytree')
+    records = []
+    for policy_size in policy_sizes:
+        policy_str = create_policy_string(policy_size)
+        record = '{:<10}'.format(policy_size)
+        for parser in [PyparsingPolicyParser(), PolicyParser()]:
+            t = measure_average_parse_time(parser, policy_str)
+            record += '{:>12}'.format('recursion') if t is None else format_times([t], 12)
+        records.append(record)
+    print_table('Parsing times (ms)', header, records, 'Policy parsing', 36)
+
+def run_threshold(pairing_group, msg, n, k):
+    # a k-of-n gate against the same policy written out as an or of every k-subset
+    attr_list = [str(i) for i in range(1, k+1)]
+    header = '{:<22}'.format('') + '{:>6}'.format('rows') + '{:>6}'.format('cols') + TIMES_HEADER
+    records = measure_fabesa(pairing_group, 'threshold', attr_list, create_threshold_string(n, k), msg) + \
+              measure_fabesa(pairing_group, 'DNF', attr_list, create_dnf_string(n, k), msg)
+    print_table('{}-of-{} gate vs expanded DNF, running times (ms) curve BN254'.format(k, n), header, records,
+                'Policy threshold - BN254')
+
+def run_numeric(pairing_group, msg, bit_widths):
+    # level >= c over 2^bits values compiled into bits leaves, against the or of every value in the range
+    header = '{:<22}'.format('') + '{:>6}'.format('rows') + '{:>6}'.format('cols') + TIMES_HEADER
+    records = []
+    for bits in bit_widths:
+        setNumericBits('level', bits)
+        low, value = 2 ** (bits - 2) + 1, 2 ** bits - 1
+        records += measure_fabesa(pairing_group, '{}-bit compare'.format(bits), expandAttributes(['LEVEL={}'.format(value)]),
+                                  'level >= {}'.format(low), msg)
+        records += measure_fabesa(pairing_group, '{}-bit DNF'.format(bits), ['LEVEL:{}'.format(value)],
+                                  create_range_string('level', low, 2 ** bits), msg)
+    print_table('Numeric comparison vs DNF range expansion, running times (ms) curve BN254', header, records,
+                'Policy numeric - BN254')
+
+def run_template(pairing_group, msg, templates, N=200):
+    # FABESA CP encrypt / KP keygen per call: string policies with fresh slot values (policy cache misses),
+    # the same string policy over and over (cache hits) and the routines specialized to the template
+    header = '{:<8}'.format('Leaves') + '{:>16}'.format('string (new)') + '{:>16}'.format('string (same)') + '{:>12}'.format('template')
+    records = []
+    for template_str in templates:
+        cp, kp = FABESA_CP(pairing_group), FABESA_KP(pairing_group)
+        cp_pk, cp_msk = cp.setup()
+        kp_pk, kp_msk = kp.setup()
+        template = cp.util.compileTemplate(template_str)
+        encrypt, keygen = cp.compile_encrypt(template), kp.compile_keygen(template)
+        fresh = [{slot: 'V{}'.format(i) for slot in template.slots} for i in range(N)]
+        same = [fresh[0]] * N
+        for name, run_string, run_template in [
+                ('CP Enc', lambda p: cp.encrypt(cp_pk, msg, p), lambda vals: encrypt(cp_pk, msg, vals)),
+                ('KP KeyGen', lambda p: kp.keygen(kp_pk, kp_msk, p), lambda vals: keygen(kp_pk, kp_msk, vals))]:
+            times = []
+            for workload in [fresh, same]:
+                policies = [template.format(vals) for vals in workload]
+                policy_cache.clear()
+                times.append(measure_average_time(lambda i: run_string(policies[i]), N))
+            times.append(measure_average_time(lambda i: run_template(fresh[i]), N))
+            record = '{:<8}'.format(len(template.rows)) + format_times(times[:2], 16, 3) + format_times(times[2:], 12, 3) + \
+                     '  ' + name
+            records.append(record)
+    print_table('Policy templates, per-call running times (ms) curve BN254', header, records, 'Policy template - BN254')
+
+def run_large_keys(pairing_group, msg, policy_sizes, num_attributes=1000, N=20):
+    # FABESA decrypt with num_attributes-attribute keys (CP) and ciphertexts (KP) against and-policies
+    # over some of them: prune matches the policy leaves against a set of attribute strings
+    attr_list = ['DEPT{}:V{}'.format(i, i) for i in range(num_attributes)]
+    header = '{:<10}'.format('Leaves') + '{:>12}'.format('CP Dec') + '{:>12}'.format('KP Dec')
+    records = []
+    for n in policy_sizes:
+        policy_str = ' and '.join(attr_list[i * (num_attributes // n)] for i in range(n))
+        cp, kp = FABESA_CP(pairing_group), FABESA_KP(pairing_group)
+        cp_pk, cp_msk = cp.setup()
+        kp_pk, kp_msk = kp.setup()
+        cp_key, cp_ct = cp.keygen(cp_pk, cp_msk, attr_list), cp.encrypt(cp_pk, msg, policy_str)
+        kp_key, kp_ct = kp.keygen(kp_pk, kp_msk, policy_str), kp.encrypt(kp_pk, msg, attr_list)
+        times = [measure_average_time(lambda i: scheme.decrypt(pk, ct, key), N)
+                 for scheme, pk, ct, key in [(cp, cp_pk, cp_ct, cp_key), (kp, kp_pk, kp_ct, kp_key)]]
+        records.append('{:<10}'.format(n) + format_times(times, 12, 3))
+    print_table('Decrypt with {}-attribute keys, running times (ms) curve BN254'.format(num_attributes), header, records,
+                'Policy large keys - BN254')
+    print('attribute parts cached: {}'.format(len(attribute_registry)))
+
+def run_prune(pairing_group, msg, attribute_counts, max_leaves=100, N=10):
+    # FABESA decrypt with keys (CP) and ciphertexts (KP) of 10 to 100k attributes against an and-policy of
+    # up to max_leaves of them, and pruning and-chains of as many leaves as attributes, left- and right-deep
+    header = '{:<12}'.format('Attributes') + '{:>10}'.format('CP Dec') + '{:>10}'.format('KP Dec') + \
+             '{:>16}'.format('Prune (left)') + '{:>16}'.format('Prune (right)')
+    records = []
+    parser = PolicyParser()
+    for num_attributes in attribute_counts:
+        attr_list = ['ATTR{}'.format(i) for i in range(num_attributes)]
+        num_leaves = min(num_attributes, max_leaves)
+        policy_str = ' and '.join(attr_list[i * (num_attributes // num_leaves)] for i in range(num_leaves))
+        cp, kp = FABESA_CP(pairing_group), FABESA_KP(pairing_group)
+        cp_pk, cp_msk = cp.setup()
+        kp_pk, kp_msk = kp.setup()
+        cp_key, cp_ct = cp.keygen(cp_pk, cp_msk, attr_list), cp.encrypt(cp_pk, msg, policy_str)
+        kp_key, kp_ct = kp.keygen(kp_pk, kp_msk, policy_str), kp.encrypt(kp_pk, msg, attr_list)
+        decrypt_times = [measure_average_time(lambda i: scheme.decrypt(pk, ct, key), N)
+                         for scheme, pk, ct, key in [(cp, cp_pk, cp_ct, cp_key), (kp, kp_pk, kp_ct, kp_key)]]
+        chains = [parser.parse(' and '.join(attr_list)), parser.parse(create_right_chain_string(attr_list, 'and'))]
+        prune_times = [measure_average_time(lambda i: parser.prune(chain, attr_list)) for chain in chains]
+        records.append('{:<12}'.format(num_attributes) + format_times(decrypt_times, 10, 3) + format_times(prune_times, 16, 3))
+    print_table('Pruning large attribute sets, running times (ms) curve BN254', header, records, 'Policy prune - BN254')
+
+def run_min_cost(pairing_group, msg, clause_sizes):
+    # (1 and ... and n) or (n+1 and n+2): the left clause is satisfied too but costs n rows in decrypt,
+    # prune with and without the cost model of the scheme
+    header = '{:<24}'.format('') + '{:>8}'.format('rows') + '{:>10}'.format('Dec') + '{:>12}'.format('min rows') + '{:>10}'.format('Dec')
+    records = []
+    for n in clause_sizes:
+        policy_str = '({}) or ({} and {})'.format(' and '.join(str(i) for i in range(1, n+1)), n+1, n+2)
+        attr_list = [str(i) for i in range(1, n+3)]
+        for scheme in [FABESA_CP(pairing_group), BSW07CPABE(pairing_group), FABESA_KP(pairing_group), GPSW06KPABE(pairing_group, n+2)]:
+            record = '{:<24}'.format('{} {}'.format(scheme.name, n))
+            for min_cost in [False, True]:
+                scheme.util.min_cost = min_cost
+                nodes = scheme.util.prune(scheme.util.createPolicy(policy_str), attr_list)
+                if isinstance(scheme, (FABESA_KP, GPSW06KPABE)):
+                    times = measure_average_times_kpabe(scheme, attr_list, policy_str, msg)
+                else:
+                    times = measure_average_times_cpabe(scheme, attr_list, policy_str, msg)
+                record += '{:>8}'.format(len(nodes)) + format_times(times[3:], 10) + ('  ' if not min_cost else '')
+            records.append(record)
+    print_table('Cheapest satisfying set, decrypt running times (ms) curve BN254', header, records, 'Policy min cost - BN254')
+
+def run_analysis(pairing_group, msg, policy_sizes, N=10):
+    # admission control: analyze a DNF and a n/2-of-n threshold policy from their trees, against encrypting
+    # with them, and the outcome of the checks of a decrypt (and an A2BE decrypt) under the limits
+    header = '{:<16}'.format('Policy') + '{:>7}'.format('rows') + '{:>7}'.format('cols') + '{:>12}'.format('subsets') + \
+             '{:>10}'.format('Enc ops') + '{:>10}'.format('Analyze') + '{:>10}'.format('Enc') + '{:>11}'.format('Admission')
+    limits = PolicyLimits(max_rows=200, max_subsets=1000, max_operations=1000)
+    scheme = FABESA_CP(pairing_group)
+    (pk, msk) = scheme.setup()
+    records = []
+    for n in policy_sizes:
+        for name, policy_str in [('DNF', create_dnf_string(n, 2)), ('threshold', create_threshold_string(n, n // 2))]:
+            scheme.util.limits = None
+            tree = scheme.util.createPolicy(policy_str)
+            analysis = scheme.util.analyzePolicy(tree)
+            analyze_time = measure_average_time(lambda i: scheme.util.analyzePolicy(tree), N)
+            encrypt_time = measure_average_time(lambda i: scheme.encrypt(pk, msg, policy_str))
+            scheme.util.limits = limits
+            try:
+                scheme.util.prune(tree, [])
+                scheme.util.pruneSubsets(tree, [str(i) for i in range(1, n+1)])
+                admission = 'accepted'
+            except PolicyTooComplex:
+                admission = 'rejected'
+            record = '{:<16}'.format('{} {}'.format(name, n)) + '{:>7}'.format(analysis.rows) + '{:>7}'.format(analysis.cols) + \
+                     '{:>12.3g}'.format(analysis.subsets) + '{:>10}'.format(analysis.operations['policy']) + \
+                     format_times([analyze_time], 10, 3) + format_times([encrypt_time], 10) + '{:>11}'.format(admission)
+            records.append(record)
+    scheme.util.limits = None
+    print_table('Policy analysis and admission control, running times (ms) curve BN254', header, records,
+                'Policy analysis - BN254')
+
+def run_lazy_subsets(pairing_group, msg, clause_counts):
+    # the candidate subsets of an A2BE decrypt: (A1 or B1) and ... and (Am or Bm) with every attribute
+    # in the key has 2^m of them. All of them built by requiredAttributeList against the first one from
+    # the lazy enumeration, and the decrypt that stops at it
+    header = '{:<10}'.format('Clauses') + '{:>10}'.format('subsets') + '{:>10}'.format('list KB') + '{:>10}'.format('list') + \
+             '{:>10}'.format('lazy KB') + '{:>10}'.format('lazy') + '{:>10}'.format('Dec')
+    parser = PolicyParser()
+    scheme = FABESA_CP_A2BE(pairing_group)
+    (pk, msk) = scheme.setup()
+    records = []
+    for m in clause_counts:
+        policy_str = ' and '.join('(A{}:1 or B{}:1)'.format(i, i) for i in range(m))
+        attr_list = ['{}{}:1'.format(c, i) for i in range(m) for c in 'AB']
+        compiled = policy_cache.get(policy_str)
+        names = [attr.split(':')[0] for attr in attr_list]
+
+        tracemalloc.start()
+        start = time.time()
+        subsets = parser.requiredAttributeList(compiled.names, names)[1]
+        time_list = time.time() - start
+        memory_list = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        num_subsets = len(subsets)
+        del subsets
+        tracemalloc.start()
+        start = time.time()
+        first = next(parser.iterRequiredAttributeList(compiled.names, names)[1])
+        time_lazy = time.time() - start
+        memory_lazy = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        ct = scheme.encrypt(pk, msg, policy_str)
+        key = scheme.keygen(pk, msk, attr_list)
+        start = time.time()
+        subsets, result = scheme.decrypt(ct, key, msg)
+        time_decrypt = time.time() - start
+        assert result == 1
+
+        record = '{:<10}'.format(m) + '{:>10}'.format(num_subsets) + format(memory_list/1024, '10.1f') + format_times([time_list], 10) + \
+                 format(memory_lazy/1024, '10.1f') + format_times([time_lazy], 10, 3) + format_times([time_decrypt], 10)
+        records.append(record)
+    print_table('Candidate subsets, peak memory (KB) and time to the first one (ms) curve BN254', header, records,
+                'Policy lazy subsets - BN254')
+
+def run_subset_order(pairing_group, msg, num_clauses, N=50):
+    # A2BE decrypts where the key holds every attribute name of the policy K0X0 or (K1X0 and K1X1) or
+    # (K2X0 and K2X1 and K2X2) or K3X0 ..., but the values of only one clause: the last one 60% of the
+    # time, another one otherwise. Trials per successful decrypt under every ordering of the candidate subsets
+    header = '{:<16}'.format('Order') + '{:>8}'.format('Clauses') + '{:>16}'.format('trials/success') + '{:>10}'.format('wasted') + \
+             '{:>10}'.format('Dec')
+    clauses = [['K{}X{}'.format(j, t) for t in range(j % 3 + 1)] for j in range(num_clauses)]
+    policy_str = ' or '.join('(' + ' and '.join(name + ':1' for name in clause) + ')' for clause in clauses)
+    scheme = FABESA_CP_A2BE(pairing_group)
+    (pk, msk) = scheme.setup()
+    ct = scheme.encrypt(pk, msg, policy_str)
+    priors = dict((name, 0.9) for name in clauses[-1])
+    records = []
+    for name, order in [('tree', None), ('smallest first', SmallestFirst()), ('hit rate', HitRateOrder()), ('priors', PriorOrder(priors, 0.3))]:
+        random.seed(0)
+        scheme.util.subset_order = order
+        scheme.util.subset_stats.reset()
+        time_decrypt = 0
+        for i in range(N):
+            right = num_clauses - 1 if random.random() < 0.6 else random.randrange(num_clauses - 1)
+            attr_list = [name + (':1' if j == right else ':2') for j in range(num_clauses) for name in clauses[j]]
+            key = scheme.keygen(pk, msk, attr_list)
+            time_decrypt += measure_average_time(lambda i: scheme.decrypt(ct, key, msg))
+        stats = scheme.util.subset_stats
+        record = '{:<16}'.format(name) + '{:>8}'.format(num_clauses) + format(stats.trialsPerSuccess(), '16.2f') + \
+                 '{:>10}'.format(stats.wastedTrials()) + format_times([time_decrypt/N], 10)
+        records.append(record)
+    scheme.util.subset_order = None
+    print_table('A2BE candidate subset order, trials per decrypt and running times (ms) curve BN254', header, records,
+                'Policy subset order - BN254')
+
+def run_trial_budget(pairing_group, msg, clause_counts, timeout=0.01, N=5):
+    # an A2BE decrypt of (A1 or B1) and ... and (Am or Bm) with a key whose values match no subset, so it
+    # tries all 2^m: without a budget, with one that never runs out (the overhead of the checks) and with
+    # a deadline, where it stops and reports how far it got
+    header = '{:<10}'.format('Clauses') + '{:>10}'.format('subsets') + '{:>10}'.format('Dec') + '{:>12}'.format('budget') + \
+             '{:>12}'.format('deadline') + '{:>9}'.format('tried') + '{:>9}'.format('left')
+    scheme = FABESA_CP_A2BE(pairing_group)
+    (pk, msk) = scheme.setup()
+    records = []
+    for m in clause_counts:
+        policy_str = ' and '.join('(A{}:1 or B{}:1)'.format(i, i) for i in range(m))
+        ct = scheme.encrypt(pk, msg, policy_str)
+        key = scheme.keygen(pk, msk, ['{}{}:2'.format(c, i) for i in range(m) for c in 'AB'])
+        time_plain = measure_average_time(lambda i: scheme.decrypt(ct, key, msg), N)
+        time_budget = measure_average_time(lambda i: scheme.decrypt(ct, key, msg, TrialBudget(timeout=3600, max_pairings=10**9)), N)
+        budget = TrialBudget(timeout=timeout)
+        time_deadline = measure_average_time(lambda i: scheme.decrypt(ct, key, msg, budget))
+        record = '{:<10}'.format(m) + '{:>10}'.format(2 ** m) + format_times([time_plain], 10) + \
+                 format_times([time_budget, time_deadline], 12) + '{:>9}'.format(budget.tried) + '{:>9}'.format(budget.remaining or 0)
+        records.append(record)
+    print_table('A2BE decrypt with a trial budget, running times (ms) curve BN254', header, records,
+                'Policy trial budget - BN254')
+
+def run_match(index_sizes, num_queries=10):
+    # which of n keys can decrypt a ciphertext: n CP keys (attribute sets) against a ciphertext policy and
+    # n KP keys (policies) against a ciphertext attribute list, prune per pair against the MatchIndex
+    header = '{:<10}'.format('Keys') + ''.join('{:>11}'.format(column) for column in
+                                               ['Build', 'CP prune', 'CP index', 'KP prune', 'KP index'])
+    records = []
+    rand = random.Random(1)
+    universe = ['DEPT:{}'.format(i) for i in range(20)] + ['ROLE:{}'.format(i) for i in range(20)] + ['LEVEL:{}'.format(i) for i in range(10)]
+    def create_dnf():
+        return ' or '.join('({} and {})'.format(*rand.sample(universe, 2)) for i in range(3))
+    parser = PolicyParser()
+    for n in index_sizes:
+        attr_sets = [rand.sample(universe, 8) for i in range(n)]
+        policies = [policy_cache.get(create_dnf()).tree for i in range(n)]
+        cp_index, kp_index = MatchIndex(), MatchIndex()
+        def build(i):
+            cp_index.add(i, {'attr_list': attr_sets[i]})
+            kp_index.add(i, {'policy': policies[i]})
+        times = [measure_average_time(build, n) * n]
+        cp_queries = [policy_cache.get(create_dnf()).tree for i in range(num_queries)]
+        kp_queries = [rand.sample(universe, 8) for i in range(num_queries)]
+        for queries, run_prune, run_index in [
+                (cp_queries, lambda q: [i for i in range(n) if parser.prune(q, attr_sets[i])], cp_index.attributesMatching),
+                (kp_queries, lambda q: [i for i in range(n) if parser.prune(policies[i], q)], kp_index.policiesMatching)]:
+            for run in [run_prune, run_index]:
+                times.append(measure_average_time(lambda i: run(queries[i]), num_queries))
+        records.append('{:<10}'.format(n) + format_times(times, 11))
+    print_table('Bulk eligibility checks, running times (ms) per ciphertext', header, records, 'Policy match')
+
+def run_simplify(pairing_group, msg, policy_sizes):
+    # front-end style DNF policies, FABESA KP-ABE with and without the simplification pass
+    attr_list = ['1', '2', '10']
+    header = '{:<10}'.format('Clauses') + '{:>12}'.format('rows') + '{:>12}'.format('cols') + '    KeyGen   Simpl.KeyGen    Dec  Simpl.Dec'
+    records = []
+    for policy_size in policy_sizes:
+        policy_str = create_redundant_policy_string(policy_size)
+        reduction = policy_cache.get(policy_str, simplify=True).reduction
+        kpabe = FABESA_KP(pairing_group)
+        times = measure_average_times_kpabe(kpabe, attr_list, policy_str, msg)
+        kpabe.util.simplify = True
+        simplified_times = measure_average_times_kpabe(kpabe, attr_list, policy_str, msg)
+        record = '{:<10}'.format(policy_size) + '{:>12}'.format('{} -> {}'.format(*reduction['rows'])) \
+                 + '{:>12}'.format('{} -> {}'.format(*reduction['cols'])) + format_times([times[1]], 10) \
+                 + format_times([simplified_times[1]], 14) + format_times([times[3]], 9) \
+                 + format_times([simplified_times[3]], 10)
+        records.append(record)
+    print_table('Policy simplification, running times (ms) curve BN254', header, records, 'Policy simplification - BN254')
+
+def run_scaling(pairing_group, policy_sizes):
+    # and-chains for compiling and pruning, or-chains for the MSP (an and-chain of n leaves has n columns)
+    header = '{:<10}'.format('Leaves') + '{:<10}'.format('Shape') + '{:>8}'.format('Depth') + '{:>12}'.format('Compile') \
+             + '{:>12}'.format('Prune') + '{:>12}'.format('PruneList') + '{:>12}'.format('MSP')
+    records = []
+    for policy_size in policy_sizes:
+        and_str, attr_list = create_chain_string(policy_size, 'and')
+        or_str, _ = create_chain_string(policy_size, 'or')
+        for rebalance in [False, True]:
+            cache = PolicyCache(maxsize=0)
+            time_compile = measure_average_time(lambda i: cache.compile(and_str, rebalance=rebalance))
+            and_policy = cache.compile(and_str, rebalance=rebalance).tree
+            or_policy = cache.compile(or_str, rebalance=rebalance).tree
+            times = [time_compile,
+                     measure_average_time(lambda i: cache.parser.prune(and_policy, attr_list)),
+                     measure_average_time(lambda i: cache.parser.prune(and_policy, attr_list, 1)),
+                     measure_average_time(lambda i: compileMSP(or_policy))]     # not through the MSP cache
+            record = '{:<10}'.format(policy_size) + '{:<10}'.format('balanced' if rebalance else 'chain') \
+                     + '{:>8}'.format(get_depth(and_policy)) + format_times(times, 12)
+            records.append(record)
+    print_table('Traversal times (ms) of chained policies', header, records, 'Policy scaling')
+
+def run_representation(policy_sizes):
+    # memory of a keyword policy held as charm BinNodes and as PolicyNodes, and the time to get its
+    # stripped (names only) variant with deepcopy + policy_strip and with policy_stripped
+    header = '{:<10}'.format('Leaves') + '{:>12}'.format('BinNode') + '{:>12}'.format('PolicyNode') \
+             + '{:>12}'.format('deepcopy') + '{:>12}'.format('stripped')
+    records = []
+    parser = PolicyParser()
+    for policy_size in policy_sizes:
+        policy_str = ' and '.join('KEY{}:VALUE{}'.format(i, i) for i in range(policy_size))
+        # balanced, so that deepcopy does not run into the recursion limit
+        tracemalloc.start()
+        policy = parser.rebalance(parser.parse(policy_str))
+        size_policy_node = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        tracemalloc.start()
+        bin_policy = to_binnode(policy)
+        size_bin_node = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+
+        times = [measure_average_time(lambda i: parser.policy_strip(copy.deepcopy(bin_policy))),
+                 measure_average_time(lambda i: parser.policy_stripped(policy))]
+        record = '{:<10}'.format(policy_size) + format(size_bin_node/1024, '12.1f') + format(size_policy_node/1024, '12.1f') \
+                 + format_times(times, 12)
+        records.append(record)
+    print_table('Policy tree memory (KB) and stripping times (ms)', header, records, 'Policy representation')
+
+def run_cache(num_policies, num_calls, policy_size=20):
+    # a few hundred distinct policies encrypted over and over, with and without the policy cache
+    policies = [create_policy_string(policy_size) for i in range(num_policies)]
+    workload = [random.choice(policies) for i in range(num_calls)]
+    cache = PolicyCache()
+    times = [measure_average_time(lambda i: c.get(workload[i]), num_calls) for c in [PolicyCache(maxsize=0), cache]]
+    print('\n')
+    print('createPolicy (ms/call) over {} distinct policies: uncached {}  cached {}'.format(
+        num_policies, format(times[0]*1000, '.4f'), format(times[1]*1000, '.4f')))
+    print('cache stats: {}'.format(cache.stats()))
+
+def run_shares(pairing_group, policy_sizes, N=5):
+    # the shares M_i . v of all the MSP rows of an encrypt: row by row over ZR elements, as the schemes
+    # did, and in one batch over integers modulo the group order
+    util = MSP(pairing_group)
+    for policy_size in policy_sizes:
+        mono_span_prog = util.convert_policy_to_msp(policy_cache.get(create_policy_string(policy_size)).tree)
+        v = [pairing_group.random(ZR) for i in range(mono_span_prog.num_cols)]
+        def zr_shares(i):
+            shares = {}
+            for attr, row in mono_span_prog.items():
+                shares[attr] = sum(x[0] * x[1] for x in zip(row, v[:len(row)]))
+        time_zr = measure_average_time(zr_shares, N)
+        time_batch = measure_average_time(lambda i: util.computeShares(mono_span_prog, v), N)
+        print('MSP row shares (ms), {} leaves, {} columns: per row over ZR {}  batched {}'.format(
+            policy_size, mono_span_prog.num_cols, format(time_zr*1000, '.2f'), format(time_batch*1000, '.2f')))
+
+def run_reconstruction(pairing_group, msg, policy_sizes, N=20):
+    # the reconstruction coefficients of a decrypt with half of the attributes of an n/2-of-n gate: read off
+    # the tree (Lagrange), solved from the MSP by Gaussian elimination, and solved once then cached; then the
+    # same gate imported as a plain LSSS matrix, without a tree, through a FABESA CP encrypt and decrypt
+    util = MSP(pairing_group)
+    order = pairing_group.order()
+    for n in policy_sizes:
+        policy_str = create_threshold_string(n, n // 2)
+        attr_list = [str(i) for i in range(1, n // 2 + 1)]
+        tree = policy_cache.get(policy_str).tree
+        mono_span_prog = util.convert_policy_to_msp(tree)
+        nodes = util.prune(tree, attr_list)
+        labels = [node.getAttributeAndIndex() for node in nodes]
+        time_tree = measure_average_time(lambda i: util.getReconstructionCoefficients(tree, nodes), N)
+        time_solve = measure_average_time(lambda i: reconstructionVector(mono_span_prog, labels, order), N)
+        util.getReconstructionVector(mono_span_prog, labels)
+        time_cached = measure_average_time(lambda i: util.getReconstructionVector(mono_span_prog, labels), N)
+        imported = importLSSS(exportLSSS(mono_span_prog))
+        cp_times = measure_average_times_cpabe(FABESA_CP(pairing_group), attr_list, imported, msg)
+        print('Reconstruction (ms), {}-of-{}: tree {}  Gaussian {}  cached {}  imported LSSS Enc {} Dec {}'.format(
+            n // 2, n, format(time_tree*1000, '.2f'), format(time_solve*1000, '.2f'), format(time_cached*1000, '.2f'),
+            format(cp_times[2]*1000, '.2f'), format(cp_times[3]*1000, '.2f')))
+
+def run_minimal_msp(pairing_group, msg, policies):
+    # the Lewko-Waters MSP of a policy as written against the column-minimizing compiler (MSP.minimalMSP),
+    # in FAME and CGW15, whose encrypt (CP) and keygen (KP) hash or exponentiate per MSP column
+    header = '{:<10}'.format('') + '{:>10}'.format('rows') + '{:>10}'.format('cols') + '{:>12}'.format('FAME Enc') + \
+             '{:>12}'.format('FAME KeyGen') + '{:>12}'.format('CGW Enc') + '{:>12}'.format('CGW KeyGen')
+    records = []
+    for name, policy_str, attr_list in policies:
+        util = MSP(pairing_group)
+        uni_size = len(util.compilePolicy(policy_str).attributes)
+        for form, policy in [(name, policy_str), ('minimal', util.minimalMSP(policy_str))]:
+            mono_span_prog = util.convert_policy_to_msp(util.createPolicy(policy))
+            record = '{:<10}'.format(form) + '{:>10}'.format(len(mono_span_prog)) + '{:>10}'.format(mono_span_prog.num_cols)
+            for cp, kp in [(AC17CPABE(pairing_group, 2), AC17KPABE(pairing_group, 2)),
+                           (CGW15CPABE(pairing_group, 2, uni_size), CGW15KPABE(pairing_group, 2, uni_size))]:
+                cp_times = measure_average_times_cpabe(cp, attr_list, policy, msg)
+                kp_times = measure_average_times_kpabe(kp, attr_list, policy, msg)
+                record += format_times([cp_times[2], kp_times[1]], 12)
+            records.append(record)
+    print_table('Column-minimizing MSP compiler, running times (ms) curve BN254', header, records,
+                'Policy minimal MSP - BN254', 80)
+
+def run_share_powers(pairing_group, msg, policy_sizes, N=5):
+    # keyword OR chains as in the A2BE measurements: every row of the MSP is the same vector, so the g_1 ** share
+    # of the FABESA CP encrypt and KP keygen is one exponentiation instead of one per row. The exponentiations
+    # alone row by row and grouped, then the FABESA encrypt (A2BE) and keygen (ABE) that use them
+    util = MSP(pairing_group)
+    g_1 = pairing_group.random(G1)
+    for policy_size in policy_sizes:
+        policy_str = create_keyword_or_string(policy_size)
+        mono_span_prog = util.convert_policy_to_msp(util.createPolicy(policy_str))
+        v = [pairing_group.random(ZR) for i in range(mono_span_prog.num_cols)]
+        shares = util.computeShares(mono_span_prog, v)
+        time_rows = measure_average_time(lambda i: dict((attr, g_1 ** shares[attr]) for attr in mono_span_prog), N)
+        time_groups = measure_average_time(lambda i: util.sharePowers(mono_span_prog, shares, g_1), N)
+        cp = FABESA_CP_A2BE(pairing_group)
+        (cp_pk, cp_msk) = cp.setup()
+        time_enc = measure_average_time(lambda i: cp.encrypt(cp_pk, msg, policy_str), N)
+        kp = FABESA_KP(pairing_group)
+        (kp_pk, kp_msk) = kp.setup()
+        time_keygen = measure_average_time(lambda i: kp.keygen(kp_pk, kp_msk, policy_str), N)
+        print('g_1 ** share (ms), OR chain of {}, {} rows in {} groups: per row {}  per group {}  FABESA Enc {}  KeyGen {}'.format(
+            policy_size, len(mono_span_prog), len(mono_span_prog.groups), format(time_rows*1000, '.2f'),
+            format(time_groups*1000, '.2f'), format(time_enc*1000, '.2f'), format(time_keygen*1000, '.2f')))
+
+def check_small_exp(pairing_group, msg, policies):
+    # the operations counted by smallexp for known coefficients, against the full exponentiation they
+    # replace; then FAME and CGW15 over and/or and threshold policies, whose MSP entries and reconstruction
+    # coefficients are all small integers, so no coefficient may take a full exponentiation
+    g, h = pairing_group.random(G1), pairing_group.random(G1)
+    power_cases = [(1, {}), (0, {'exponentiations': 1}), (-1, {'inversions': 1}), (2, {'multiplications': 1}),
+                   (5, {'multiplications': 3}), (-3, {'multiplications': 2, 'inversions': 1}),
+                   (2**SMALL_BITS - 1, {'multiplications': 2 * (SMALL_BITS - 1)}),
+                   (2**SMALL_BITS, {'exponentiations': 1}), (-2**SMALL_BITS, {'exponentiations': 1})]
+    mul_power_cases = [(h, 0, {'skipped': 1}), (h, 1, {'multiplications': 1}), (h, -1, {'multiplications': 1}),
+                       (h, 2, {'multiplications': 2}), (h, -3, {'multiplications': 3}),
+                       (h, 2**SMALL_BITS, {'exponentiations': 1, 'multiplications': 1}),
+                       (1, 5, {'multiplications': 3}), (1, -1, {'inversions': 1})]
+    for coeff, counts in power_cases:
+        stats = ExpStats()
+        assert power(g, coeff, stats) == g ** coeff, coeff
+        check_exp_stats(stats, counts, 'power by {}'.format(coeff))
+    for prod, coeff, counts in mul_power_cases:
+        stats = ExpStats()
+        assert mulPower(prod, g, coeff, stats) == prod * g ** coeff, coeff
+        check_exp_stats(stats, counts, 'mulPower by {}'.format(coeff))
+
+    for name, policy_str, attr_list in policies:
+        uni_size = len(policy_cache.get(policy_str).attributes)
+        for scheme in [AC17CPABE(pairing_group, 2), AC17KPABE(pairing_group, 2),
+                       CGW15CPABE(pairing_group, 2, uni_size), CGW15KPABE(pairing_group, 2, uni_size)]:
+            (pk, msk) = scheme.setup()
+            stats = scheme.util.exp_stats
+            stats.reset()
+            if isinstance(scheme, (AC17CPABE, CGW15CPABE)):
+                key = scheme.keygen(pk, msk, attr_list)
+                ctxt = scheme.encrypt(pk, msg, policy_str)
+            else:
+                key = scheme.keygen(pk, msk, policy_str)
+                ctxt = scheme.encrypt(pk, msg, attr_list)
+            assert scheme.decrypt(pk, ctxt, key) == msg, (name, scheme.name)
+            assert stats.calls > 0 and stats.exponentiations == 0, (name, scheme.name, stats)
+    print('\n')
+    print('smallexp operation counts: ok')
+    return
+
+def check_exp_stats(stats, counts, case):
+    # every counter of stats as in counts, 0 if not given, for a single coefficient applied
+    expected = dict(calls=1, exponentiations=0, multiplications=0, inversions=0, skipped=0)
+    expected.update(counts)
+    for counter, value in expected.items():
+        assert getattr(stats, counter) == value, '{}: {} {} != {}'.format(case, counter, getattr(stats, counter), value)
+
+def run_hash_cache(pairing_group, msg, policy_sizes, N=10):
+    # the FABESA and FABEO algorithms over the same attributes, with the hash cache disabled (every hash to
+    # G1 computed) and enabled (computed once, then looked up), and the hit rate of the cached runs
+    header = '{:<22}'.format('') + '{:>8}'.format('cache') + TIMES_HEADER + '{:>10}'.format('hit rate')
+    records = []
+    maxsize = hash_cache.maxsize
+    for policy_size in policy_sizes:
+        policy_str = create_policy_string(policy_size)
+        attr_list = [attribute_registry.strip_index(attr) for attr in policy_cache.get(policy_str).attributes]
+        for name, measure, scheme in [('FABESA KP', measure_average_times_kpabe, FABESA_KP),
+                                      ('FABESA CP', measure_average_times_cpabe, FABESA_CP),
+                                      ('FABEO CP', measure_average_times_cpabe, FABEO22CPABE)]:
+            for enabled in [False, True]:
+                hash_cache.maxsize = maxsize if enabled else 0
+                hash_cache.clear()
+                times = measure(scheme(pairing_group), attr_list, policy_str, msg, N)
+                record = '{:<22}'.format(name + ' ' + str(policy_size)) + '{:>8}'.format('on' if enabled else 'off') + \
+                         format_times(times, 9) + format(hash_cache.hitRate(), '10.2f')
+                records.append(record)
+    hash_cache.maxsize = maxsize
+    print_table('Hash-to-group cache, running times (ms) curve BN254', header, records, 'Policy hash cache - BN254', 80)
+
+def run_sparse_rows(pairing_group, msg, policy_sizes):
+    # a deep AND chain 1 and 2 and ... and n: its MSP has n columns but at most two nonzero entries per
+    # row. The MSP built with sparse rows, against also building the dense rows, and the encrypt of the
+    # schemes that loop over the row entries, now only over the nonzero ones
+    header = '{:<8}'.format('Leaves') + '{:>11}'.format('entries') + '{:>10}'.format('nonzero') + '{:>10}'.format('sparse') + \
+             '{:>10}'.format('dense') + '{:>11}'.format('FAME Enc') + '{:>11}'.format('CGW Enc')
+    records = []
+    for n in policy_sizes:
+        policy_str, attr_list = create_chain_string(n, 'and')
+        tree = policy_cache.get(policy_str).tree
+        mono_span_prog = compileMSP(tree)
+        times = [measure_average_time(lambda i: compileMSP(tree)), measure_average_time(lambda i: mono_span_prog.rows)]
+        record = '{:<8}'.format(n) + '{:>11}'.format(len(mono_span_prog) * mono_span_prog.num_cols) + \
+                 '{:>10}'.format(sum(len(row) for row in mono_span_prog.sparse)) + format_times(times, 10)
+        for scheme in [AC17CPABE(pairing_group, 2), CGW15CPABE(pairing_group, 2, n)]:
+            (pk, msk) = scheme.setup()
+            record += format_times([measure_average_time(lambda i: scheme.encrypt(pk, msg, policy_str))], 11)
+        records.append(record)
+    print_table('Sparse MSP rows of AND chains, running times (ms) curve BN254', header, records, 'Policy sparse rows - BN254')
+
+def run_msp_cache(policy_sizes, num_calls=200):
+    # the MSP of a policy encrypted over and over, converted on every call and taken from the MSP cache
+    for policy_size in policy_sizes:
+        tree = policy_cache.get(create_policy_string(policy_size)).tree
+        times = [measure_average_time(lambda i: cache.get(tree), num_calls) for cache in [MSPCache(maxsize=0), MSPCache()]]
+        print('convert_policy_to_msp (ms/call), {} leaves: uncached {}  cached {}'.format(
+            policy_size, format(times[0]*1000, '.4f'), format(times[1]*1000, '.4f')))
+
+# -------------------------------------------------- Main functions module ---------------------------------------------------
+def create_policy_string(n):
+    # random and/or formula with a parenthesised group every few leaves
+    policy_string = '1'
+    for i in range(2, n+1):
+        op = random.choice([' and ', ' or '])
+        if i % 4 == 0 and i < n:
+            policy_string += op + '(' + str(i) + random.choice([' and ', ' or ']) + str(i+1) + ')'
+        elif i % 4 != 1:
+            policy_string += op + str(i)
+    return policy_string
+
+def create_chain_string(n, op):
+    attr_list = [str(i) for i in range(1, n+1)]
+    return (' ' + op + ' ').join(attr_list), attr_list
+
+def create_right_chain_string(attr_list, op):
+    # a op (b op (c op ...)), nested to the right
+    return (' ' + op + ' (').join(attr_list) + ')' * (len(attr_list) - 1)
+
+def to_binnode(tree):
+    # the same and/or policy built from charm BinNodes
+    nodes = {}
+    for node in postOrder(tree):
+        if node.getNodeType() == OpType.ATTR:
+            nodes[id(node)] = BinNode(node.getAttributeAndIndex())
+        else:
+            nodes[id(node)] = BinNode(node.getNodeType(), nodes.pop(id(node.getLeft())), nodes.pop(id(node.getRight())))
+    return nodes[id(tree)]
+
+def get_depth(tree):
+    depth, stack = 0, [(tree, 1)]
+    while stack:
+        node, d = stack.pop()
+        depth = max(depth, d)
+        stack.extend((child, d + 1) for child in getChildren(node))
+    return depth
+
+def create_threshold_string(n, k):
+    return '{} of ({})'.format(k, ', '.join(str(i) for i in range(1, n+1)))
+
+def create_dnf_string(n, k):
+    return ' or '.join('(' + ' and '.join(str(i) for i in subset) + ')'
+                       for subset in itertools.combinations(range(1, n+1), k))
+
+def create_range_string(name, low, high):
+    # hand-written range low <= name < high: one name:value attribute per value
+    return ' or '.join('{}:{}'.format(name, v) for v in range(low, high))
+
+def create_keyword_or_string(n):
+    # KEYWORD0:v0 OR ... OR KEYWORDn-1:vn-1 with random values, the shape of the A2BE policies
+    return ' OR '.join('KEYWORD{}:{}'.format(i, random.randrange(1, 1000)) for i in range(n))
+
+def create_template_string(n):
+    # n clauses (DEPTi:{deptI} and ROLEi:{roleI}) or'ed with ADMIN:{admin}
+    clauses = ['(DEPT{0}:{{dept{0}}} and ROLE{0}:{{role{0}}})'.format(i) for i in range(n)]
+    return ' or '.join(clauses + ['ADMIN:{admin}'])
+
+def create_redundant_policy_string(n):
+    # every clause repeats the role attribute 1 and one of four departments, every fifth clause twice
+    clauses = ['(1 and {} and {})'.format(2 + i % 4, 10 + i) for i in range(n)]
+    clauses += ['(1 and {} and {})'.format(2 + i % 4, 10 + i) for i in range(0, n, 5)]
+    return ' or '.join(clauses)
+
+def main():
+    policy_sizes = [10, 100, 1000, 10000]
+    run_parser(policy_sizes)
+    run_cache(300, 100000)
+    run_msp_cache([10, 100, 1000])
+    run_shares(PairingGroup('BN254'), [100, 1000, 3000])
+    run_match([1000, 10000, 100000])
+
+    # instantiate a bilinear pairing map
+    pairing_group = PairingGroup('BN254')
+    msg = pairing_group.random(GT)
+    check_small_exp(pairing_group, msg, [('AND 20',) + create_chain_string(20, 'and'),
+                                         ('3-of-6', create_threshold_string(6, 3), ['1', '2', '3']),
+                                         ('DNF 2/6', create_dnf_string(6, 2), ['1', '2'])])
+    for n, k in [(4, 2), (6, 3), (8, 4)]:
+        run_threshold(pairing_group, msg, n, k)
+    run_numeric(pairing_group, msg, [4, 8, 10])
+    run_template(pairing_group, msg, [create_template_string(n) for n in [1, 10, 50]])
+    run_large_keys(pairing_group, msg, [10, 100, 500])
+    run_prune(pairing_group, msg, [10, 100, 1000, 10000, 100000])
+    run_min_cost(pairing_group, msg, [5, 20])
+    run_analysis(pairing_group, msg, [10, 20, 40])
+    run_lazy_subsets(pairing_group, msg, [8, 12, 16])
+    run_subset_order(pairing_group, msg, 6)
+    run_trial_budget(pairing_group, msg, [4, 8, 10])
+    run_sparse_rows(pairing_group, msg, [10, 100, 300])
+    run_share_powers(pairing_group, msg, [10, 100, 1000])
+    run_hash_cache(pairing_group, msg, [10, 50])
+    run_reconstruction(pairing_group, msg, [10, 20, 40])
+    run_minimal_msp(pairing_group, msg, [('DNF 2/' + str(n), create_dnf_string(n, 2), ['1', '2']) for n in [4, 6, 8]] +
+                    [('shared', '(1 and 2 and 3) or (1 and 2 and 4) or (1 and 3 and 4)', ['1', '3', '4'])])
+    run_simplify(pairing_group, msg, [10, 50, 100])
+    run_scaling(pairing_group, [1000, 10000, 100000])
+    run_representation([1000, 10000, 100000])
+
+if __name__ == "__main__":
+    debug = True
+    main()
@@ -0,0 +1,38 @@
+'''
+Process-wide registry of attribute parts: the attribute without its _index label, and the name and value
+of a name:value attribute. The hot loops (strip_index, the name/value views of the A2BE schemes) look
+these up instead of splitting strings on every call. The registry is a bounded LRU, so the per-record
+values of keyword policies and the leaves of bound templates do not grow it for the life of the process.
+There are no process-wide attribute ids: prune matches leaves against a set of attribute strings, and a
+PolicyMatcher numbers the attributes of its own policy, so no id outlives the call or matcher using it.
+'''
+import functools
+
+def _parts(attribute):
+    parts = attribute.split(':')
+    return (attribute.split('_')[0], parts[0], parts[1] if len(parts) > 1 else attribute)
+
+class AttributeRegistry:
+    def __init__(self, maxsize=65536):
+        # attribute -> (attribute without its _index label, name, value); functools.lru_cache is thread-safe
+        self.parts = functools.lru_cache(maxsize=maxsize)(_parts)
+
+    def strip_index(self, attribute):
+        return self.parts(attribute)[0]
+
+    def name(self, attribute):
+        """ the name of a name:value attribute, the attribute itself otherwise."""
+        return self.parts(attribute)[1]
+
+    def value(self, attribute):
+        """ the value of a name:value attribute, the attribute itself otherwise."""
+        return self.parts(attribute)[2]
+
+    def clear(self):
+        self.parts.cache_clear()
+
+    def __len__(self):
+        return self.parts.cache_info().currsize
+
+# shared by the policy parser, MSP and SecretUtil
+attribute_registry = AttributeRegistry()
@@ -0,0 +1,34 @@
+'''
+Process-wide cache of hashes to the group, shared by every ABE and A2BE scheme through MSP.hash. The
+schemes hash the same small set of attributes (and FAME its table of column hashes) on every keygen,
+encrypt and decrypt; hashing to G1 costs several exponentiations, so the results are kept in a
+bounded LRU keyed by (group, target, input bytes). The cached elements are shared between callers, which
+must not modify them in place (the schemes only use them in new products and powers). Setting
+hash_cache.maxsize = 0 disables the cache, clear() empties it.
+'''
+from lrucache import LRUCache, MISSING
+
+class HashCache(LRUCache):
+    # entries: (group, target, input bytes) -> element
+    def __init__(self, maxsize=4096):
+        LRUCache.__init__(self, maxsize)
+
+    def get(self, group, value, target):
+        """ group.hash(value, target), from the cache if it holds it. Inputs other than str and bytes
+        are hashed without caching."""
+        if self.maxsize <= 0:
+            return group.hash(value, target)
+        if type(value) is str:
+            data = value.encode('utf-8')
+        elif type(value) is bytes:
+            data = value
+        else:
+            return group.hash(value, target)
+        # the group itself is in the key, its elements only mix with those of the same pairing
+        key = (group, target, data)
+        element = self.lookup(key)
+        if element is MISSING:
+            element = self.add(key, group.hash(value, target))
+        return element
+
+hash_cache = HashCache()
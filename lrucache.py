@@ -0,0 +1,73 @@
+'''
+The bounded, thread-safe LRU store behind the process-wide caches (policycache, mspcache, lsss,
+hashcache), so that they evict and count hits, misses and evictions the same way. A cache subclasses
+LRUCache and builds its get() from lookup() and add(); added() and evicted() let it keep entries of its
+own in step with the LRU. Setting maxsize = 0 disables caching, clear() empties the cache and resets
+its counts.
+'''
+from collections import OrderedDict
+import threading
+
+# returned by lookup() on a miss, as None may be a cached value
+MISSING = object()
+
+class LRUCache:
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize          # 0 disables caching
+        self.lock = threading.RLock()   # reentrant, so subclasses can extend clear() and the hooks under it
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, key):
+        """ the value cached under key, counted as a hit, or MISSING, counted as a miss."""
+        with self.lock:
+            value = self.entries.get(key, MISSING)
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            return value
+
+    def add(self, key, value):
+        """ cache value under key, evicting the least recently used entries over maxsize, and return the
+        cached value: if another thread added key meanwhile, its value is kept for both."""
+        if self.maxsize <= 0:
+            return value
+        with self.lock:
+            cached = self.entries.get(key, MISSING)
+            if cached is MISSING:
+                self.entries[key] = value
+                self.added(key, value)
+            else:
+                value = cached
+                self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                evicted_key, evicted_value = self.entries.popitem(last=False)
+                self.evictions += 1
+                self.evicted(evicted_key, evicted_value)
+            return value
+
+    def added(self, key, value):
+        """ called under the lock when a new entry is cached."""
+
+    def evicted(self, key, value):
+        """ called under the lock when an entry is evicted."""
+
+    def hitRate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        with self.lock:
+            return {'size': len(self.entries), 'maxsize': self.maxsize, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions, 'hit_rate': self.hitRate()}
@@ -0,0 +1,121 @@
+'''
+Linear secret sharing schemes (LSSS) given by their matrix, and reconstruction for any of them. The tree
+based coefficients of MSP.getReconstructionCoefficients only hold for the Lewko-Waters MSPs of and/or and
+threshold trees; reconstructionVector instead solves w . M_S = (1, 0, ..., 0) for the rows S of an
+authorized set, by Gaussian elimination modulo the group order, so it works for any matrix, e.g. one from
+another compiler or an optimized one. The vectors are cached per (MSP, row set) in reconstruction_cache.
+
+importLSSS reads a matrix supplied from outside into a CompiledMSP, which the schemes take in place of a
+policy string (see MSP.createPolicy). The format is a dictionary, or its JSON text:
+    {"rho": ["A_0", "B_0", "C_0"], "matrix": [[1, 1], [0, -1], [1, 0]]}
+rho labels the rows (attribute, with an index to tell apart the rows of the same attribute), matrix has
+one row per label, entries are integers (or their decimal strings, for tools that lose large JSON numbers),
+and the shares are the products with (s, r_1, ..., r_{n-1}) for the secret s. exportLSSS writes an MSP in
+the same format.
+'''
+from types import MappingProxyType
+import json
+
+from policytree import PolicyNode
+from policyanalysis import PolicyAnalysis
+from mspcache import CompiledMSP
+from lrucache import LRUCache, MISSING
+
+def importLSSS(data):
+    """ a CompiledMSP from an LSSS in the import format, given as a dictionary or as JSON text."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    rho, matrix = data.get('rho'), data.get('matrix')
+    if not rho or matrix is None or len(rho) != len(matrix):
+        raise ValueError("an LSSS needs a label in rho for every row of matrix")
+    labels, sparse, num_cols = [], [], 1
+    for label, row in zip(rho, matrix):
+        if not isinstance(label, str) or not label:
+            raise ValueError("invalid row label %r" % (label,))
+        # labels as in the policy trees: upper case attribute, then the index if any
+        labels.append(PolicyNode(label).getAttributeAndIndex())
+        sparse.append(tuple((j, int(x)) for j, x in enumerate(row) if int(x) != 0))
+        num_cols = max(num_cols, len(row))
+    if len(set(labels)) != len(labels):
+        raise ValueError("the row labels of an LSSS must be distinct")
+    return CompiledMSP(sparse, labels, num_cols)
+
+def exportLSSS(mono_span_prog):
+    """ an MSP in the import format, as a dictionary (json.dumps it for the text)."""
+    matrix = []
+    for row in mono_span_prog.sparse:
+        dense = [0] * mono_span_prog.num_cols
+        for j, x in row:
+            dense[j] = x
+        matrix.append(dense)
+    return {'rho': list(mono_span_prog.rho), 'matrix': matrix}
+
+def analyzeLSSS(mono_span_prog):
+    """ the PolicyAnalysis of an MSP without its tree: its size only, every row counted as one whose
+    coefficient is not 1, the depth and the candidate subsets unknown."""
+    rows = len(mono_span_prog.sparse)
+    return PolicyAnalysis(rows, mono_span_prog.num_cols, None, rows, None, None)
+
+def _subtract(vector, factor, other, order):
+    # vector -= factor * other, modulo order, dropping the zeros
+    for j, x in other.items():
+        y = (vector.get(j, 0) - factor * x) % order
+        if y:
+            vector[j] = y
+        else:
+            vector.pop(j, None)
+
+def reconstructionVector(mono_span_prog, labels, order):
+    """ the coefficients w_i, modulo order, with sum w_i M_i = (1, 0, ..., 0) over the rows M_i of the
+    labels, as a dictionary label -> w_i without the zero ones; None if the rows are not authorized.
+    The rows are taken in row order and brought one by one to reduced echelon form, each with the
+    combination of the original rows that it stands for; a row that reduces to zero is dependent on
+    the ones before and gets no coefficient."""
+    pivots = {}     # pivot column -> (row, combination): the row is 1 there and 0 at the other pivots
+    for label in sorted(labels, key=mono_span_prog.order.__getitem__):
+        row = dict((j, x % order) for j, x in mono_span_prog.sparseRow(label) if x % order)
+        combination = {label: 1}
+        for column in [j for j in row if j in pivots]:
+            factor = row[column]
+            pivot_row, pivot_combination = pivots[column]
+            _subtract(row, factor, pivot_row, order)
+            _subtract(combination, factor, pivot_combination, order)
+        if not row:
+            continue
+        column = min(row)
+        inverse = pow(row[column], -1, order)
+        row = dict((j, x * inverse % order) for j, x in row.items())
+        combination = dict((l, x * inverse % order) for l, x in combination.items())
+        for pivot_row, pivot_combination in pivots.values():
+            factor = pivot_row.get(column)
+            if factor:
+                _subtract(pivot_row, factor, row, order)
+                _subtract(pivot_combination, factor, combination, order)
+        pivots[column] = (row, combination)
+    # (1, 0, ..., 0) is in the row span iff it reduces to zero, and then it is sum target[j] * pivot row j
+    target, vector = {0: 1}, {}
+    for column in [j for j in target if j in pivots]:
+        factor = target[column]
+        pivot_row, pivot_combination = pivots[column]
+        _subtract(target, factor, pivot_row, order)
+        _subtract(vector, -factor, pivot_combination, order)
+    if target:
+        return None
+    return vector
+
+class ReconstructionCache(LRUCache):
+    # entries: (MSP, labels, order) -> read-only vector, or None
+
+    def get(self, mono_span_prog, labels, order):
+        """ the reconstructionVector of a set of rows of an MSP, solving for it on a miss."""
+        # the MSP itself is in the key: it compares by identity and is kept alive while cached
+        key = (mono_span_prog, frozenset(labels), order)
+        vector = self.lookup(key)
+        if vector is MISSING:
+            vector = reconstructionVector(mono_span_prog, key[1], order)
+            if vector is not None:
+                vector = MappingProxyType(vector)
+            vector = self.add(key, vector)
+        return vector
+
+reconstruction_cache = ReconstructionCache()
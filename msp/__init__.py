@@ -1,88 +1,228 @@
 """
 This class is adapted from the SecretUtil class in charm/toolbox/secretutil.py.
 It provides the following methods:
-- createPolicy: convert a Boolean formula encoded as a string into a policy represented like a tree;
-- convertPolicyToMSP: convert a policy into a monotone span program (MSP);
+- createPolicy: convert a Boolean formula encoded as a string into a policy represented like a tree,
+    optionally simplified to fewer MSP rows and columns and with its and/or chains rebalanced;
+- compilePolicy: the cached compiled policy (tree, duplicate attributes, attribute list, reduction,
+    attribute-name and attribute-value views) for a string;
+- compileTemplate: compile a policy shape with slots, e.g. (DEPT:{dept} and ROLE:{role}) or ADMIN:{admin},
+    into a PolicyTemplate whose MSP is computed once and whose slots are bound per call;
+- setNumericBits / expandAttributes: the bit width of a numeric attribute compared in policies (e.g.
+    level >= 5), and the expansion of numeric attributes NAME=VALUE into the bit attributes that such
+    comparisons match;
+- convert_policy_to_msp: convert a policy into a monotone span program (MSP), an immutable CompiledMSP
+    (rows, row labels, number of columns) shared by all the schemes through the MSP cache; an LSSS matrix
+    read with lsss.importLSSS is a CompiledMSP too, and is taken by the schemes in place of a policy string;
+- minimalMSP: the MSP of a policy from the column-minimizing compiler (simplified policy, no redundant
+    rows or empty columns), to pass to a scheme in place of the policy string of a call;
+- computeShares / computeSparseShares: the shares M_i . v of all the rows of an MSP at once, in integer
+    arithmetic modulo the group order, once per group of equal rows;
+- sharePowers: a group element raised to the share of every row, one exponentiation per group of equal rows;
 - getCoefficients: given a policy, returns a coefficient for every attribute;
+- getReconstructionCoefficients: given a policy and a pruned set of attributes, returns the coefficients
+    that recombine their MSP rows (only rows under threshold gates differ from 1);
+- hasThreshold: whether getReconstructionCoefficients can return any coefficient for a policy, checked
+    once per A2BE decrypt rather than once per trial;
+- getReconstructionVector: for any MSP and authorized set of rows, the vector w with
+    w . M_S = (1, 0, ..., 0), by Gaussian elimination modulo the group order, cached per (MSP, row set);
+- exp / mulExp: raise to a reconstruction coefficient / multiply in an element raised to an MSP entry,
+    without a full exponentiation for 0, 1, -1 and other small coefficients (see smallexp);
+- hash: hash to the group through the process-wide, bounded LRU hash cache (see hashcache);
 - strip_index: remove the index from an attribute (i.e., x_y -> x);
 - prune: determine whether a given set of attributes satisfies the policy
-    (returns false if it doesn't, otherwise a good enough subset of attributes);
+    (returns false if it doesn't, otherwise a good enough subset of attributes, or with min_cost the
+    subset that is cheapest to decrypt with under the scheme's cost model, see setRowCost; for an imported
+    LSSS, the rows with a nonzero reconstruction coefficient);
+- pruneSubsets: the candidate subsets of attributes that an A2BE decrypt tries one by one, enumerated
+    lazily and within the limits, in the order of subset_order; recordTrial counts the trials;
+- setRowCost / setPolicyCost: the cost model of the scheme, set in its __init__;
+- analyzePolicy: the MSP size, candidate subset count and estimated group operations of a policy,
+    computed from the tree alone;
 - getAttributeList: retrieve the attributes that occur in a policy tree in order (left to right).
 """
 
 from charm.core.math.pairing import ZR
-from charm.toolbox.policytree import *
+import itertools
+
+from policytree import *
+from policycache import policy_cache, setNumericBits
+from policytemplate import PolicyTemplate
+from mspcache import CompiledMSP, msp_cache, minimal_msp_cache
+from attributeregistry import attribute_registry
+from policyanalysis import PolicyLimits, PolicyTooComplex, analyzeTree, countSubsets, checkLimits
+from lsss import importLSSS, exportLSSS, analyzeLSSS, reconstruction_cache
+from subsetorder import SubsetStats
+from smallexp import ExpStats, SMALL_BITS, power, mulPower
+from hashcache import hash_cache
+
+# rough costs of the group operations of a decrypt relative to a multiplication (BN254)
+MUL_COST = 1
+EXP_COST = 60
+PAIRING_COST = 300
 
 
 class MSP:
+    """
+    The policy utilities of a scheme (its self.util). The options below are set on it after the scheme
+    is created, and apply to every call of that scheme:
+    - simplify, rebalance: the defaults of createPolicy and compilePolicy for policy strings;
+    - min_cost: prune to the satisfying set that is cheapest under the scheme's setRowCost, instead of
+        the first one found;
+    - limits: a PolicyLimits that compilePolicy, prune and pruneSubsets check a policy against before
+        any group operation; with limits.downgrade, a policy over them is simplified whatever simplify
+        says, and an A2BE decrypt over max_subsets tries a single subset;
+    - subset_order: the order in which an A2BE decrypt tries its candidate subsets (see subsetorder).
+    The cost model (row_cost, decrypt_ops, trial_pairings, policy_ops) is set by the scheme itself through
+    setRowCost and setPolicyCost, and subset_stats and exp_stats are counters to read and reset.
+    An MSP passed in place of a policy (minimalMSP, lsss.importLSSS) is used as it is: simplify and
+    rebalance were applied when it was made, if at all, limits only see its size, and prune takes the
+    rows of its reconstruction vector, without min_cost. subset_order and a TrialBudget only concern
+    the A2BE schemes, which take policy strings; min_cost does not change their candidate subsets.
+    """
+
     def __init__(self, groupObj, verbose=True):
-        self.len_longest_row = 1
         self.group = groupObj
+        self.parser = PolicyParser()
+        # options, see above
+        self.simplify = False
+        self.rebalance = False
+        self.min_cost = False
+        self.limits = None
+        self.subset_order = None
+        # cost model of the scheme, see setRowCost and setPolicyCost
+        self.row_cost = (MUL_COST, MUL_COST + EXP_COST)
+        self.decrypt_ops = (0, 1, 1)
+        self.trial_pairings = (0, 0)
+        self.policy_ops = (1, 0, 0)
+        # counters
+        self.subset_stats = SubsetStats()   # trials per A2BE decrypt, see recordTrial
+        self.exp_stats = ExpStats()         # group operations of exp and mulExp
 
-    def createPolicy(self, policy_string):
+    def createPolicy(self, policy_string, simplify=None, rebalance=None):
         """
          Convert a Boolean formula represented as a string into a policy represented like a tree.
+         With simplify (default self.simplify) the tree is flattened, deduplicated, absorbed and factored
+         into an equivalent policy with fewer MSP rows and columns. With rebalance (default self.rebalance)
+         long and/or chains become balanced trees of logarithmic depth.
+         The tree is shared through the policy cache and must not be modified in place.
+         An imported LSSS (a CompiledMSP, see lsss.importLSSS) is returned as it is.
+        """
+
+        if isinstance(policy_string, CompiledMSP):
+            return policy_string
+        return self.compilePolicy(policy_string, simplify, rebalance).tree
+
+    def compilePolicy(self, policy_string, simplify=None, rebalance=None):
+        """
+         Return the cached CompiledPolicy (tree, duplicate attributes, attribute list, reduction, names,
+         values) for a policy string; reduction holds the MSP rows and columns before and after
+         simplification, names and values are the tree with name:value attributes cut down to their
+         names / values.
         """
 
         assert type(policy_string) is str, "invalid type for policy_string"
-        #policy_string = str(policy_string)
-        parser = PolicyParser()
-        policy_obj = parser.parse(policy_string)
-        _dictCount, _dictLabel = {}, {}
-        parser.findDuplicates(policy_obj, _dictCount)
-        for i in _dictCount.keys():
-            if _dictCount[ i ] > 1: _dictLabel[ i ] = 0
-        parser.labelDuplicates(policy_obj, _dictLabel)
-        return policy_obj
+        if simplify is None:
+            simplify = self.simplify
+        if rebalance is None:
+            rebalance = self.rebalance
+        compiled = policy_cache.get(policy_string, simplify, rebalance)
+        if self.limits is not None:
+            reasons = checkLimits(self.analyzePolicy(compiled.tree), self.limits)
+            if reasons and self.limits.downgrade and not simplify:
+                compiled = policy_cache.get(policy_string, True, rebalance)
+                reasons = checkLimits(self.analyzePolicy(compiled.tree), self.limits)
+            if reasons:
+                raise PolicyTooComplex("policy over the limits: " + ', '.join(reasons))
+        return compiled
 
-    def convert_policy_to_msp(self, tree):
+    def compileTemplate(self, template_string, simplify=None, rebalance=None):
         """
-        Convert a policy into a monotone span program (MSP)
-        represented by a dictionary with (attribute, row) pairs
+         Parse a policy template once and convert it to an MSP (rows, columns, groups of equal row vectors
+         and leaf slots); bind() then fills in the slot values of a call.
         """
 
-        root_vector = [1]
-        # listOfAttributeRowPairs = {}
-        self.len_longest_row = 1
-        return self._convert_policy_to_msp(tree, root_vector)
+        assert type(template_string) is str, "invalid type for template_string"
+        return PolicyTemplate(self, template_string, simplify, rebalance)
 
-    def _convert_policy_to_msp(self, subtree, curr_vector):
+    def setNumericBits(self, name, bits):
         """
-         Given a vector for the current node,
-         returns the vectors for its children in the form of a dictionary
+         Set the bit width of a numeric attribute compared in policies; its values are 0..2^bits-1.
         """
 
-        if subtree is None:
-            return None
+        setNumericBits(name, bits)
+
+    def expandAttributes(self, attributes):
+        """
+         Expand the numeric attributes NAME=VALUE of a key or ciphertext into the bit attributes
+         that the compiled comparisons (e.g. name >= 5) match; other attributes are kept.
+        """
 
-        type = subtree.getNodeType()
-
-        if type == OpType.ATTR:
-            # print ('ATTR: ', subtree, subtree.getAttributeAndIndex(), currVector)
-            return {subtree.getAttributeAndIndex(): curr_vector}
-
-        if type == OpType.OR:
-            left_list = self._convert_policy_to_msp(subtree.getLeft(), curr_vector)
-            right_list = self._convert_policy_to_msp(subtree.getRight(), curr_vector)
-            # print ('OR l: ', leftList, 'r: ', rightList)
-            left_list.update(right_list)
-            return left_list
-
-        if type == OpType.AND:
-            length = len(curr_vector)
-            left_vector = curr_vector + [0] * (self.len_longest_row - length) + [1]
-            right_vector = [0] * self.len_longest_row + [-1]  # [0]*k creates a vector of k zeroes
-            # extendedVector = currVector + [0]*(self.lengthOfLongestRow-length)
-            # leftVector = extendedVector + [1]
-            # rightVector = extendedVector + [2]  # [0]*k creates a vector of k zeroes
-            self.len_longest_row += 1
-            left_list = self._convert_policy_to_msp(subtree.getLeft(), left_vector)
-            right_list = self._convert_policy_to_msp(subtree.getRight(), right_vector)
-            # print ('AND l: ', leftList, 'r: ', rightList)
-            left_list.update(right_list)
-            return left_list
+        return expandAttributes(attributes)
 
-        return None
+    def convert_policy_to_msp(self, tree, minimal=False):
+        """
+        Convert a policy into a monotone span program (MSP), returned as a CompiledMSP: a read-only
+        mapping from the (attribute, index) labels to the rows, with the number of columns in num_cols.
+        It is cached by the policy's fingerprint and shared, so it must not be modified. With minimal,
+        it comes from the column-minimizing compiler (mspcache.compileMinimalMSP) instead.
+        """
+
+        if tree is None or isinstance(tree, CompiledMSP):
+            return tree
+        if minimal:
+            return minimal_msp_cache.get(tree)
+        return msp_cache.get(tree)
+
+    def minimalMSP(self, policy):
+        """
+        The MSP of a policy string (simplified first) or tree from the column-minimizing compiler, with
+        fewer columns and rows than convert_policy_to_msp where the policy has shared or redundant terms.
+        It is passed to a scheme in place of the policy string (CP encrypt, KP keygen) to use it for that
+        call; decrypt then solves for the reconstruction coefficients from its rows.
+        """
+
+        if type(policy) is str:
+            policy = self.compilePolicy(policy, simplify=True).tree
+        return self.convert_policy_to_msp(policy, minimal=True)
+
+    def computeShares(self, mono_span_prog, v):
+        """
+        The share M_i . v of every row of an MSP, as a dictionary label -> ZR element. The products are
+        taken over Python integers modulo the group order, over the nonzero entries of the sparse rows,
+        and only the results become group elements, instead of a ZR object for every term of every row.
+        Equal rows (mono_span_prog.groups) get their share computed once, and the same element.
+        """
+
+        group_shares = self.computeSparseShares(mono_span_prog.groups, v)
+        return dict((label, group_shares[group])
+                    for label, group in zip(mono_span_prog.rho, mono_span_prog.row_groups))
+
+    def computeSparseShares(self, rows, v):
+        """
+        The shares of rows given as their nonzero (column, entry) pairs, in order, as with computeShares.
+        """
+
+        order = self.group.order()
+        values = [int(x) for x in v]
+        init = self.group.init
+        return [init(ZR, sum(values[j] * x for j, x in row) % order) for row in rows]
+
+    def sharePowers(self, mono_span_prog, shares, base, offset=None):
+        """
+        base ** (share + offset) for the share of every row, from computeShares, as a dictionary label ->
+        group element. The rows of a group of equal rows have the same share, so the exponentiation is
+        done once per group and its result shared by all the rows of the group.
+        """
+
+        group_powers = [None] * len(mono_span_prog.groups)
+        powers = {}
+        for label, group in zip(mono_span_prog.rho, mono_span_prog.row_groups):
+            power = group_powers[group]
+            if power is None:
+                exponent = shares[label] if offset is None else shares[label] + offset
+                power = group_powers[group] = base ** exponent
+            powers[label] = power
+        return powers
 
     def getCoefficients(self, tree):
         """
@@ -93,6 +233,115 @@ class MSP:
         self._getCoefficientsDict(tree, coeffs)
         return coeffs
 
+    def hasThreshold(self, tree):
+        """
+        Whether the policy has a threshold gate, the only rows whose reconstruction coefficient is not 1.
+        An imported MSP has no tree and counts as having one.
+        """
+
+        if isinstance(tree, CompiledMSP):
+            return True
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if node.getNodeType() == OpType.THRESHOLD:
+                return True
+            stack.extend(getChildren(node))
+        return False
+
+    def getReconstructionCoefficients(self, tree, nodes):
+        """
+        Given a policy and the pruned attribute nodes that satisfy it, returns a coefficient for every
+        pruned row under a threshold gate (the product of the Lagrange coefficients at 0 of the gates
+        above it). Rows that are not listed have coefficient 1, so for and/or policies the result is
+        empty and the rows are simply multiplied together.
+        """
+
+        if isinstance(tree, CompiledMSP):
+            # no tree to read the coefficients from: solve for them, rows with coefficient 1 left out
+            labels = [node.getAttributeAndIndex() for node in nodes]
+            vector = self.getReconstructionVector(tree, labels)
+            if vector is None:
+                return None
+            one = self.group.init(ZR, 1)
+            zero = self.group.init(ZR, 0)
+            return dict((label, vector.get(label, zero)) for label in labels if vector.get(label) != one)
+
+        selected = set(id(node) for node in nodes)
+        coeffs = {}
+        self._getReconstructionCoefficients(tree, selected, coeffs)
+        return coeffs
+
+    def _getReconstructionCoefficients(self, subtree, selected, coeffs):
+        """
+        Returns the pruned rows below subtree and records the coefficients of those under a threshold gate.
+        """
+
+        rows = {}   # pruned rows below every node visited so far
+        for node in postOrder(subtree):
+            type = node.getNodeType()
+            if type == OpType.ATTR:
+                node_rows = [node.getAttributeAndIndex()] if id(node) in selected else []
+            elif type == OpType.THRESHOLD:
+                chosen = {}
+                for x, child in enumerate(node.children, 1):
+                    child_rows = rows.pop(id(child))
+                    if child_rows: chosen[x] = child_rows
+                this_coeff = self.recoverCoefficients(list(chosen))
+                node_rows = []
+                for x in chosen:
+                    for attr in chosen[x]:
+                        coeffs[attr] = coeffs.get(attr, 1) * this_coeff[x]
+                    node_rows += chosen[x]
+            else:
+                node_rows = rows.pop(id(node.getLeft()))
+                node_rows += rows.pop(id(node.getRight()))
+            rows[id(node)] = node_rows
+        return rows[id(subtree)]
+
+    def getReconstructionVector(self, mono_span_prog, labels):
+        """
+        Given an MSP (from any compiler, or imported) and the labels of a set of its rows, returns the
+        nonzero coefficients w_i with sum w_i M_i = (1, 0, ..., 0) as a dictionary label -> ZR element,
+        or None if the rows are not authorized. It is solved by Gaussian elimination over the integers
+        modulo the group order and cached per (MSP, row set) in lsss.reconstruction_cache.
+        """
+
+        vector = reconstruction_cache.get(mono_span_prog, labels, self.group.order())
+        if vector is None:
+            return None
+        init = self.group.init
+        return dict((label, init(ZR, w)) for label, w in vector.items())
+
+    def exp(self, element, coeff):
+        """
+        Raise a pruned row's element to its reconstruction coefficient (None stands for 1). A coefficient
+        that is a small integer modulo the group order, e.g. the -1 and 2 of a 2-of-3 gate, goes through
+        smallexp.power instead of a full exponentiation.
+        """
+
+        if coeff is None:
+            return power(element, 1, self.exp_stats)
+        if type(coeff) is not int:
+            order = int(self.group.order())
+            value = int(coeff) % order
+            if value > order // 2:
+                value -= order
+            if abs(value) >> SMALL_BITS:
+                self.exp_stats.calls += 1
+                self.exp_stats.exponentiations += 1
+                return element ** coeff
+            coeff = value
+        return power(element, coeff, self.exp_stats)
+
+    def mulExp(self, prod, element, coeff):
+        """
+        prod * element ** coeff for an integer MSP entry coeff (prod may be 1): 0 is skipped, 1 and -1
+        cost a multiplication or division, other small entries a few multiplications (see smallexp).
+        """
+
+        return mulPower(prod, element, coeff, self.exp_stats)
+
     def recoverCoefficients(self, list):
         """
         recovers the coefficients over a binary tree.
@@ -112,36 +361,51 @@ class MSP:
 
     def _getCoefficientsDict(self, tree, coeff_list, coeff=1):
         """
-        recover coefficient over a binary tree where possible node types are OR = (1 of 2)
-        and AND = (2 of 2) secret sharing. The leaf nodes are attributes and the coefficients are
-        recorded in a coeff-list dictionary.
+        recover coefficient over a binary tree where possible node types are OR = (1 of 2),
+        AND = (2 of 2) and THRESHOLD = (k of n) secret sharing. The leaf nodes are attributes and the
+        coefficients are recorded in a coeff-list dictionary. A k-of-n gate is reconstructed from all
+        n children (Lagrange at 0 over x = 1..n); for k of them, see getReconstructionCoefficients.
         """
 
-        if tree:
+        and_coeff = self.recoverCoefficients([1, 2])
+        or_coeff = self.recoverCoefficients([1])
+        stack = [(tree, coeff)]
+        while stack:
+            tree, coeff = stack.pop()
+            if not tree:
+                continue
             node = tree.getNodeType()
             if (node == OpType.AND):
-                this_coeff = self.recoverCoefficients([1, 2])
                 # left child => coeff[1], right child => coeff[2]
-                self._getCoefficientsDict(tree.getLeft(), coeff_list, coeff * this_coeff[1])
-                self._getCoefficientsDict(tree.getRight(), coeff_list, coeff * this_coeff[2])
+                stack.append((tree.getRight(), coeff * and_coeff[2]))
+                stack.append((tree.getLeft(), coeff * and_coeff[1]))
             elif (node == OpType.OR):
-                this_coeff = self.recoverCoefficients([1])
-                self._getCoefficientsDict(tree.getLeft(), coeff_list, coeff * this_coeff[1])
-                self._getCoefficientsDict(tree.getRight(), coeff_list, coeff * this_coeff[1])
+                stack.append((tree.getRight(), coeff * or_coeff[1]))
+                stack.append((tree.getLeft(), coeff * or_coeff[1]))
+            elif (node == OpType.THRESHOLD):
+                this_coeff = self.recoverCoefficients(range(1, len(tree.children) + 1))
+                for x, child in reversed(list(enumerate(tree.children, 1))):
+                    stack.append((child, coeff * this_coeff[x]))
             elif (node == OpType.ATTR):
                 attr = tree.getAttributeAndIndex()
                 coeff_list[attr] = coeff
             else:
-                return None
+                raise ValueError("unsupported gate in policy: %s" % node)
+
+    def hash(self, value, target):
+        """
+        self.group.hash(value, target), looked up first in hashcache.hash_cache, which all the schemes
+        share; the element returned may be shared too and must not be modified in place.
+        """
+
+        return hash_cache.get(self.group, value, target)
 
     def strip_index(self, node_str):
         """
          Remove the index from an attribute (i.e., x_y -> x).
         """
 
-        if node_str.find('_') != -1:
-            return node_str.split('_')[0]
-        return node_str
+        return attribute_registry.strip_index(node_str)
 
     def prune(self, policy, attributes):
         """
@@ -149,8 +413,141 @@ class MSP:
         (returns false if it doesn't, otherwise a good enough subset of attributes).
         """
 
-        parser = PolicyParser()
-        return parser.prune(policy, attributes)
+        if self.limits is not None:
+            reasons = checkLimits(self.analyzePolicy(policy), self.limits)
+            if reasons:
+                raise PolicyTooComplex("policy over the limits: " + ', '.join(reasons))
+        if isinstance(policy, CompiledMSP):
+            return self.pruneRows(policy, attributes)
+        if self.min_cost:
+            return self.parser.prune(policy, attributes, cost=self.row_cost)
+        return self.parser.prune(policy, attributes)
+
+    def pruneRows(self, mono_span_prog, attributes):
+        """
+        prune for an MSP without its tree: the rows whose attribute is in attributes are solved for a
+        reconstruction vector, and the leaves of the rows with a nonzero coefficient are returned (False
+        if the rows are not authorized).
+        """
+
+        attributes = set(attributes)
+        labels = [label for label in mono_span_prog.rho if self.strip_index(label) in attributes]
+        vector = reconstruction_cache.get(mono_span_prog, labels, self.group.order())
+        if vector is None:
+            return False
+        return [PolicyNode(label) for label in mono_span_prog.rho if label in vector]
+
+    def pruneSubsets(self, policy, attributes, budget=None):
+        """
+        The candidate subsets of attributes that satisfy the policy, for the A2BE decrypts that try them
+        one by one (False if there is none). They are enumerated lazily, in the order of
+        requiredAttributeList or by the weights of subset_order, so a decrypt that stops at the first
+        subset that works never builds the others (an ordering with only order() sees them all). Over
+        limits.max_subsets, the request is rejected, or with downgrade only a single subset is returned.
+        With a TrialBudget, the subsets stop once it runs out; the budget keeps the rest of the
+        enumeration, which a resumed decrypt with the same budget takes up, so no subset is skipped or
+        tried twice even when subset_order learns from the trials in between.
+        """
+
+        if budget is not None and budget.subsets is not None:
+            if budget.policy is not policy or budget.attributes != list(attributes):
+                raise ValueError("a TrialBudget resumes only the decrypt it was started with")
+            return self._budgetSubsets(budget.subsets, budget, policy, attributes)
+        subsets, count = self._pruneSubsets(policy, attributes)
+        if subsets is False:
+            return False
+        self.subset_stats.decryptions += 1
+        if self.subset_order is not None and not hasattr(self.subset_order, 'weight'):
+            subsets = self.subset_order.order(subsets)
+        if budget is not None:
+            budget.policy, budget.attributes, budget.total = policy, list(attributes), count
+            return self._budgetSubsets(iter(subsets), budget, policy, attributes)
+        return subsets
+
+    def _budgetSubsets(self, subsets, budget, policy, attributes):
+        fixed_pairings, row_pairings = self.trial_pairings
+        budget.subsets = subsets
+        for subset in subsets:
+            if not budget.charge(fixed_pairings + row_pairings * len(subset)):
+                # the subset refused goes back in front of the rest, for a resumed decrypt
+                budget.subsets = itertools.chain([subset], subsets)
+                if budget.total is None:
+                    # counted once from the tree rather than by running the enumeration to its end
+                    budget.total = countSubsets(policy, set(attributes))
+                budget.remaining = budget.total - budget.tried
+                return
+            yield subset
+
+    def _pruneSubsets(self, policy, attributes):
+        # the subsets (False if there is none) and how many there are, None where they were not counted
+        if self.limits is not None and self.limits.max_subsets is not None:
+            count = countSubsets(policy, set(attributes))
+            if count > self.limits.max_subsets:
+                if not self.limits.downgrade:
+                    raise PolicyTooComplex("%d candidate subsets > %d" % (count, self.limits.max_subsets))
+                pruned = self.parser.prune(policy, attributes)
+                return (pruned and [pruned], 1)
+        else:
+            count = None
+        weight = getattr(self.subset_order, 'weight', None)
+        (policy_satisfied, subsets) = self.parser.iterRequiredAttributeList(policy, attributes, weight)
+        return (subsets, count) if policy_satisfied else (False, 0)
+
+    def recordTrial(self, subset, success):
+        """
+        Record the outcome of an A2BE decrypt trial with a candidate subset, in subset_stats and in
+        subset_order if it learns from them.
+        """
+
+        self.subset_stats.record(success)
+        record = getattr(self.subset_order, 'record', None)
+        if record is not None:
+            record(subset, success)
+
+    def setRowCost(self, pairings=0, multiplications=0, exponentiations=0, fixed_pairings=0):
+        """
+        The decrypt cost model of a scheme, which each scheme sets in its __init__: the pairings and
+        multiplications per pruned row, the exponentiations by the reconstruction coefficient of a row
+        under a threshold gate, and the pairings that do not depend on the policy. prune weighs the rows
+        with it when min_cost is set, analyzePolicy estimates a decrypt with it, and pruneSubsets charges
+        the pairings of each A2BE trial decryption to a TrialBudget with it.
+        """
+
+        row_cost = pairings * PAIRING_COST + multiplications * MUL_COST
+        self.row_cost = (row_cost, row_cost + exponentiations * EXP_COST)
+        self.decrypt_ops = (fixed_pairings, pairings + multiplications, exponentiations)
+        self.trial_pairings = (fixed_pairings, pairings)
+
+    def setPolicyCost(self, exponentiations=0, hashes=0, column_exponentiations=0):
+        """
+        The cost model of the algorithm that takes the policy (CP encrypt, KP keygen), which each scheme
+        sets in its __init__: the exponentiations and hashes to the group per MSP row, and the
+        exponentiations per row and MSP column. analyzePolicy estimates the policy algorithm with it,
+        and the limits are checked against that estimate.
+        """
+
+        self.policy_ops = (exponentiations, hashes, column_exponentiations)
+
+    def analyzePolicy(self, policy):
+        """
+        The PolicyAnalysis of a policy string, tree or imported MSP (of which only the size is known):
+        MSP rows and columns, depth, candidate subsets and the estimated group operations of the policy
+        algorithm ('policy') and of a decrypt that uses every row ('decrypt'), under the cost model of
+        the scheme. Nothing is converted to an MSP.
+        """
+
+        if type(policy) is str:
+            policy = policy_cache.get(policy, self.simplify, self.rebalance).tree
+        if isinstance(policy, CompiledMSP):
+            analysis = analyzeLSSS(policy)
+        else:
+            analysis = analyzeTree(policy)
+        exponentiations, hashes, column_exponentiations = self.policy_ops
+        fixed_pairings, row_ops, threshold_ops = self.decrypt_ops
+        operations = {
+            'policy': analysis.rows * (exponentiations + hashes + column_exponentiations * analysis.cols),
+            'decrypt': fixed_pairings + analysis.rows * row_ops + analysis.threshold_rows * threshold_ops}
+        return analysis._replace(operations=operations)
 
     def getAttributeList(self, Node):
         """
@@ -164,12 +561,7 @@ class MSP:
     def _getAttributeList(self, Node, List):
         if (Node == None):
             return None
-        # V, L, R
-        if (Node.getNodeType() == OpType.ATTR):
-            List.append(Node.getAttributeAndIndex())  # .getAttribute()
-        else:
-            self._getAttributeList(Node.getLeft(), List)
-            self._getAttributeList(Node.getRight(), List)
+        List.extend(node.getAttributeAndIndex() for node in getLeaves(Node))  # .getAttribute()
         return None
         
 if __name__ == "__main__":
@@ -0,0 +1,207 @@
+'''
+Process-wide cache of monotone span programs, shared by every scheme through MSP.convert_policy_to_msp.
+A policy tree is converted once (Lewko-Waters, with Vandermonde blocks for k-of-n gates) into an
+immutable CompiledMSP; a tree that prints the same, labels included, then gets the same object back,
+which is safe to share between threads and schemes. The trees held by the policy cache are never modified
+and come back as the same objects, so they are first looked up by identity, without printing them; any
+other tree may have been changed in place since (PolicyParser.policy_strip) and is always printed.
+
+compileMinimalMSP is the column-minimizing compiler, with its own cache (minimal_msp_cache). Lewko-Waters
+already spends the fewest columns a gate can have (one per AND, k-1 per k-of-n), so it starts from the
+simplified policy (MSP.minimalMSP), where shared terms are factored out and fewer AND gates remain, and then
+drops the rows that the other rows of the same attribute already span (e.g. duplicates), and the columns
+left without an entry. Its MSPs have no tree, so the schemes decrypt with them through Gaussian
+elimination (see lsss).
+'''
+from collections import OrderedDict
+from fractions import Fraction
+from types import MappingProxyType
+
+from policytree import OpType
+from policycache import policy_cache
+from lrucache import LRUCache, MISSING
+from attributeregistry import attribute_registry
+
+class CompiledMSP:
+    """ a read-only mapping from the row labels (attribute and index) to the rows of an MSP, in row order.
+    sparse: every row as a tuple of its nonzero (column, entry) pairs, by column; a Lewko-Waters row has
+    one entry per AND or k-of-n gate above its leaf, however many columns the MSP has;
+    rows: the row vectors as tuples, without their trailing zero columns (so of length at most num_cols),
+    only built when asked for; rho: the label of every row; num_cols: the number of columns;
+    order: label -> row number; groups: the distinct sparse rows, in order of first occurrence (all the
+    children of an OR gate get the same row, so its leaves have equal shares); row_groups: the group of
+    every row."""
+    __slots__ = ('sparse', 'rho', 'num_cols', 'order', 'groups', 'row_groups', '_rows')
+
+    def __init__(self, sparse, rho, num_cols):
+        object.__setattr__(self, 'sparse', tuple(sparse))
+        object.__setattr__(self, 'rho', tuple(rho))
+        object.__setattr__(self, 'num_cols', num_cols)
+        object.__setattr__(self, 'order', MappingProxyType(dict((label, i) for i, label in enumerate(self.rho))))
+        group_of = {}
+        row_groups = tuple(group_of.setdefault(row, len(group_of)) for row in self.sparse)
+        object.__setattr__(self, 'groups', tuple(group_of))
+        object.__setattr__(self, 'row_groups', row_groups)
+        object.__setattr__(self, '_rows', None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CompiledMSP is immutable")
+
+    @property
+    def rows(self):
+        rows = self._rows
+        if rows is None:
+            # two threads may both build them, either result is the same
+            rows = []
+            for row in self.sparse:
+                dense = [0] * (row[-1][0] + 1 if row else 0)
+                for j, x in row:
+                    dense[j] = x
+                rows.append(tuple(dense))
+            rows = tuple(rows)
+            object.__setattr__(self, '_rows', rows)
+        return rows
+
+    def sparseRow(self, label):
+        return self.sparse[self.order[label]]
+
+    def sparseItems(self):
+        """ the (label, sparse row) pairs in row order."""
+        return zip(self.rho, self.sparse)
+
+    def __getitem__(self, label):
+        return self.rows[self.order[label]]
+
+    def __contains__(self, label):
+        return label in self.order
+
+    def __iter__(self):
+        return iter(self.rho)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def get(self, label, default=None):
+        i = self.order.get(label)
+        return default if i is None else self.rows[i]
+
+    def keys(self):
+        return self.rho
+
+    def values(self):
+        return self.rows
+
+    def items(self):
+        return zip(self.rho, self.rows)
+
+def compileMSP(tree):
+    """ convert a policy tree into a CompiledMSP. The tree is walked depth-first on an explicit stack,
+    left child first, so the columns are numbered in the same order as by a recursive walk and deep
+    policies do not hit the recursion limit. Vectors are kept as their nonzero (column, entry) pairs,
+    so a gate appends its new columns without padding the vector with zeros up to num_cols."""
+    rows, rho = [], []
+    num_cols = 1
+    stack = [(tree, ((0, 1),))]
+    while stack:
+        subtree, curr_vector = stack.pop()
+        type = subtree.getNodeType()
+
+        if type == OpType.ATTR:
+            rows.append(curr_vector)
+            rho.append(subtree.getAttributeAndIndex())
+
+        elif type == OpType.OR:
+            stack.append((subtree.getRight(), curr_vector))
+            stack.append((subtree.getLeft(), curr_vector))
+
+        elif type == OpType.THRESHOLD:
+            # Vandermonde block: child x gets curr_vector || x, x^2, ..., x^(k-1) in k-1 new columns,
+            # so the children hold points of a degree k-1 polynomial through the parent's share
+            children = []
+            for x, child in enumerate(subtree.children, 1):
+                children.append((child, curr_vector + tuple((num_cols + j - 1, x ** j) for j in range(1, subtree.threshold))))
+            num_cols += subtree.threshold - 1
+            stack.extend(reversed(children))
+
+        elif type == OpType.AND:
+            left_vector = curr_vector + ((num_cols, 1),)
+            right_vector = ((num_cols, -1),)
+            num_cols += 1
+            stack.append((subtree.getRight(), right_vector))
+            stack.append((subtree.getLeft(), left_vector))
+
+    return CompiledMSP(rows, rho, num_cols)
+
+def compileMinimalMSP(tree):
+    """ convert a policy tree into a CompiledMSP with no row in the span of the other rows of its attribute
+    and no empty column. A key or ciphertext with an attribute holds all of its rows, so such a row never
+    changes which sets are authorized; the columns are renumbered in order once the rows are gone."""
+    compiled = compileMSP(tree)
+    bases = {}      # attribute -> {pivot column: row reduced to 1 there}, over the rows kept so far
+    rows, rho = [], []
+    for label, row in compiled.sparseItems():
+        basis = bases.setdefault(attribute_registry.strip_index(label), {})
+        reduced = dict((j, Fraction(x)) for j, x in row)
+        for column in sorted(basis):
+            factor = reduced.get(column)
+            if factor:
+                for j, x in basis[column].items():
+                    y = reduced.get(j, 0) - factor * x
+                    if y: reduced[j] = y
+                    else: reduced.pop(j, None)
+        if not reduced:
+            continue
+        # a new pivot; its column is eliminated from the other basis rows, keeping the basis in reduced echelon form
+        column = min(reduced)
+        pivot = dict((j, x / reduced[column]) for j, x in reduced.items())
+        for other in basis.values():
+            factor = other.get(column)
+            if factor:
+                for j, x in pivot.items():
+                    y = other.get(j, 0) - factor * x
+                    if y: other[j] = y
+                    else: other.pop(j, None)
+        basis[column] = pivot
+        rows.append(row)
+        rho.append(label)
+    used = sorted(set([0]).union(j for row in rows for j, x in row))
+    renumber = dict((j, i) for i, j in enumerate(used))
+    return CompiledMSP([tuple((renumber[j], x) for j, x in row) for row in rows], rho, len(used))
+
+class MSPCache(LRUCache):
+    # entries: fingerprint -> CompiledMSP
+    def __init__(self, maxsize=1024, compiler=compileMSP):
+        LRUCache.__init__(self, maxsize)
+        self.compiler = compiler        # policy tree -> CompiledMSP
+        self.trees = OrderedDict()      # id(tree) -> (tree, CompiledMSP) for the trees of the policy cache,
+                                        # the tree kept so its id stays unique
+
+    def get(self, tree):
+        """ return the CompiledMSP of a policy tree, converting it on a miss."""
+        frozen = policy_cache.holds(tree)
+        if frozen:
+            with self.lock:
+                entry = self.trees.get(id(tree))
+                if entry is not None and entry[0] is tree:
+                    self.trees.move_to_end(id(tree))
+                    self.hits += 1
+                    return entry[1]
+        key = str(tree)     # the fingerprint: the policy with its labels and thresholds
+        compiled = self.lookup(key)
+        if compiled is MISSING:
+            compiled = self.add(key, self.compiler(tree))
+        if frozen and self.maxsize > 0:
+            with self.lock:
+                self.trees[id(tree)] = (tree, compiled)
+                self.trees.move_to_end(id(tree))
+                while len(self.trees) > self.maxsize:
+                    self.trees.popitem(last=False)
+        return compiled
+
+    def clear(self):
+        with self.lock:
+            LRUCache.clear(self)
+            self.trees.clear()
+
+msp_cache = MSPCache()
+minimal_msp_cache = MSPCache(compiler=compileMinimalMSP)
@@ -0,0 +1,84 @@
+'''
+Complexity analysis of policy trees, for admission control before keygen, encrypt and decrypt. It is
+computed from the tree alone, in one pass: the size of the MSP and the number of candidate attribute
+subsets that PolicyParser.requiredAttributeList enumerates, which the A2BE decrypt loops try one by one.
+MSP.analyzePolicy adds an estimate of the group operations from the cost model of the scheme, and
+checks them against the limits of the scheme (MSP.limits).
+'''
+from collections import namedtuple
+
+from policytree import OpType, postOrder, getChildren
+
+# rows, cols: size of the MSP; depth: of the tree; threshold_rows: rows under a threshold gate, which decrypt
+#   raises to their reconstruction coefficient; subsets: candidate subsets of requiredAttributeList when
+#   every attribute of the policy is present; operations: estimated group operations of the algorithm that
+#   takes the policy (KP keygen, CP encrypt) and of a decrypt with every row, see MSP.analyzePolicy
+PolicyAnalysis = namedtuple('PolicyAnalysis', ['rows', 'cols', 'depth', 'threshold_rows', 'subsets', 'operations'])
+
+# limits of an admission check, None for no limit. max_operations applies to the policy algorithm and to
+# decrypt. With downgrade, a policy over a limit is simplified before it is rejected, and an A2BE decrypt
+# with more than max_subsets candidate subsets tries a single one instead.
+PolicyLimits = namedtuple('PolicyLimits', ['max_rows', 'max_cols', 'max_subsets', 'max_operations', 'downgrade'])
+PolicyLimits.__new__.__defaults__ = (None, None, None, None, False)
+
+class PolicyTooComplex(ValueError):
+    """ raised when a policy is over the limits of an admission check."""
+
+def countSubsets(tree, attributes=None):
+    """ the number of candidate subsets that requiredAttributeList(tree, attributes) returns: a leaf counts
+    once if its attribute is in attributes (always if attributes is None), an OR adds up its children, an
+    AND multiplies them and a k-of-n gate sums the products over every choice of k children."""
+    counts = {}
+    for node in postOrder(tree):
+        type = node.getNodeType()
+        if type == OpType.ATTR:
+            count = 1 if attributes is None or node.getAttribute() in attributes else 0
+        elif type == OpType.AND:
+            count = counts.pop(id(node.getLeft())) * counts.pop(id(node.getRight()))
+        elif type == OpType.OR:
+            count = counts.pop(id(node.getLeft())) + counts.pop(id(node.getRight()))
+        else:
+            # choices[j]: the sum over every choice of j of the children seen so far
+            choices = [1] + [0] * node.threshold
+            for child in node.children:
+                child_count = counts.pop(id(child))
+                for j in range(node.threshold, 0, -1):
+                    choices[j] += choices[j - 1] * child_count
+            count = choices[node.threshold]
+        counts[id(node)] = count
+    return counts[id(tree)]
+
+def analyzeTree(tree):
+    """ the PolicyAnalysis of a policy tree, without the operations."""
+    order = postOrder(tree)
+    rows, cols, threshold_rows = 0, 1, 0
+    below_threshold = set()
+    for node in reversed(order):
+        # parents before children
+        type = node.getNodeType()
+        if type == OpType.ATTR:
+            rows += 1
+            if id(node) in below_threshold: threshold_rows += 1
+            continue
+        if type == OpType.AND: cols += 1
+        elif type == OpType.THRESHOLD: cols += node.threshold - 1
+        if type == OpType.THRESHOLD or id(node) in below_threshold:
+            below_threshold.update(id(child) for child in getChildren(node))
+    depths = {}
+    for node in order:
+        children = getChildren(node)
+        depths[id(node)] = 1 + max(depths.pop(id(child)) for child in children) if children else 0
+    return PolicyAnalysis(rows, cols, depths[id(tree)], threshold_rows, countSubsets(tree), None)
+
+def checkLimits(analysis, limits):
+    """ the reasons why a PolicyAnalysis is over the limits, empty if it is within them."""
+    reasons = []
+    if limits.max_rows is not None and analysis.rows > limits.max_rows:
+        reasons.append('%d MSP rows > %d' % (analysis.rows, limits.max_rows))
+    if limits.max_cols is not None and analysis.cols > limits.max_cols:
+        reasons.append('%d MSP columns > %d' % (analysis.cols, limits.max_cols))
+    if limits.max_operations is not None and analysis.operations is not None:
+        for algorithm, operations in sorted(analysis.operations.items()):
+            if operations > limits.max_operations:
+                reasons.append('%d group operations in %s > %d' % (operations, algorithm, limits.max_operations))
+    return reasons
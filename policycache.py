@@ -0,0 +1,85 @@
+'''
+Process-wide cache of compiled policies, shared by MSP.createPolicy and SecretUtil.createPolicy.
+A policy string is parsed and its duplicate attributes labelled once; repeated policies then cost
+a dictionary lookup. The cached tree is shared between callers and must not be modified in place
+(strip a copy instead); holds() tells whether a tree is one of them, so the MSP cache can look it up by
+identity.
+'''
+from collections import namedtuple
+
+import policytree
+from policytree import PolicyParser, getLeaves, getMSPSize
+from lrucache import LRUCache, MISSING
+
+# tree: BinNode policy with duplicate attributes labelled (x_0, x_1, ...)
+# duplicates: attributes that occur more than once in the policy
+# attributes: labelled attributes in order (left to right)
+# reduction: for a simplified policy, {'rows': (before, after), 'cols': (before, after)} of its MSP, else None
+# names, values: the tree with name:value attributes cut down to the names / the values (used by the
+#   A2BE schemes); they share every unchanged node with tree, so plain policies cost nothing extra
+CompiledPolicy = namedtuple('CompiledPolicy', ['policy_string', 'tree', 'duplicates', 'attributes', 'reduction',
+                                               'names', 'values'])
+
+class PolicyCache(LRUCache):
+    # entries: (policy string, simplify, rebalance) -> CompiledPolicy
+    def __init__(self, maxsize=1024):
+        LRUCache.__init__(self, maxsize)
+        self.parser = PolicyParser()
+        self.trees = {}                 # id(tree) -> tree, for tree, names and values of every cached policy
+
+    def compile(self, policy_string, simplify=False, rebalance=False):
+        """ parse a policy string, simplify and rebalance it if asked to and label its duplicate attributes."""
+        parser = self.parser
+        policy_obj = parser.parse(policy_string)
+        reduction = None
+        if simplify:
+            rows, cols = getMSPSize(policy_obj)
+            policy_obj = parser.simplify(policy_obj)
+            new_rows, new_cols = getMSPSize(policy_obj)
+            reduction = {'rows': (rows, new_rows), 'cols': (cols, new_cols)}
+        if rebalance:
+            policy_obj = parser.rebalance(policy_obj)
+        _dictCount, _dictLabel = {}, {}
+        parser.findDuplicates(policy_obj, _dictCount)
+        for i in _dictCount.keys():
+            if _dictCount[ i ] > 1: _dictLabel[ i ] = 0
+        parser.labelDuplicates(policy_obj, _dictLabel)
+        attributes = [node.getAttributeAndIndex() for node in getLeaves(policy_obj)]
+        return CompiledPolicy(policy_string, policy_obj, frozenset(_dictLabel), tuple(attributes), reduction,
+                              parser.policy_stripped(policy_obj), parser.policy_stripped_2(policy_obj))
+
+    def get(self, policy_string, simplify=False, rebalance=False):
+        """ return the compiled policy for policy_string, compiling it on a miss."""
+        key = (policy_string, bool(simplify), bool(rebalance))
+        compiled = self.lookup(key)
+        if compiled is MISSING:
+            # another thread may have compiled the same string meanwhile, add keeps one tree for both
+            compiled = self.add(key, self.compile(policy_string, simplify, rebalance))
+        return compiled
+
+    def added(self, key, compiled):
+        for tree in (compiled.tree, compiled.names, compiled.values):
+            self.trees[id(tree)] = tree
+
+    def evicted(self, key, compiled):
+        for tree in (compiled.tree, compiled.names, compiled.values):
+            self.trees.pop(id(tree), None)
+
+    def holds(self, tree):
+        """ whether tree is the tree, names or values of a cached policy, which no caller modifies."""
+        return self.trees.get(id(tree)) is tree
+
+    def clear(self):
+        with self.lock:
+            LRUCache.clear(self)
+            self.trees.clear()
+
+policy_cache = PolicyCache()
+
+def setNumericBits(name, bits):
+    """ set the bit width of the numeric attribute name (its values are 0..2^bits-1). Compiled comparisons
+    depend on the widths, so the policy cache is cleared."""
+    if bits < 1:
+        raise ValueError("invalid bit width %d for %s" % (bits, name))
+    policytree.numeric_bits[name.upper()] = bits
+    policy_cache.clear()
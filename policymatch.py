@@ -0,0 +1,208 @@
+'''
+Bulk eligibility checks between policies and attribute sets, done before any pairing work: which of many
+keys can decrypt a ciphertext, which stored ciphertexts a key can open. A policy is compiled once into a
+PolicyMatcher, a program over bitmasks of its attributes. A MatchIndex holds many policies and many
+attribute sets; an attribute set is matched against its policies through posting lists, and a policy
+against all its attribute sets at once, bit j of every mask standing for attribute set j; the positions
+of removed attribute sets are reused, so the masks are as wide as the most sets indexed at one time.
+Matching follows PolicyParser.prune: a leaf matches an attribute with the same string. Policies and
+attribute sets are indexed by their attribute strings; the bit of an attribute is local to its matcher.
+'''
+from policytree import OpType, _operands
+from policycache import policy_cache
+
+class PolicyMatcher:
+    def __init__(self, tree):
+        # attributes: the attribute of bit i of the masks
+        # program: the and/or chains flattened into n-ary gates, children before parents, as
+        #   (type, threshold, leaf_mask, leaf_bits, children): leaf_mask has the bits of the leaves directly
+        #   below the gate (None for a k-of-n gate with a repeated leaf, which must count it twice),
+        #   children are the positions of the gates directly below it
+        self.attributes = []
+        self.program = []
+        bit_of = {}
+        operands, order, stack = {}, [], [tree]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if node.getNodeType() != OpType.ATTR:
+                operands[id(node)] = _operands(node)
+                stack.extend(operand for operand in operands[id(node)] if operand.getNodeType() != OpType.ATTR)
+        position = {}
+        for node in reversed(order):
+            type = node.getNodeType()
+            leaves = operands.get(id(node), [node])
+            leaf_bits = []
+            for leaf in leaves:
+                if leaf.getNodeType() != OpType.ATTR:
+                    continue
+                attribute = leaf.getAttribute()
+                if attribute not in bit_of:
+                    bit_of[attribute] = len(self.attributes)
+                    self.attributes.append(attribute)
+                leaf_bits.append(bit_of[attribute])
+            leaf_mask = 0
+            for bit in leaf_bits:
+                leaf_mask |= 1 << bit
+            if type == OpType.ATTR:
+                type = OpType.AND   # a single leaf policy
+            elif type == OpType.THRESHOLD and len(set(leaf_bits)) < len(leaf_bits):
+                leaf_mask = None
+            children = [position[id(leaf)] for leaf in leaves if leaf.getNodeType() != OpType.ATTR]
+            position[id(node)] = len(self.program)
+            self.program.append((type, node.threshold, leaf_mask, leaf_bits, children))
+
+    def mask(self, attributes):
+        """ the mask of the policy's attributes among a set of attributes."""
+        mask = 0
+        for bit, attribute in enumerate(self.attributes):
+            if attribute in attributes:
+                mask |= 1 << bit
+        return mask
+
+    def matches(self, attributes):
+        """ whether the attributes satisfy the policy."""
+        return self.matchesMask(self.mask(set(attributes)))
+
+    def matchesMask(self, mask):
+        values = []
+        for type, threshold, leaf_mask, leaf_bits, children in self.program:
+            if type == OpType.AND:
+                value = (mask & leaf_mask) == leaf_mask and all(values[child] for child in children)
+            elif type == OpType.OR:
+                value = (mask & leaf_mask) != 0 or any(values[child] for child in children)
+            else:
+                if leaf_mask is None:
+                    count = sum((mask >> bit) & 1 for bit in leaf_bits)
+                else:
+                    count = bin(mask & leaf_mask).count('1')
+                value = count + sum(values[child] for child in children) >= threshold
+            values.append(value)
+        return values[-1]
+
+    def matchesColumns(self, columns, width):
+        """ evaluate the policy on width attribute sets at once: columns[i] has bit j set if attribute set j
+        holds the attribute of bit i. Returns the mask of the attribute sets that satisfy the policy."""
+        all_sets = (1 << width) - 1
+        values = []
+        for type, threshold, leaf_mask, leaf_bits, children in self.program:
+            inputs = [columns[bit] for bit in leaf_bits] + [values[child] for child in children]
+            if type == OpType.AND:
+                value = all_sets
+                for x in inputs: value &= x
+            elif type == OpType.OR:
+                value = 0
+                for x in inputs: value |= x
+            else:
+                # at_least[j]: the sets with at least j of the inputs seen so far
+                at_least = [all_sets] + [0] * threshold
+                for x in inputs:
+                    for j in range(threshold, 0, -1):
+                        at_least[j] |= at_least[j - 1] & x
+                value = at_least[threshold]
+            values.append(value)
+        return values[-1]
+
+class MatchIndex:
+    def __init__(self):
+        self.policies = {}          # key -> PolicyMatcher
+        self.policy_postings = {}   # attribute -> keys of the policies with that attribute
+        self.set_keys = []          # j -> key of attribute set j (None once removed)
+        self.set_attributes = []    # j -> attributes of attribute set j
+        self.free = []              # positions j of removed attribute sets, reused first
+        self.positions = {}         # key -> j
+        self.set_postings = {}      # attribute -> the attribute sets j with that attribute
+        self.columns = {}           # attribute -> mask of set_postings, rebuilt when it changes
+
+    def addPolicy(self, key, policy):
+        """ index a policy, given as a string or a policy tree, under key."""
+        if type(policy) is str:
+            policy = policy_cache.get(policy).tree
+        self.remove(key)
+        matcher = PolicyMatcher(policy)
+        self.policies[key] = matcher
+        for attribute in matcher.attributes:
+            self.policy_postings.setdefault(attribute, set()).add(key)
+
+    def addAttributes(self, key, attributes):
+        """ index an attribute set under key."""
+        self.remove(key)
+        attributes = frozenset(attributes)
+        if self.free:
+            j = self.free.pop()
+            self.set_keys[j], self.set_attributes[j] = key, attributes
+        else:
+            j = len(self.set_keys)
+            self.set_keys.append(key)
+            self.set_attributes.append(attributes)
+        self.positions[key] = j
+        for attribute in attributes:
+            self.set_postings.setdefault(attribute, set()).add(j)
+            self.columns.pop(attribute, None)
+
+    def add(self, key, item):
+        """ index a key or a ciphertext under key: its policy if it has one, else its attribute list."""
+        if 'policy' in item:
+            self.addPolicy(key, item['policy'])
+        else:
+            self.addAttributes(key, item['attr_list'])
+
+    def remove(self, key):
+        matcher = self.policies.pop(key, None)
+        if matcher is not None:
+            for attribute in matcher.attributes:
+                postings = self.policy_postings[attribute]
+                postings.discard(key)
+                if not postings:
+                    del self.policy_postings[attribute]
+        j = self.positions.pop(key, None)
+        if j is not None:
+            for attribute in self.set_attributes[j]:
+                postings = self.set_postings[attribute]
+                postings.discard(j)
+                if not postings:
+                    del self.set_postings[attribute]
+                self.columns.pop(attribute, None)
+            self.set_keys[j], self.set_attributes[j] = None, None
+            self.free.append(j)
+
+    def policiesMatching(self, attributes):
+        """ the keys of the indexed policies that the attributes satisfy."""
+        attributes = set(attributes)
+        # a policy with none of the attributes cannot be satisfied
+        candidates = set()
+        for attribute in attributes:
+            candidates.update(self.policy_postings.get(attribute, ()))
+        return set(key for key in candidates if self.policies[key].matchesMask(self.policies[key].mask(attributes)))
+
+    def attributesMatching(self, policy):
+        """ the keys of the indexed attribute sets that satisfy a policy, given as a string, a policy tree
+        or a PolicyMatcher."""
+        if not isinstance(policy, PolicyMatcher):
+            if type(policy) is str:
+                policy = policy_cache.get(policy).tree
+            policy = PolicyMatcher(policy)
+        width = len(self.set_keys)
+        columns = [self.column(attribute) for attribute in policy.attributes]
+        result = policy.matchesColumns(columns, width)
+        bits = bin(result)[:1:-1]
+        return set(self.set_keys[j] for j in range(len(bits)) if bits[j] == '1')
+
+    def matching(self, item):
+        """ the indexed keys or ciphertexts that match a ciphertext or a key: the attribute sets that
+        satisfy its policy if it has one, else the policies that its attribute list satisfies."""
+        if 'policy' in item:
+            return self.attributesMatching(item['policy'])
+        return self.policiesMatching(item['attr_list'])
+
+    def column(self, attribute):
+        """ the mask of the attribute sets with the attribute, bit j for attribute set j."""
+        column = self.columns.get(attribute)
+        if column is None:
+            positions = self.set_postings.get(attribute, ())
+            bitmap = bytearray(max(positions, default=0) // 8 + 1)
+            for j in positions:
+                bitmap[j >> 3] |= 1 << (j & 7)
+            column = int.from_bytes(bitmap, 'little')
+            self.columns[attribute] = column
+        return column
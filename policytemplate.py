@@ -0,0 +1,68 @@
+'''
+Policy templates: a policy shape such as "(DEPT:{dept} and ROLE:{role}) or ADMIN:{admin}" whose slots
+are filled in per call. The shape is parsed, labelled and converted to an MSP once; binding values only
+relabels the leaves, so the specialized routines built on a template (FABESA_CP.compile_encrypt,
+FABESA_KP.compile_keygen) skip the parser, the policy cache and the MSP conversion on every call.
+'''
+import re
+
+from policytree import relabel, getLeaves, _LEAF
+
+# describes a slot {name} in a template
+_SLOT = re.compile(r'\{([A-Za-z][A-Za-z0-9]*)\}')
+# a slot as it appears in the compiled policy, $0$, $1$, ...
+_TOKEN = re.compile(r'\$([0-9]+)\$')
+
+class PolicyTemplate:
+    def __init__(self, util, template_string, simplify=None, rebalance=None):
+        self.template_string = template_string
+        self.slots = []     # slot names in order of first occurrence
+
+        def token(match):
+            if match.group(1) not in self.slots:
+                self.slots.append(match.group(1))
+            return '$%d$' % self.slots.index(match.group(1))
+
+        compiled = util.compilePolicy(_SLOT.sub(token, template_string), simplify, rebalance)
+        self.tree = compiled.tree
+        mono_span_prog = util.convert_policy_to_msp(self.tree)
+        self.num_cols = mono_span_prog.num_cols
+        # groups: the distinct row vectors of the MSP (CompiledMSP.groups), so a share is computed once per
+        #   group and without the zero columns
+        # rows: (attribute, label suffix, group) for every MSP row in order
+        # formats: every attribute with its slots as {0}, {1}, ...
+        self.groups = mono_span_prog.groups
+        self.rows = []
+        self.formats = {}
+        for node in getLeaves(self.tree):
+            group = mono_span_prog.row_groups[mono_span_prog.order[node.getAttributeAndIndex()]]
+            suffix = '' if node.index is None else '_' + str(node.index)
+            self.rows.append((node.attribute, suffix, group))
+            self.formats[node.attribute] = _TOKEN.sub(r'{\1}', node.attribute)
+
+    def values(self, values):
+        """ the slot values in slot order, upper-cased and checked to be plain attribute text."""
+        args = []
+        for name in self.slots:
+            value = str(values[name]).upper()
+            if not _LEAF.fullmatch(value) or '_' in value or '$' in value:
+                raise ValueError("invalid value %r for slot %s" % (value, name))
+            args.append(value)
+        return args
+
+    def format(self, values):
+        """ the policy string with the slots filled in."""
+        args = dict(zip(self.slots, self.values(values)))
+        return _SLOT.sub(lambda match: args[match.group(1)], self.template_string)
+
+    def bind(self, values):
+        """ fill in the slots: returns the policy tree and its rows [(label, attribute, group)], or None if
+        two different template attributes end up equal (their rows then need labelling afresh)."""
+        args = self.values(values)
+        bound = {}
+        for attribute, attribute_format in self.formats.items():
+            bound[attribute] = attribute_format.format(*args)
+        if len(set(bound.values())) < len(bound):
+            return None
+        rows = [(bound[attribute] + suffix, bound[attribute], group) for attribute, suffix, group in self.rows]
+        return relabel(self.tree, bound.__getitem__), rows
@@ -1,125 +1,637 @@
 #!/usr/bin/python
 
-from pyparsing import *
 from charm.toolbox.node import *
 import string
 import copy
+import functools
+import heapq
+import itertools
+import re
 
-objStack = []
-
-def createAttribute(s, loc, toks):
-    if toks[0] == '!':
-        newtoks = ""
-        for i in toks:
-            newtoks += i
-        return BinNode(newtoks)
-    # print("toks:", toks)
-    #return BinNode(toks[0]) # create
-    # Revised by Z. Wan for attribute in the format of "Position:Doctor"----Note: NO SPACE!!!
-    # toks[0]=Position, toks[1]=":", toks[2]="Doctor"
-    newtoks = ""
-    for j in toks:
-        newtoks += j
-    return BinNode(newtoks)
-
-# convert 'attr < value' to a binary tree based on 'or' and 'and'
-def parseNumConditional(s, loc, toks):
-    #print("print: %s" % toks)
-    return BinNode(toks[0])
-
-def printStuff(s, loc, toks):
-    #print("print: %s" % toks)
-    return toks
-        
-def pushFirst( s, loc, toks ):
-    objStack.append( toks[0] )
+from attributeregistry import attribute_registry
+
+# Hand-written replacement for the former pyparsing grammar. The regular expressions below are
+# compiled once and never mutated, so a PolicyParser holds no parse state and can be shared
+# between threads.
+_WHITESPACE = re.compile(r'[ \t\r\n]*')
+# describes an individual leaf node, e.g. "Position:Doctor" (Z. Wan) ----Note: NO SPACE!!!
+_LEAF = re.compile(r'[A-Za-z0-9:\-_./\\?!@#$^&*%]+')
+# describes expressions such as (attr < value)
+_CONDITIONAL = re.compile(r'([A-Za-z0-9]+)[ \t\r\n]*(<=|>=|==|[<>](?![<>]))[ \t\r\n]*([0-9]+)')
+# describes the start of a threshold gate such as 2 of (A, B, C)
+_THRESHOLD = re.compile(r'([0-9]+)[ \t\r\n]+of[ \t\r\n]*\(')
+
+class PolicyNode:
+    """ Compact policy tree node with the interface of charm's BinNode. The attributes live in
+    __slots__ instead of a per-node __dict__, which roughly halves the memory of a large policy.
+    Policy trees are shared through the policy cache and treated as immutable: a modified variant
+    is built with relabel(), which copies only the leaves that change and the gates above them.
+    """
+    __slots__ = ('type', 'attribute', 'negated', 'index', 'threshold', 'left', 'right')
+
+    def __init__(self, value, left=None, right=None):
+        self.negated = False
+        self.index = None
+        self.threshold = None
+        if(isinstance(value, str)):
+            if value[0] == '!':
+                value = value[1:]
+                self.negated = True
+            if value.find('_') != -1:
+                val = value.split('_')
+                self.index = int(val[1])
+                value = val[0]
+            self.type = OpType.ATTR
+            self.attribute = value.upper()
+        elif(value >= OpType.OR and value < OpType.NONE):
+            self.type = value
+            if self.type == OpType.OR:
+                self.threshold = 1
+            elif self.type == OpType.AND:
+                self.threshold = 2
+            self.attribute = ''
+        else:
+            self.type = None
+            self.attribute = ''
+        self.left = left
+        self.right = right
+
+    def __str__(self):
+        # built on an explicit stack, so deep policies print without hitting the recursion limit
+        parts, stack = [], [self]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, str):
+                parts.append(node)
+            elif node.type == OpType.ATTR:
+                parts.append(node.getAttributeAndIndex())
+            elif node.type == OpType.THRESHOLD:
+                items = ['(' + str(node.threshold) + ' of (']
+                for child in node.children:
+                    items += [child, ', ']
+                items[-1] = '))'
+                stack.extend(reversed(items))
+            elif node.type == OpType.OR or node.type == OpType.AND:
+                op = ' or ' if node.type == OpType.OR else ' and '
+                stack.extend([')', node.right, op, node.left, '('])
+            else:
+                parts.append('None')
+        return ''.join(parts)
+
+    def getAttribute(self):
+        if (self.type == OpType.ATTR):
+            prefix = '!' if self.negated else ''
+            return prefix + self.attribute
+        return
+
+    def getAttributeAndIndex(self):
+        if (self.type == OpType.ATTR):
+            prefix = '!' if self.negated else ''
+            postfix = '_' + str(self.index) if self.index != None else ''
+            return prefix + self.attribute + postfix
+        return
+
+    def __eq__(self, other):
+        if other == None:
+            return False
+        if type(self) == type(other):
+            return self.getAttribute() == other.getAttribute()
+        elif type(other) in [str, bytes]:
+            return other in self.getAttributeAndIndex()
+        else:
+            raise ValueError('PolicyNode - invalid comparison.')
+
+    def getLeft(self):
+        return self.left
+
+    def getRight(self):
+        return self.right
+
+    def getNodeType(self):
+        return self.type
+
+    def addSubNode(self, left, right):
+        self.left = left if left != None else None
+        self.right = right if left != None else None
 
 def createTree(op, node1, node2):
     if(op == "or"):
-        node = BinNode(OpType.OR)
+        node = PolicyNode(OpType.OR)
     elif(op == "and"):
-        node = BinNode(OpType.AND)
+        node = PolicyNode(OpType.AND)
     else:
         return None
     node.addSubNode(node1, node2)
     return node
 
+class ThresholdNode(PolicyNode):
+    """ k-of-n gate over a list of children, written 'k of (A, B, C)' in a policy string.
+    It has no left/right subnodes; use getChildren() to walk a policy tree."""
+    __slots__ = ('children',)
+
+    def __init__(self, threshold, children):
+        PolicyNode.__init__(self, OpType.THRESHOLD)
+        self.threshold = threshold
+        self.children = children
+
+def createThreshold(threshold, children):
+    """ 1-of-n and n-of-n gates are plain or/and chains, anything else becomes a ThresholdNode."""
+    if threshold < 1 or threshold > len(children):
+        raise ValueError("invalid threshold gate: %d of %d" % (threshold, len(children)))
+    if threshold == 1 or threshold == len(children):
+        op = "or" if threshold == 1 else "and"
+        node = children[0]
+        for child in children[1:]:
+            node = createTree(op, node, child)
+        return node
+    return ThresholdNode(threshold, children)
+
+def getChildren(node):
+    """ the subnodes of a policy tree node, left to right."""
+    if node.getNodeType() == OpType.THRESHOLD:
+        return node.children
+    if node.getNodeType() == OpType.ATTR:
+        return []
+    return [node.getLeft(), node.getRight()]
+
+def postOrder(tree):
+    """ the nodes of a policy tree in post-order (children left to right, then the node). The tree
+    is walked on an explicit stack, so its depth is not bounded by the recursion limit."""
+    order, stack = [], [tree]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        stack.extend(getChildren(node))
+    order.reverse()
+    return order
+
+def getLeaves(tree):
+    """ the attribute nodes of a policy tree, left to right."""
+    return [node for node in postOrder(tree) if node.getNodeType() == OpType.ATTR]
+
+def relabel(tree, function):
+    """ copy-on-write variant of a policy tree with every leaf attribute replaced by function(attribute).
+    Leaves that keep their attribute and gates with no changed leaf below them are shared with the
+    input tree, which is not modified; if nothing changes the input tree itself is returned."""
+    new_nodes = {}
+    for node in postOrder(tree):
+        type = node.getNodeType()
+        if type == OpType.ATTR:
+            attribute = function(node.attribute)
+            if attribute == node.attribute:
+                new_node = node
+            else:
+                new_node = copy.copy(node)
+                new_node.attribute = attribute
+        else:
+            children = getChildren(node)
+            new_children = [new_nodes.pop(id(child)) for child in children]
+            if all(new_child is child for new_child, child in zip(new_children, children)):
+                new_node = node
+            elif type == OpType.THRESHOLD:
+                new_node = ThresholdNode(node.threshold, new_children)
+            else:
+                new_node = PolicyNode(type, new_children[0], new_children[1])
+        new_nodes[id(node)] = new_node
+    return new_nodes[id(tree)]
+
+def getMSPSize(tree):
+    """ the (rows, columns) of the monotone span program of a policy tree: one row per leaf, one
+    column for the root, one more per AND gate and k-1 more per k-of-n gate."""
+    rows, cols = 0, 1
+    stack = [tree]
+    while stack:
+        node = stack.pop()
+        type = node.getNodeType()
+        if type == OpType.ATTR: rows += 1
+        elif type == OpType.AND: cols += 1
+        elif type == OpType.THRESHOLD: cols += node.threshold - 1
+        stack.extend(getChildren(node))
+    return rows, cols
+
+# Numeric comparisons such as "level >= 5" are compiled into bit-decomposition sub-policies over
+# bit attributes "LEVEL#1XXX" (bit 3 of LEVEL is 1, most significant bit first, X = any bit). A key
+# or ciphertext holding "LEVEL=9" is expanded into one such attribute per bit by expandAttributes,
+# so a comparison costs at most one MSP row per bit instead of one per value in the range.
+DEFAULT_NUMERIC_BITS = 32
+numeric_bits = {}   # bit width per (upper-case) numeric attribute name, DEFAULT_NUMERIC_BITS otherwise
+
+_NUMERIC_ATTRIBUTE = re.compile(r'([A-Za-z0-9]+)[ \t]*=[ \t]*([0-9]+)$')
+
+def getNumericBits(name):
+    return numeric_bits.get(name.upper(), DEFAULT_NUMERIC_BITS)
+
+def bitAttribute(name, bits, position, bit):
+    """ the attribute for 'bit number position (0 = least significant) of name is bit'."""
+    return '%s#%s%d%s' % (name.upper(), 'X' * (bits - 1 - position), bit, 'X' * position)
+
+def numericComparison(name, op, value):
+    """ policy tree for 'name op value' with op in <, <=, >, >=, ==, over the values 0..2^bits-1 of name.
+    Built from the least significant bit up: x >= c is 'x_i and (rest)' where c_i = 1 and 'x_i or (rest)'
+    where c_i = 0 (trailing zeros of c drop out), x < c is the dual over the 0 bits. A comparison has at
+    most bits leaves and AND gates; comparisons that always or never hold raise ValueError."""
+    bits = getNumericBits(name)
+    comparison = '%s %s %d' % (name, op, value)
+    if op == '==':
+        if value >> bits:
+            raise ValueError("%s never holds with %d bits" % (comparison, bits))
+        node = None
+        for i in range(bits):
+            leaf = PolicyNode(bitAttribute(name, bits, i, (value >> i) & 1))
+            node = leaf if node is None else createTree("and", leaf, node)
+        return node
+    if op == '>':
+        op, value = '>=', value + 1
+    elif op == '<=':
+        op, value = '<', value + 1
+    if value <= 0 or value >> bits:
+        raise ValueError("%s always or never holds with %d bits" % (comparison, bits))
+    # node is None while the part built so far is constant (true for >=, false for <)
+    node, bit = None, 1 if op == '>=' else 0
+    for i in range(bits):
+        leaf = PolicyNode(bitAttribute(name, bits, i, bit))
+        if (value >> i) & 1:
+            # x >= c needs x_i = 1 where c_i = 1, x < c is met by x_i = 0 where c_i = 1
+            node = leaf if node is None else createTree("and" if bit else "or", leaf, node)
+        elif node is not None:
+            node = createTree("or" if bit else "and", leaf, node)
+    return node
+
+def expandAttributes(attributes):
+    """ replace every numeric attribute 'NAME=VALUE' by its bit attributes (see numericComparison);
+    other attributes are kept as they are."""
+    expanded = []
+    for attribute in attributes:
+        match = _NUMERIC_ATTRIBUTE.match(attribute)
+        if not match:
+            expanded.append(attribute)
+            continue
+        name, value = match.group(1), int(match.group(2))
+        bits = getNumericBits(name)
+        if value >> bits:
+            raise ValueError("%s does not fit into %d bits" % (attribute, bits))
+        expanded.extend(bitAttribute(name, bits, i, (value >> i) & 1) for i in reversed(range(bits)))
+    return expanded
+
+# Terms of the simplifier: ('attr', key, leaf), ('and', key, [terms]), ('or', key, [terms]) and
+# ('thr', key, (threshold, [terms])). The key is a canonical string, equal keys are equal policies.
+def _makeTerm(op, items):
+    """ an and/or term over items, flattening nested terms of the same op and dropping repeats."""
+    flat, seen = [], set()
+    for item in items:
+        for sub in (item[2] if item[0] == op else [item]):
+            if sub[1] not in seen:
+                seen.add(sub[1])
+                flat.append(sub)
+    if len(flat) == 1:
+        return flat[0]
+    return (op, op + '(' + ','.join(sorted(seen)) + ')', flat)
+
+def _clause(term, dual):
+    """ the keys of a term seen as a clause of the dual op: (A and B) => {A, B} under 'or'."""
+    if term[0] == dual:
+        return frozenset(item[1] for item in term[2])
+    return frozenset([term[1]])
+
+def _reduceTerm(op, items):
+    """ simplify an and/or term: absorption, then factoring of the terms shared by several clauses."""
+    dual = 'or' if op == 'and' else 'and'
+    term = _makeTerm(op, items)
+    if term[0] != op:
+        return term
+    items = term[2]
+    # absorption: A or (A and B) => A, and dually A and (A or B) => A
+    clauses = [_clause(item, dual) for item in items]
+    singles = set(item[1] for item in items if item[0] != dual)
+    compound = [i for i in range(len(items)) if items[i][0] == dual]
+    absorbed = set()
+    for i in compound:
+        if not singles.isdisjoint(clauses[i]) or \
+           any(j != i and j not in absorbed and clauses[j] < clauses[i] for j in compound):
+            absorbed.add(i)
+    items = [items[i] for i in range(len(items)) if i not in absorbed]
+    # factoring: (A and B) or (A and C) => A and (B or C), and dually for and over or
+    while True:
+        counts, factor = {}, None
+        for item in items:
+            if item[0] == dual:
+                for sub in item[2]:
+                    counts[sub[1]] = counts.get(sub[1], 0) + 1
+                    if counts[sub[1]] > 1 and (factor is None or counts[sub[1]] > counts[factor[1]]):
+                        factor = sub
+        if factor is None:
+            break
+        grouped, rest = [], []
+        for item in items:
+            if item[0] == dual and factor[1] in _clause(item, dual):
+                grouped.append(_makeTerm(dual, [sub for sub in item[2] if sub[1] != factor[1]]))
+            else:
+                rest.append(item)
+        items = rest + [_makeTerm(dual, [factor, _reduceTerm(op, grouped)])]
+    return _makeTerm(op, items)
+
+def _operands(node):
+    """ the operands of the whole and/or chain rooted at node, or the children of any other node."""
+    type = node.getNodeType()
+    if type != OpType.AND and type != OpType.OR:
+        return getChildren(node)
+    operands, stack = [], [node]
+    while stack:
+        node = stack.pop()
+        if node.getNodeType() == type:
+            stack.append(node.getRight())
+            stack.append(node.getLeft())
+        else:
+            operands.append(node)
+    return operands
+
+def _leafLists(node):
+    yield [node]
+
+def _chainLists(children):
+    # an OR: the lists of every operand in turn
+    for child in children:
+        yield from child()
+
+def _productLists(children):
+    # an AND: every combination of a list of each operand, the last operand varying fastest, kept as a
+    # stack of the running enumerations and the lists chosen so far (len(chosen) == len(running) - 1)
+    running, chosen = [children[0]()], []
+    while running:
+        item = next(running[-1], None)
+        if item is None:
+            running.pop()
+            if chosen: chosen.pop()
+        elif len(running) == len(children):
+            yield [node for part in chosen for node in part] + item
+        else:
+            chosen.append(item)
+            running.append(children[len(running)]())
+
+def _thresholdLists(children, threshold):
+    # a k-of-n gate: every choice of k satisfied operands, each combined like an AND
+    for chosen in itertools.combinations(children, threshold):
+        yield from _productLists(chosen)
+
+class _SortedLists:
+    # the (weight, list) pairs of a subtree in nondecreasing weight, generated on demand and kept, as a
+    # product reads them by position and a k-of-n gate shares its partial choices
+    def __init__(self, generator):
+        self.generator = generator
+        self.items = []
+
+    def get(self, i):
+        while len(self.items) <= i:
+            item = next(self.generator, None)
+            if item is None:
+                return None
+            self.items.append(item)
+        return self.items[i]
+
+    def __iter__(self):
+        i, item = 0, self.get(0)
+        while item is not None:
+            yield item
+            i += 1
+            item = self.get(i)
+
+def _weightedLeafLists(node, weight):
+    yield (weight, [node])
+
+def _weightedChainLists(children):
+    # an OR: the lists of the operands merged by weight, the earlier operand first among equal weights
+    return heapq.merge(*children, key=lambda item: item[0])
+
+def _weightedProductLists(left, right):
+    # an AND of two operands, best first over the pairs (a, b) of positions in their lists; the pair
+    # comes from (a, b - 1), or from (a - 1, 0) if b == 0, which is never heavier, so every pair is
+    # pushed once and only after a lighter one was yielded. The heap holds at most two pairs per yield.
+    first_left, first_right = left.get(0), right.get(0)
+    if first_left is None or first_right is None:
+        return
+    heap = [(first_left[0] + first_right[0], 0, 0)]
+    while heap:
+        weight, a, b = heapq.heappop(heap)
+        item_left = left.get(a)
+        yield (weight, item_left[1] + right.get(b)[1])
+        item_right = right.get(b + 1)
+        if item_right is not None:
+            heapq.heappush(heap, (item_left[0] + item_right[0], a, b + 1))
+        if b == 0:
+            item_left = left.get(a + 1)
+            if item_left is not None:
+                heapq.heappush(heap, (item_left[0] + first_right[0], a + 1, 0))
+
+def _weightedAndLists(children):
+    # an n-ary AND folded from the right into products of two, the last operand varying fastest
+    lists = children[-1]
+    for child in reversed(children[:-1]):
+        lists = _SortedLists(_weightedProductLists(child, lists))
+    return iter(lists)
+
+def _weightedThresholdLists(children, threshold):
+    # a k-of-n gate: choose[i][j] are the choices of j of the operands from i on, either with operand i
+    # (a product with choose[i + 1][j - 1]) or without it, merged by weight
+    n = len(children)
+    choose = [[None] * (threshold + 1) for _ in range(n + 1)]
+    for i in range(n, -1, -1):
+        for j in range(threshold + 1):
+            if j == 0:
+                choose[i][j] = _SortedLists(iter([(0, [])]))
+            elif n - i < j:
+                choose[i][j] = _SortedLists(iter(()))
+            else:
+                taken = _SortedLists(_weightedProductLists(children[i], choose[i + 1][j - 1]))
+                choose[i][j] = _SortedLists(_weightedChainLists([taken, choose[i + 1][j]]))
+    return iter(choose[0][threshold])
+
+def _buildTree(term):
+    if term[0] == 'attr':
+        return copy.copy(term[2])
+    if term[0] == 'thr':
+        return ThresholdNode(term[2][0], [_buildTree(item) for item in term[2][1]])
+    node = _buildTree(term[2][0])
+    for item in term[2][1:]:
+        node = createTree(term[0], node, _buildTree(item))
+    return node
+
 class PolicyParser:
     def __init__(self, verbose=False):
-        self.finalPol = self.getBNF()
         self.verbose = verbose
 
-    def getBNF(self):
-        # supported operators => (OR, AND, <
-        OperatorOR = Literal("OR").setParseAction(downcaseTokens) | Literal("or")
-        OperatorAND = Literal("AND").setParseAction(downcaseTokens) | Literal("and")
-        Operator = OperatorAND | OperatorOR
-        lpar = Literal("(").suppress()
-        rpar = Literal(")").suppress()
-
-        BinOperator = Literal("<=") | Literal(">=") | Literal("==") | Word("<>", max=1)
-
-        # describes an individual leaf node
-        #leafNode =  (Optional("!") + Word(alphanums+'-_./\?!@#$^&*%') ).setParseAction( createAttribute )
-        # Below format is for keyword search    Z. Wan 6/12/2015
-        leafNode =  (Optional("!") + Word(alphanums+':-_./\?!@#$^&*%') ).setParseAction( createAttribute )
-        # describes expressions such as (attr < value)
-        leafConditional = (Word(alphanums) + BinOperator + Word(nums)).setParseAction( parseNumConditional )
-
-        # describes the node concept
-        node = leafConditional | leafNode 
-
-        expr = Forward()
-        term = Forward()
-        atom = lpar + expr + rpar | (node).setParseAction( pushFirst )
-        term = atom + ZeroOrMore((Operator + term).setParseAction( pushFirst ))
-        expr << term + ZeroOrMore((Operator + term).setParseAction( pushFirst ))
-        finalPol = expr#.setParseAction( printStuff )
-        return finalPol
-    
-    def evalStack(self, stack):
-        op = stack.pop()
-        if op in ["or", "and"]:
-            op2 = self.evalStack(stack)
-            op1 = self.evalStack(stack)
-            return createTree(op, op1, op2)
-        else:
-            # Node value (attribute)
-            return op
-    
+    def parseNode(self, string, pos):
+        """ parses a single leaf at pos and returns (PolicyNode, end), or (None, pos) if there is none."""
+        # compile 'attr < value' into a comparison over the bits of attr
+        match = _CONDITIONAL.match(string, pos)
+        if match:
+            return numericComparison(match.group(1), match.group(2), int(match.group(3))), match.end()
+        prefix, start = '', pos
+        if string.startswith('!', pos):
+            prefix, start = '!', _WHITESPACE.match(string, pos + 1).end()
+        match = _LEAF.match(string, start)
+        if not match:
+            return None, pos
+        return PolicyNode(prefix + match.group()), match.end()
+
+    def parseOperator(self, string, pos):
+        """ parses 'and'/'AND'/'or'/'OR' at pos and returns (op, end), or (None, pos)."""
+        for literal, op in (("AND", "and"), ("and", "and"), ("OR", "or"), ("or", "or")):
+            if string.startswith(literal, pos):
+                return op, pos + len(literal)
+        return None, pos
+
+    def foldChain(self, operands, ops):
+        """ and/or share one precedence level and associate to the left: a op b op c => (a op b) op c."""
+        node = operands[0]
+        for i in range(len(ops)):
+            node = createTree(ops[i], node, operands[i + 1])
+        return node
+
     def parse(self, string):
-        #print("parse 0:", string)
-        global objStack
-        del objStack[:]
-        #print("parse 1:", string)
-        self.finalPol.parseString(string)
-        #print("parse 2")
-        return self.evalStack(objStack)
+        """ parses a policy string into a PolicyNode tree in a single left-to-right pass.
+        Parenthesised groups and threshold gates are kept on an explicit stack, so the nesting
+        depth and the length of and/or chains are not bounded by the recursion limit. As with the
+        former grammar, a dangling operator is ignored and parsing stops at the first unexpected token.
+        """
+        skip = _WHITESPACE.match
+        # enclosing groups: (operands, ops, resume, position of the group, gate) where gate is
+        # None for '(' ... ')' and [threshold, children] for 'k of (' ... ')'
+        groups = []
+        operands, ops, resume = [], [], None
+        pos = skip(string, 0).end()
+        while True:
+            match = _THRESHOLD.match(string, pos)
+            if match or string.startswith('(', pos):
+                gate = [int(match.group(1)), []] if match else None
+                groups.append((operands, ops, resume, pos, gate))
+                operands, ops, resume = [], [], None
+                pos = skip(string, match.end() if match else pos + 1).end()
+                continue
+            node, end = self.parseNode(string, pos)
+            while True:
+                if node is None:
+                    if resume is not None:
+                        # the operator before the failed atom is dropped and the chain ends there
+                        ops.pop()
+                        pos = resume
+                    elif groups:
+                        # the first atom of a group failed, so the group itself fails
+                        operands, ops, resume, pos, _ = groups.pop()
+                        continue
+                    else:
+                        raise ValueError("invalid policy string at position %d: %r" % (pos, string))
+                else:
+                    operands.append(node)
+                    pos = skip(string, end).end()
+                    op, end = self.parseOperator(string, pos)
+                    if op is not None:
+                        ops.append(op)
+                        resume = pos
+                        pos = skip(string, end).end()
+                        break
+                # the chain is complete
+                node = self.foldChain(operands, ops)
+                if not groups:
+                    return node
+                gate = groups[-1][4]
+                if gate is not None and string.startswith(',', pos):
+                    # next child of the threshold gate
+                    gate[1].append(node)
+                    operands, ops, resume = [], [], None
+                    pos = skip(string, pos + 1).end()
+                    break
+                if string.startswith(')', pos):
+                    operands, ops, resume, _, gate = groups.pop()
+                    if gate is not None:
+                        gate[1].append(node)
+                        node = createThreshold(gate[0], gate[1])
+                    end = pos + 1
+                else:
+                    operands, ops, resume, pos, _ = groups.pop()
+                    node = None
+
+    def simplify(self, tree):
+        """ returns an equivalent policy tree with fewer leaves and gates: and/or chains are flattened,
+        repeated terms dropped, absorbed clauses removed (A or (A and B) => A) and common terms
+        factored out ((A and B) or (A and C) => A and (B or C)). Threshold gates are kept as they
+        are, only their children are simplified. The input tree is not modified.
+        """
+        terms = {}
+        stack = [(tree, False)]
+        while stack:
+            node, visited = stack.pop()
+            operands = _operands(node)
+            if operands and not visited:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+                continue
+            type = node.getNodeType()
+            if type == OpType.ATTR:
+                term = ('attr', node.getAttributeAndIndex(), node)
+            elif type == OpType.THRESHOLD:
+                items = [terms.pop(id(child)) for child in operands]
+                term = ('thr', '%d of(%s)' % (node.threshold, ','.join(sorted(item[1] for item in items))),
+                        (node.threshold, items))
+            else:
+                term = _reduceTerm('and' if type == OpType.AND else 'or',
+                                   [terms.pop(id(operand)) for operand in operands])
+            terms[id(node)] = term
+        return _buildTree(terms[id(tree)])
+
+    def rebalance(self, tree):
+        """ returns an equivalent policy tree in which every and/or chain is a balanced tree of depth
+        log(n) instead of the left-deep chain built by the parser. The leaves keep their order, so
+        duplicate labels and pruning results are unchanged. The input tree is not modified.
+        """
+        nodes = {}
+        stack = [(tree, False)]
+        while stack:
+            node, visited = stack.pop()
+            operands = _operands(node)
+            if operands and not visited:
+                stack.append((node, True))
+                stack.extend((operand, False) for operand in reversed(operands))
+                continue
+            type = node.getNodeType()
+            if type == OpType.ATTR:
+                new_node = copy.copy(node)
+            elif type == OpType.THRESHOLD:
+                new_node = ThresholdNode(node.threshold, [nodes.pop(id(child)) for child in operands])
+            else:
+                op = "and" if type == OpType.AND else "or"
+                level = [nodes.pop(id(operand)) for operand in operands]
+                while len(level) > 1:
+                    paired = [createTree(op, level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+                    if len(level) % 2: paired.append(level[-1])
+                    level = paired
+                new_node = level[0]
+            nodes[id(node)] = new_node
+        return nodes[id(tree)]
 
     def findDuplicates(self, tree, _dict):
-        if tree.left: self.findDuplicates(tree.left, _dict)
-        if tree.right: self.findDuplicates(tree.right, _dict)
-        if tree.getNodeType() == OpType.ATTR:
-            key = tree.getAttribute()
+        for node in getLeaves(tree):
+            key = node.getAttribute()
             if _dict.get(key) == None: _dict[ key ] = 1
             else: _dict[ key ] += 1
 
     def labelDuplicates(self, tree, _dictLabel):
-        if tree.left: self.labelDuplicates(tree.left, _dictLabel)
-        if tree.right: self.labelDuplicates(tree.right, _dictLabel)
-        if tree.getNodeType() == OpType.ATTR:
-            key = tree.getAttribute()
+        for node in getLeaves(tree):
+            key = node.getAttribute()
             if _dictLabel.get(key) != None: 
-                tree.index = _dictLabel[ key ]
+                node.index = _dictLabel[ key ]
                 _dictLabel[ key ] += 1
                 
-    def prune(self, tree, attributes, _search = 0):      # Z. Wan---_search = 1 denotes the case for keyword search
+    def prune(self, tree, attributes, _search = 0, cost = None):      # Z. Wan---_search = 1 denotes the case for keyword search
         """given policy tree and attributes, determine whether the attributes satisfy the policy.
            if not enough attributes to satisfy policy, return None otherwise, a pruned list of
-           attributes to potentially recover the associated secret.
+           attributes to potentially recover the associated secret. With a cost model (see
+           cheapestAttributes) the pruned list is the cheapest one instead of the leftmost.
         """
         if _search == 0:
-            (policySatisfied, prunedList) = self.requiredAttributes(tree, attributes)
+            if cost is None:
+                (policySatisfied, prunedList) = self.requiredAttributes(tree, attributes)
+            else:
+                (policySatisfied, prunedList) = self.cheapestAttributes(tree, attributes, cost)
 #        print("pruned attrs: ", prunedList)
 #        if prunedList:
 #            for i in prunedList:
@@ -138,85 +650,222 @@ class PolicyParser:
 
     def requiredAttributeList(self, tree, attrList):
         """ determines all the lists of required attributes to satisfy policy tree and returns a list of 
-        lists of BinNode objects."""
+        lists of PolicyNode objects."""
         if tree == None: return 0
-        Left = tree.getLeft()
-        Right = tree.getRight()
-        if Left: resultLeft, leftAttr = self.requiredAttributeList(Left, attrList)
-        if Right: resultRight, rightAttr = self.requiredAttributeList(Right, attrList)
-                
-        if(tree.getNodeType() == OpType.OR):
-            # Two lists need to be generated
-            sendThis = []
-            if resultLeft and resultRight: sendThis = leftAttr+rightAttr 
-            elif resultRight: sendThis = rightAttr
-            elif resultLeft: sendThis = leftAttr
-            else: sendThis = None
-
-            #print("After OR, SendThis:",sendThis, leftAttr, rightAttr)
-            result = (resultLeft or resultRight)
-            if result == False: return (False, sendThis )            
-            return (True, sendThis )
-        if(tree.getNodeType() == OpType.AND):
-            if resultLeft and resultRight: 
-                sendThis = []
-                for i in leftAttr:
-                    #print("i:", i)
-                    for j in rightAttr: 
-                        # print("i+j:", i+j, len(rightAttr))
-                        sendThis.append(i+j)
-            elif resultLeft: sendThis = leftAttr
-            elif resultRight: sendThis = rightAttr
-            else: sendThis = None
-
-            result = (resultLeft and resultRight)
-            if result == False: return (False, sendThis)
-            return (True, sendThis)
-            
-        elif(tree.getNodeType() == OpType.ATTR):
-            #print("in OpType.ATTR")
-            if(tree.getAttribute() in attrList):
-                return (True, [[tree]])
+        order = postOrder(tree)
+        # leaves are matched by their attribute string, a set lookup as cheap as one by an integer id
+        attrSet = set(attrList)
+        # results of the subtrees visited so far, None where the subtree is not satisfied. Every
+        # list is owned by the parent that consumes it, so it can be extended in place.
+        results = {}
+        for node in order:
+            type = node.getNodeType()
+            if(type == OpType.THRESHOLD):
+                # every choice of k satisfied children, each combined like an AND over the chosen ones
+                satisfied = []
+                for child in node.children:
+                    childAttr = results.pop(id(child))
+                    if childAttr is not None: satisfied.append(childAttr)
+                sendThis = None
+                if len(satisfied) >= node.threshold:
+                    sendThis = []
+                    for chosen in itertools.combinations(satisfied, node.threshold):
+                        partial = [[]]
+                        for childAttr in chosen:
+                            partial = [i + j for i in partial for j in childAttr]
+                        sendThis.extend(partial)
+            elif(type == OpType.OR):
+                # Two lists need to be generated
+                leftAttr, rightAttr = results.pop(id(node.getLeft())), results.pop(id(node.getRight()))
+                if leftAttr is not None and rightAttr is not None:
+                    leftAttr.extend(rightAttr)
+                    sendThis = leftAttr
+                elif rightAttr is not None: sendThis = rightAttr
+                else: sendThis = leftAttr
+            elif(type == OpType.AND):
+                leftAttr, rightAttr = results.pop(id(node.getLeft())), results.pop(id(node.getRight()))
+                sendThis = None
+                if leftAttr is not None and rightAttr is not None and len(rightAttr) == 1:
+                    # the usual case in a left-deep chain: append the single right list to each left list
+                    for i in leftAttr: i.extend(rightAttr[0])
+                    sendThis = leftAttr
+                elif leftAttr is not None and rightAttr is not None: 
+                    sendThis = [i + j for i in leftAttr for j in rightAttr]
+            elif(type == OpType.ATTR):
+                sendThis = [[node]] if node.getAttribute() in attrSet else None
             else:
-                return (False, None)
-            
-        return
+                return
+            results[id(node)] = sendThis
+
+        sendThis = results[id(tree)]
+        if sendThis is None: return (False, None)
+        return (True, sendThis)
+
+    def iterRequiredAttributeList(self, tree, attrList, weight=None):
+        """ the lists of requiredAttributeList one at a time and in the same order, so a decrypt that
+        tries them can stop at the first one that works without the others ever being built. Returns
+        (False, None) if the policy is not satisfied, otherwise (True, an iterator of lists of PolicyNode
+        objects). Memory is bounded by the size of the tree.
+        With weight, a function of a leaf, the lists come instead in nondecreasing total weight of their
+        leaves, still one at a time; memory then grows with the lists taken so far, not with all of them."""
+        if tree == None: return 0
+        satisfied = self.satisfiedNodes(postOrder(tree), attrList)
+        if satisfied is None: return
+        if id(tree) not in satisfied: return (False, None)
+        # the and/or chains flattened into n-ary gates over their satisfied operands, parents before
+        # children, so the generators are only nested as deep as the gates alternate
+        order, operands, stack = [], {}, [tree]
+        while stack:
+            node = stack.pop()
+            order.append(node)
+            if node.getNodeType() != OpType.ATTR:
+                operands[id(node)] = [child for child in _operands(node) if id(child) in satisfied]
+                stack.extend(operands[id(node)])
+        if weight is not None:
+            return (True, self.weightedLists(order, operands, weight))
+        # a function per node that starts the enumeration of its lists afresh, as an AND restarts its
+        # later operands for every list of the earlier ones
+        lists = {}
+        for node in reversed(order):
+            type = node.getNodeType()
+            if(type == OpType.ATTR):
+                lists[id(node)] = functools.partial(_leafLists, node)
+                continue
+            children = [lists.pop(id(child)) for child in operands[id(node)]]
+            if(type == OpType.AND):
+                lists[id(node)] = functools.partial(_productLists, children)
+            elif(type == OpType.OR):
+                lists[id(node)] = functools.partial(_chainLists, children)
+            else:
+                lists[id(node)] = functools.partial(_thresholdLists, children, node.threshold)
+        return (True, lists[id(tree)]())
+
+    def weightedLists(self, order, operands, weight):
+        # the (weight, list) enumeration of every node, children first; the weights of the leaves are
+        # all taken before the first list, so they do not change during the enumeration
+        lists = {}
+        for node in reversed(order):
+            type = node.getNodeType()
+            if(type == OpType.ATTR):
+                generator = _weightedLeafLists(node, weight(node))
+            else:
+                children = [lists.pop(id(child)) for child in operands[id(node)]]
+                if(type == OpType.AND):
+                    generator = _weightedAndLists(children)
+                elif(type == OpType.OR):
+                    generator = _weightedChainLists(children)
+                else:
+                    generator = _weightedThresholdLists(children, node.threshold)
+            lists[id(node)] = _SortedLists(generator)
+        # the root is read once, in order, so its lists are not kept
+        return (item[1] for item in lists[id(order[0])].generator)
+
+    def satisfiedNodes(self, order, attrList):
+        """ given the nodes of a policy tree in post-order, the ids of the nodes whose subtree the
+        attributes satisfy."""
+        attrSet = set(attrList)
+        satisfied = set()
+        for node in order:
+            type = node.getNodeType()
+            if(type == OpType.ATTR):
+                if node.getAttribute() in attrSet: satisfied.add(id(node))
+            elif(type == OpType.AND):
+                if id(node.getLeft()) in satisfied and id(node.getRight()) in satisfied: satisfied.add(id(node))
+            elif(type == OpType.OR):
+                if id(node.getLeft()) in satisfied or id(node.getRight()) in satisfied: satisfied.add(id(node))
+            elif(type == OpType.THRESHOLD):
+                if sum(id(child) in satisfied for child in node.children) >= node.threshold: satisfied.add(id(node))
+            else:
+                return
+        return satisfied
 
     def requiredAttributes(self, tree, attrList):
-        """ determines the required attributes to satisfy policy tree and returns a list of BinNode
+        """ determines the required attributes to satisfy policy tree and returns a list of PolicyNode
         objects."""
         if tree == None: return 0
-        Left = tree.getLeft()
-        Right = tree.getRight()
-        if Left: resultLeft, leftAttr = self.requiredAttributes(Left, attrList)
-        if Right: resultRight, rightAttr = self.requiredAttributes(Right, attrList)
-                
-        if(tree.getNodeType() == OpType.OR):
-            # never return both attributes, basically the first one that matches from left to right
-            if resultLeft: sendThis = leftAttr
-            elif resultRight: sendThis = rightAttr
-            else: sendThis = None
-
-            result = (resultLeft or resultRight)
-            if result == False: return (False, sendThis)            
-            return (True, sendThis)
-        if(tree.getNodeType() == OpType.AND):
-            if resultLeft and resultRight: sendThis = leftAttr + rightAttr
-            elif resultLeft: sendThis = leftAttr
-            elif resultRight: sendThis = rightAttr
-            else: sendThis = None
-
-            result = (resultLeft and resultRight)
-            if result == False: return (False, sendThis)
-            return (True, sendThis)
-            
-        elif(tree.getNodeType() == OpType.ATTR):
-            if(tree.getAttribute() in attrList):
-                return (True, [tree])
+        # first pass, children before parents: the nodes whose subtree is satisfied
+        satisfied = self.satisfiedNodes(postOrder(tree), attrList)
+        if satisfied is None: return
+        if id(tree) not in satisfied: return (False, None)
+
+        # second pass, from the root and left to right: the leaves of the chosen subtrees go into a single
+        # list. An OR never returns both attributes, basically the first one that matches from left to
+        # right; a k-of-n gate takes its first k satisfied children.
+        sendThis, stack = [], [tree]
+        while stack:
+            node = stack.pop()
+            type = node.getNodeType()
+            if(type == OpType.ATTR):
+                sendThis.append(node)
+            elif(type == OpType.AND):
+                stack.append(node.getRight())
+                stack.append(node.getLeft())
+            elif(type == OpType.OR):
+                stack.append(node.getLeft() if id(node.getLeft()) in satisfied else node.getRight())
             else:
-                return (False, None)
-            
-        return
+                chosen = [child for child in node.children if id(child) in satisfied]
+                stack.extend(reversed(chosen[:node.threshold]))
+        return (True, sendThis)
+
+    def cheapestAttributes(self, tree, attrList, cost):
+        """ like requiredAttributes, but returns the satisfying list of minimum total cost, where cost is
+        (cost of a row, cost of a row under a threshold gate, which is also raised to its coefficient).
+        Dynamic programming over the tree: an AND costs both children, an OR its cheaper child and a
+        k-of-n gate its k cheapest children; ties go to the left, as in requiredAttributes."""
+        if tree == None: return 0
+        order = postOrder(tree)
+        attrSet = set(attrList)
+        # the nodes below a threshold gate, parents before children
+        weighted = set()
+        for node in reversed(order):
+            if node.getNodeType() == OpType.THRESHOLD or id(node) in weighted:
+                weighted.update(id(child) for child in getChildren(node))
+        # first pass, children before parents: the cost of the cheapest satisfying list of every subtree
+        infinity = float('inf')
+        costs = {}
+        for node in order:
+            type = node.getNodeType()
+            if(type == OpType.ATTR):
+                this_cost = infinity
+                if node.getAttribute() in attrSet: this_cost = cost[1] if id(node) in weighted else cost[0]
+            elif(type == OpType.AND):
+                this_cost = costs[id(node.getLeft())] + costs[id(node.getRight())]
+            elif(type == OpType.OR):
+                this_cost = min(costs[id(node.getLeft())], costs[id(node.getRight())])
+            elif(type == OpType.THRESHOLD):
+                this_cost = sum(sorted(costs[id(child)] for child in node.children)[:node.threshold])
+            else:
+                return
+            costs[id(node)] = this_cost
+        if costs[id(tree)] == infinity: return (False, None)
+
+        # second pass, from the root and left to right: the leaves of the cheapest choices go into one list
+        sendThis, stack = [], [tree]
+        while stack:
+            node = stack.pop()
+            type = node.getNodeType()
+            if(type == OpType.ATTR):
+                sendThis.append(node)
+            elif(type == OpType.AND):
+                stack.append(node.getRight())
+                stack.append(node.getLeft())
+            elif(type == OpType.OR):
+                left, right = node.getLeft(), node.getRight()
+                stack.append(left if costs[id(left)] <= costs[id(right)] else right)
+            else:
+                # the k cheapest children (the leftmost among equal costs), kept in their order
+                ranked = sorted(range(len(node.children)), key=lambda x: costs[id(node.children[x])])
+                stack.extend(node.children[x] for x in sorted(ranked[:node.threshold], reverse=True))
+        return (True, sendThis)
+
+    def policy_stripped(self, policy_tree):
+        """ the policy without the keyword values, as a copy-on-write variant that leaves policy_tree unchanged."""
+        return relabel(policy_tree, attribute_registry.name)
+
+    def policy_stripped_2(self, policy_tree):
+        """ the policy without the keyword names, as a copy-on-write variant that leaves policy_tree unchanged.
+        Attributes without a keyword value are kept as they are."""
+        return relabel(policy_tree, attribute_registry.value)
 
     ###############################################################
     # Added by Z. Wan 5/12/2015
@@ -224,15 +873,10 @@ class PolicyParser:
         """ Make a stripped copy of the original policy tree without the keyword values."""
         #policy_stripped = copy.deepcopy(policy_tree) # the input policy_tree should be deepcopied before calling this function.
         if policy_tree == None: return 0
-        Left = policy_tree.getLeft()
-        Right = policy_tree.getRight()
-        if Left: resultLeft = self.policy_strip(Left)
-        if Right: resultRight = self.policy_strip(Right)
-
-        if(policy_tree.getNodeType() == OpType.ATTR):
-            value = policy_tree.attribute
+        for node in getLeaves(policy_tree):
+            value = node.attribute
             tks = value.split(':')
-            policy_tree.attribute = tks[0]
+            node.attribute = tks[0]
     ################################################################
     
     ###############################################################
@@ -241,15 +885,10 @@ class PolicyParser:
         """ Make a stripped copy of the original policy tree without the keyword values."""
         #policy_stripped = copy.deepcopy(policy_tree) # the input policy_tree should be deepcopied before calling this function.
         if policy_tree == None: return 0
-        Left = policy_tree.getLeft()
-        Right = policy_tree.getRight()
-        if Left: resultLeft = self.policy_strip_2(Left)
-        if Right: resultRight = self.policy_strip_2(Right)
-
-        if(policy_tree.getNodeType() == OpType.ATTR):
-            value = policy_tree.attribute
+        for node in getLeaves(policy_tree):
+            value = node.attribute
             tks = value.split(':')
-            policy_tree.attribute = tks[1]
+            node.attribute = tks[1]
     ################################################################
     
 if __name__ == "__main__":
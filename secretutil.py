@@ -4,11 +4,15 @@ access structure as a binary tree. This could also support matrices for represen
 '''
 from charm.core.math.pairing import ZR
 from policytree import *
+from policycache import policy_cache, setNumericBits
+from attributeregistry import attribute_registry
 
 class SecretUtil:
     def __init__(self, groupObj, verbose=True):
         self.group = groupObj        
-#        self.parser = PolicyParser()
+        self.parser = PolicyParser()
+        self.simplify = False   # default for createPolicy
+        self.rebalance = False  # default for createPolicy
 
     def P(self, coeff, x):
         share = 0
@@ -61,25 +65,33 @@ class SecretUtil:
         return coeffs
     
     def _getCoefficientsDict(self, tree, coeff_list, coeff=1):
-        """recover coefficient over a binary tree where possible node types are OR = (1 of 2)
-        and AND = (2 of 2) secret sharing. The leaf nodes are attributes and the coefficients are
-        recorded in a coeff-list dictionary.""" 
-        if tree:
+        """recover coefficient over a binary tree where possible node types are OR = (1 of 2),
+        AND = (2 of 2) and THRESHOLD = (k of n) secret sharing. The leaf nodes are attributes and the
+        coefficients are recorded in a coeff-list dictionary. A k-of-n gate is reconstructed from all
+        n children (Lagrange at 0 over x = 1..n); for k of them, see MSP.getReconstructionCoefficients.""" 
+        and_coeff = self.recoverCoefficients([1,2])
+        or_coeff = self.recoverCoefficients([1])
+        stack = [(tree, coeff)]
+        while stack:
+            tree, coeff = stack.pop()
+            if not tree: continue
             node = tree.getNodeType()
             if(node == OpType.AND):
-                this_coeff = self.recoverCoefficients([1,2])
                 # left child => coeff[1], right child => coeff[2]
-                self._getCoefficientsDict(tree.getLeft(), coeff_list, coeff * this_coeff[1])
-                self._getCoefficientsDict(tree.getRight(), coeff_list, coeff * this_coeff[2])
+                stack.append((tree.getRight(), coeff * and_coeff[2]))
+                stack.append((tree.getLeft(), coeff * and_coeff[1]))
             elif(node == OpType.OR):
-                this_coeff = self.recoverCoefficients([1])
-                self._getCoefficientsDict(tree.getLeft(), coeff_list, coeff * this_coeff[1])
-                self._getCoefficientsDict(tree.getRight(), coeff_list, coeff * this_coeff[1])
+                stack.append((tree.getRight(), coeff * or_coeff[1]))
+                stack.append((tree.getLeft(), coeff * or_coeff[1]))
+            elif(node == OpType.THRESHOLD):
+                this_coeff = self.recoverCoefficients(range(1, len(tree.children) + 1))
+                for x, child in reversed(list(enumerate(tree.children, 1))):
+                    stack.append((child, coeff * this_coeff[x]))
             elif(node == OpType.ATTR):
                 attr = tree.getAttributeAndIndex()
                 coeff_list[ attr ] = coeff
             else:
-                return None
+                raise ValueError("unsupported gate in policy: %s" % node)
             
     def _calculateShares(self, secret, tree, _type=dict):
         """performs secret sharing over a policy tree. could be adapted for LSSS matrices."""
@@ -104,34 +116,37 @@ class SecretUtil:
         return self._calculateShares(secret, tree, dict)
     
     def _compute_shares(self, secret, subtree, List):
-        """computes recursive secret sharing over the binary tree. Start by splitting 1-of-2 (OR) or 2-of-2 (AND nodes).
-         Continues recursively down the tree doing a round of secret sharing at each boolean node type."""
+        """computes secret sharing over the binary tree. Start by splitting 1-of-2 (OR) or 2-of-2 (AND nodes).
+         Continues down the tree (depth-first on an explicit stack) doing a round of secret sharing at each boolean node type."""
         k = 0
         if(subtree == None):
             return None
         
-        type = subtree.getNodeType()
-        if(type == OpType.ATTR):
-            # visiting a leaf node
-#            t = (subtree.getAttribute(), secret)
-            t = (subtree, secret)
-            List.append(t)
-            return None
-        elif(type == OpType.OR or type == OpType.AND):
-            k = subtree.threshold # 1-of-2 or 2-of-2
-#        elif(type == OpType.AND):
-#            k = 2 # 2-of-2
-        else:
-            return None
-        # generate shares for k and n        
-        shares = self.genShares(secret, k, n=2)
-        # recursively generate shares for children nodes
-        self._compute_shares(shares[1], subtree.getLeft(), List)
-        self._compute_shares(shares[2], subtree.getRight(), List)
+        stack = [(secret, subtree)]
+        while stack:
+            secret, subtree = stack.pop()
+            type = subtree.getNodeType()
+            if(type == OpType.ATTR):
+                # visiting a leaf node
+#                t = (subtree.getAttribute(), secret)
+                t = (subtree, secret)
+                List.append(t)
+                continue
+            elif(type == OpType.OR or type == OpType.AND or type == OpType.THRESHOLD):
+                k = subtree.threshold # 1-of-2, 2-of-2 or k-of-n
+#            elif(type == OpType.AND):
+#                k = 2 # 2-of-2
+            else:
+                continue
+            children = getChildren(subtree)
+            # generate shares for k and n        
+            shares = self.genShares(secret, k, n=len(children))
+            # then generate shares for children nodes, left first
+            for i in reversed(range(len(children))):
+                stack.append((shares[i+1], children[i]))
     
     def strip_index(self, node_str):
-        if node_str.find('_') != -1: return node_str.split('_')[0]
-        return node_str
+        return attribute_registry.strip_index(node_str)
         
     # Added by Z. Wan 5/12/2015
     def keywords_strip(self, keyword_list):
@@ -142,25 +157,32 @@ class SecretUtil:
     ################################
         
     
-    def createPolicy(self, policy_string):
+    def createPolicy(self, policy_string, simplify=None, rebalance=None):
+        """the policy tree is shared through the policy cache and must not be modified in place.
+        with simplify (default self.simplify) it is reduced to an equivalent policy with fewer MSP rows and columns,
+        with rebalance (default self.rebalance) its and/or chains are turned into balanced trees"""
+        return self.compilePolicy(policy_string, simplify, rebalance).tree
+
+    def compilePolicy(self, policy_string, simplify=None, rebalance=None):
+        """the cached CompiledPolicy (tree, duplicate attributes, attribute list, reduction, names, values) for a policy string"""
         assert type(policy_string) == str, "invalid type for policy_string"
-        #print("1")
-        parser = PolicyParser()        
-        #print("2", policy_string)
-        policy_obj = parser.parse(policy_string)
-        #print("3")
-        _dictCount, _dictLabel = {}, {}
-        parser.findDuplicates(policy_obj, _dictCount)
-        #print("4")
-        for i in _dictCount.keys(): 
-            if _dictCount[ i ] > 1: _dictLabel[ i ] = 0
-        parser.labelDuplicates(policy_obj, _dictLabel)
-        return policy_obj
+        if simplify is None:
+            simplify = self.simplify
+        if rebalance is None:
+            rebalance = self.rebalance
+        return policy_cache.get(policy_string, simplify, rebalance)
+
+    def setNumericBits(self, name, bits):
+        """set the bit width of a numeric attribute compared in policies, e.g. 'level >= 5'"""
+        setNumericBits(name, bits)
+
+    def expandAttributes(self, attributes):
+        """expand numeric attributes 'NAME=VALUE' of a key or ciphertext into the bit attributes matched by comparisons"""
+        return expandAttributes(attributes)
         
     def prune(self, policy, attributes, _search=0):
         """determine whether a given set of attributes satisfies the policy"""
-        parser = PolicyParser()        
-        return parser.prune(policy, attributes, _search)
+        return self.parser.prune(policy, attributes, _search)
     
     def getAttributeList(self, Node):
         aList = []
@@ -171,12 +193,7 @@ class SecretUtil:
         """retrieve the attributes that occur in a policy tree in order (left to right)"""
         if(Node == None):
             return None
-        # V, L, R
-        if(Node.getNodeType() == OpType.ATTR):
-            List.append(Node.getAttributeAndIndex()) # .getAttribute()
-        else:
-            self._getAttributeList(Node.getLeft(), List)
-            self._getAttributeList(Node.getRight(), List)
+        List.extend(node.getAttributeAndIndex() for node in getLeaves(Node)) # .getAttribute()
         return None
 
 # TODO: add test cases here for SecretUtil
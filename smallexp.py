@@ -0,0 +1,82 @@
+'''
+Group exponentiation by the coefficients of an MSP or of a reconstruction vector. The entries of a
+Lewko-Waters MSP are 0, 1 or -1 except under threshold gates, where they are small powers x^j, and the
+reconstruction coefficients of and/or policies are 1; a full exponentiation by such a coefficient costs
+about as much as one by a random exponent. power and mulPower instead skip a 0, return or multiply the
+element for 1, invert for -1, and raise an integer of up to SMALL_BITS bits by square-and-multiply, a
+short addition chain of group multiplications. Other coefficients get a full exponentiation. The schemes
+go through MSP.exp and MSP.mulExp, which count the operations in util.exp_stats (an ExpStats).
+'''
+
+# coefficients of up to this many bits are raised by square-and-multiply, at most 2 * SMALL_BITS
+# multiplications, well below a full exponentiation (a few hundred for BN254)
+SMALL_BITS = 32
+
+class ExpStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0              # coefficients applied, each a full exponentiation without this module
+        self.exponentiations = 0    # full exponentiations done
+        self.multiplications = 0    # group multiplications (and divisions) done instead
+        self.inversions = 0         # inversions, for a negative coefficient without a product to divide
+        self.skipped = 0            # coefficients 0, nothing done
+
+    def __repr__(self):
+        return 'ExpStats(calls=%d, exponentiations=%d, multiplications=%d, inversions=%d, skipped=%d)' % (
+            self.calls, self.exponentiations, self.multiplications, self.inversions, self.skipped)
+
+def _chain(element, k, stats):
+    # element ** k for 0 < k < 2^SMALL_BITS, by square-and-multiply from the low bit
+    result = None
+    while True:
+        if k & 1:
+            if result is None:
+                result = element
+            else:
+                result = result * element
+                if stats is not None: stats.multiplications += 1
+        k >>= 1
+        if not k:
+            return result
+        element = element * element
+        if stats is not None: stats.multiplications += 1
+
+def power(element, coeff, stats=None):
+    """ element ** coeff for an integer coeff, with the fast paths above; a coefficient 0 still gets
+    the exponentiation, as there is no identity element to return without one."""
+    if stats is not None: stats.calls += 1
+    if coeff == 1:
+        return element
+    if coeff == 0 or abs(coeff) >> SMALL_BITS:
+        if stats is not None: stats.exponentiations += 1
+        return element ** coeff
+    result = _chain(element, abs(coeff), stats)
+    if coeff < 0:
+        if stats is not None: stats.inversions += 1
+        # charm inverts an element raised to -1
+        return result ** -1
+    return result
+
+def mulPower(prod, element, coeff, stats=None):
+    """ prod * element ** coeff for an integer coeff; prod may be the integer 1 of an empty product."""
+    if stats is not None: stats.calls += 1
+    if coeff == 0:
+        if stats is not None: stats.skipped += 1
+        return prod
+    if abs(coeff) >> SMALL_BITS:
+        if stats is not None: stats.exponentiations += 1
+        term = element ** coeff
+    else:
+        term = _chain(element, abs(coeff), stats)
+        if coeff < 0:
+            if type(prod) is int:
+                if stats is not None: stats.inversions += 1
+                return term ** -1
+            if stats is not None: stats.multiplications += 1
+            return prod / term
+    if type(prod) is int:
+        return term
+    if stats is not None: stats.multiplications += 1
+    return prod * term
@@ -0,0 +1,78 @@
+'''
+Order of the candidate subsets that an A2BE decrypt tries. The attribute names of a key and a ciphertext
+can match while their values do not, and the decrypt only finds out after the pairings of a trial, so
+trying the likely subsets first saves pairing work. An ordering is set on the scheme's MSP
+(util.subset_order) and is one of:
+- None: tree order, enumerated lazily;
+- SmallestFirst: the subsets with the fewest attributes first;
+- HitRateOrder: the subsets whose attribute names were most often part of a successful trial first,
+    learned from the trials of earlier decrypts;
+- PriorOrder: the subsets whose attribute names are the most likely to hold a matching value first,
+    from probabilities given by the caller.
+The orderings above have a weight(leaf) method: the parser then enumerates the subsets lazily in
+nondecreasing total weight of their leaves (see PolicyParser.iterRequiredAttributeList), so no subset is
+built before it is needed. Any other ordering has either such a weight method or an order(subsets)
+method, which sees all the subsets at once, and may have a record(subset, success) method.
+SubsetStats counts the trials per decrypt on util.subset_stats.
+'''
+import math
+
+class SubsetStats:
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.decryptions = 0    # decrypts whose attribute names satisfy the policy
+        self.successes = 0      # of those, the ones where a trial succeeded
+        self.trials = 0         # trials over all of them, each costing the pairings of one subset
+
+    def record(self, success):
+        self.trials += 1
+        if success: self.successes += 1
+
+    def trialsPerSuccess(self):
+        """ the average number of trials of a successful decrypt, counting the trials of the failed ones
+        as wasted on the successful ones."""
+        return self.trials / self.successes if self.successes else float('inf')
+
+    def wastedTrials(self):
+        """ the trials that did not decrypt."""
+        return self.trials - self.successes
+
+    def __repr__(self):
+        return 'SubsetStats(decryptions=%d, successes=%d, trials=%d, wasted=%d)' % (
+            self.decryptions, self.successes, self.trials, self.wastedTrials())
+
+class SmallestFirst:
+    def weight(self, leaf):
+        return 1
+
+class PriorOrder:
+    def __init__(self, priors, default=0.5):
+        self.priors = priors    # attribute name -> probability that its value matches
+        self.default = default  # for the names without a prior
+
+    def score(self, subset):
+        score = 1.0
+        for node in subset:
+            score *= self.priors.get(node.getAttribute(), self.default)
+        return score
+
+    def weight(self, leaf):
+        # the highest product of probabilities is the lowest sum of their negative logarithms
+        prior = self.priors.get(leaf.getAttribute(), self.default)
+        return -math.log(prior) if prior > 0 else math.inf
+
+class HitRateOrder(PriorOrder):
+    def __init__(self):
+        PriorOrder.__init__(self, {})
+        self.hits = {}      # attribute name -> successful trials with it
+        self.tries = {}     # attribute name -> trials with it
+
+    def record(self, subset, success):
+        # a failed trial does not tell which of its attributes did not match, so all of them are charged;
+        # the rate is smoothed, (hits + 1) / (tries + 2), so a name never tried scores 1/2
+        for name in set(node.getAttribute() for node in subset):
+            self.hits[name] = self.hits.get(name, 0) + success
+            self.tries[name] = self.tries.get(name, 0) + 1
+            self.priors[name] = (self.hits[name] + 1) / (self.tries[name] + 2)
@@ -0,0 +1,51 @@
+'''
+Bounds on the trials of an A2BE decrypt (or keyword search), which try candidate subsets one by one and
+pay the pairings of the scheme for every one of them. A TrialBudget is passed to decrypt; before each
+trial MSP.pruneSubsets checks the deadline, the cancellation token and the pairings left, and stops
+handing out subsets once one of them runs out. The budget then holds the progress: the subsets tried,
+those remaining and why it stopped, and the enumeration of the subsets where it stopped. Calling decrypt
+again with the same ciphertext, key and budget, once extended, takes up that enumeration, so it goes on
+with the next subset whatever the ordering learned in between; a budget cannot be used for another decrypt.
+'''
+import time
+
+class TrialBudget:
+    def __init__(self, timeout=None, max_pairings=None, cancel=None):
+        # timeout: seconds from now; max_pairings: over all the trials; cancel: a token whose is_set()
+        # (e.g. a threading.Event) stops the decrypt before its next trial
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.max_pairings = max_pairings
+        self.cancel = cancel
+        self.tried = 0          # subsets tried so far, over every call
+        self.remaining = None   # subsets not tried yet when it stopped, None while it did not
+        self.pairings = 0       # pairings of the subsets tried
+        self.stopped = None     # 'deadline', 'cancelled' or 'pairings' once it stopped
+        # the decrypt it was started with, the rest of its subsets and how many it has in all (None until
+        # counted), set by MSP.pruneSubsets
+        self.policy, self.attributes, self.subsets, self.total = None, None, None, None
+
+    def extend(self, timeout=None, pairings=None):
+        """ allow a resumed decrypt timeout more seconds from now and pairings more pairings."""
+        if timeout is not None:
+            self.deadline = time.monotonic() + timeout
+        if pairings is not None:
+            self.max_pairings = (self.max_pairings or self.pairings) + pairings
+        self.stopped, self.remaining = None, None
+
+    def charge(self, pairings):
+        """ whether a trial of that many pairings may start, counting it if so."""
+        if self.cancel is not None and self.cancel.is_set():
+            self.stopped = 'cancelled'
+        elif self.deadline is not None and time.monotonic() >= self.deadline:
+            self.stopped = 'deadline'
+        elif self.max_pairings is not None and self.pairings + pairings > self.max_pairings:
+            self.stopped = 'pairings'
+        else:
+            self.tried += 1
+            self.pairings += pairings
+            return True
+        return False
+
+    def __repr__(self):
+        return 'TrialBudget(tried=%d, remaining=%s, pairings=%d, stopped=%s)' % (
+            self.tried, self.remaining, self.pairings, self.stopped)